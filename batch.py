@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+DataHawk Batch Mode
+Run one extraction description over a file of URLs without the web interface.
+
+    python batch.py urls.txt "Extract all product names and prices" -o results.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import metrics
+from datahawk import Pipeline
+from scheduler import scheduler as gemini_scheduler
+
+
+def read_urls(path):
+    """Read one URL per line, skipping blanks and # comments"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+
+def read_done_urls(path, statuses=('ok',)):
+    """
+    URLs that already have a record with one of `statuses` in an existing
+    output file; pages that failed (or came out partial) are not done.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                if record['status'] in statuses:
+                    done.add(record['url'])
+            except (ValueError, KeyError, TypeError):
+                continue
+    return done
+
+
+def process_url(pipeline, url, parse_description, columns=None):
+    """Run the pipeline for one page and return a JSON-serializable record"""
+    started = time.time()
+    record = pipeline.extract(url, parse_description, columns=columns).to_dict()
+    # The raw and cleaned page are intermediate products, keep the output lean
+    record.pop('content', None)
+    record.pop('html', None)
+    record['url'] = url
+    record['elapsed_s'] = round(time.time() - started, 3)
+    return record
+
+
+def run_batch(urls, parse_description, output_path, concurrency=4, refresh=False, append=False,
+              columns=None, structured=False):
+    """Process `urls` concurrently, writing one JSONL record per page as it finishes"""
+    pipeline = Pipeline(refresh=refresh, structured=structured)
+    write_lock = threading.Lock()
+    counts = {'ok': 0, 'partial': 0, 'error': 0}
+
+    with open(output_path, 'a' if append else 'w', encoding='utf-8') as out, \
+            ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(process_url, pipeline, url, parse_description, columns): url for url in urls}
+        for done, future in enumerate(as_completed(futures), start=1):
+            url = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                record = {'url': url, 'status': 'error', 'text': "",
+                          'errors': [{'stage': 'pipeline', 'message': str(e), 'chunk': None}]}
+
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+            counts[record['status']] += 1
+            print(f"[{done}/{len(urls)}] {record['status']}: {url}")
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a DataHawk extraction over many URLs.")
+    parser.add_argument('urls_file', help="Text file with one URL per line")
+    parser.add_argument('description', help="What to extract from every page")
+    parser.add_argument('-o', '--output', default='datahawk_batch.jsonl', help="JSONL output file")
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help="Pages processed at once")
+    parser.add_argument('--json', action='store_true',
+                        help="Ask for JSON rows with columns inferred from the description")
+    parser.add_argument('--columns', help="Comma-separated output columns (implies --json)")
+    parser.add_argument('--refresh', action='store_true', help="Ignore cached pages and refetch")
+    parser.add_argument('--resume', action='store_true',
+                        help="Append to the output file and skip URLs already extracted successfully")
+    parser.add_argument('--skip-partial', action='store_true',
+                        help="With --resume, also skip URLs whose record is partial instead of retrying them")
+    args = parser.parse_args()
+
+    urls = read_urls(args.urls_file)
+    if args.resume:
+        done = read_done_urls(args.output, ('ok', 'partial') if args.skip_partial else ('ok',))
+        urls = [url for url in urls if url not in done]
+    if not urls:
+        print("No URLs to process.")
+        return 0
+
+    metrics.start_server()
+    print(f"🦅 Processing {len(urls)} URLs with concurrency {args.concurrency}")
+    counts = run_batch(urls, args.description, args.output, args.concurrency,
+                       refresh=args.refresh, append=args.resume,
+                       columns=args.columns, structured=args.json)
+    print(f"✅ Done: {counts['ok']} ok, {counts['partial']} partial, {counts['error']} failed -> {args.output}")
+    quota = gemini_scheduler.remaining()
+    if quota['daily_tokens_remaining'] is not None:
+        print(f"🎟️ {quota['daily_tokens_remaining']:,} of {quota['daily_tokens_limit']:,} Gemini tokens left today")
+    return 1 if counts['error'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Compare the old two-pass BeautifulSoup cleaner with scrape.html_to_text.
+
+Each measurement runs in a fresh subprocess so peak RSS (which includes
+libxml2's own allocations, invisible to tracemalloc) is not polluted by the
+other implementation.
+
+    python benchmarks/bench_clean.py --size-mb 1 5 20
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def make_page(size_bytes):
+    """
+    Build a product-grid style page of roughly `size_bytes`.
+    """
+    parts = [
+        "<html><head><title>Catalogue</title><style>.card{color:red}</style></head><body>",
+        "<nav><a href='/'>Home</a><a href='/shop'>Shop</a></nav>",
+    ]
+    size = sum(len(p) for p in parts)
+    i = 0
+    while size < size_bytes:
+        card = (
+            f"<div class='card'><h2>Product {i}</h2>"
+            f"<span class='price'>${i % 500}.99</span>"
+            f"<p>Rating {i % 5 + 1} of 5 &amp; free shipping</p>"
+            f"<script>track({i})</script><noscript>enable js</noscript>"
+            f"<svg><path d='M0 0L10 10'/></svg>"
+            f"<div style='display:none'>hidden {i}</div></div>\n"
+        )
+        parts.append(card)
+        size += len(card)
+        i += 1
+    parts.append("<footer>Copyright</footer></body></html>")
+    return "".join(parts)
+
+
+def legacy_clean(html):
+    from bs4 import BeautifulSoup
+
+    body = str(BeautifulSoup(html, 'html.parser').find('body'))
+    soup = BeautifulSoup(body, 'html.parser')
+    for script_or_style in soup(['script', 'style']):
+        script_or_style.extract()
+    text = soup.get_text(separator="\n")
+    return "\n".join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def lxml_clean(html):
+    from scrape import html_to_text
+
+    return html_to_text(html)
+
+
+IMPLEMENTATIONS = {'legacy': legacy_clean, 'lxml': lxml_clean}
+
+
+def run_one(name, size_mb):
+    html = make_page(int(size_mb * 1024 * 1024))
+    clean = IMPLEMENTATIONS[name]
+
+    start_cpu = time.process_time()
+    start_wall = time.perf_counter()
+    text = clean(html)
+    result = {
+        'implementation': name,
+        'size_mb': size_mb,
+        'cpu_s': round(time.process_time() - start_cpu, 3),
+        'wall_s': round(time.perf_counter() - start_wall, 3),
+        'output_chars': len(text),
+        'peak_rss_mb': None,
+    }
+    if resource:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        result['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mb', type=float, nargs='+', default=[1, 5, 20])
+    parser.add_argument('--run', choices=IMPLEMENTATIONS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_one(args.run, args.size_mb[0])))
+        return
+
+    print(f"{'size':>8} {'impl':>7} {'cpu s':>8} {'wall s':>8} {'peak MB':>8} {'chars':>10}")
+    for size_mb in args.size_mb:
+        for name in IMPLEMENTATIONS:
+            output = subprocess.check_output(
+                [sys.executable, os.path.abspath(__file__), '--run', name, '--size-mb', str(size_mb)]
+            )
+            r = json.loads(output.decode().strip().splitlines()[-1])
+            print(f"{size_mb:>6}MB {name:>7} {r['cpu_s']:>8} {r['wall_s']:>8} "
+                  f"{str(r['peak_rss_mb']):>8} {r['output_chars']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Compare the old per-line format_results_as_table with the vectorized one.
+
+Each measurement runs in a fresh subprocess so peak RSS of one
+implementation does not hide the other's.
+
+    python benchmarks/bench_format.py --lines 1000 100000 1000000
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def make_results(lines, shape):
+    """
+    Model output of `lines` lines: a " | " table, price lines or contact lines.
+    """
+    if shape == 'table':
+        rows = [f"Product {i} | ${i % 500}.99 | {i % 5 + 1}/5" for i in range(lines)]
+    elif shape == 'prices':
+        rows = [f"Product {i} ${i % 500}.99" for i in range(lines)]
+    else:
+        rows = [f"sales{i}@example.com" if i % 2 else f"+1 555 {i % 1000:03d} {i % 10000:04d}"
+                for i in range(lines)]
+    return "\n".join(rows)
+
+
+def legacy_format(text):
+    import pandas as pd
+
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    if not lines:
+        return None, text
+
+    separators = [' - ', ' | ', '\t', ':', ' , ', ', ']
+    table_data = []
+    headers = []
+
+    for separator in separators:
+        if all(separator in line for line in lines[:min(5, len(lines))]):
+            for i, line in enumerate(lines):
+                parts = [part.strip() for part in line.split(separator)]
+                if i == 0:
+                    if len(parts) == 2:
+                        headers = ['Item', 'Value']
+                    elif len(parts) == 3:
+                        headers = ['Name', 'Price', 'Rating']
+                    elif len(parts) == 4:
+                        headers = ['Title', 'Price', 'Rating', 'Status']
+                    else:
+                        headers = [f'Column {j+1}' for j in range(len(parts))]
+
+                if len(parts) == len(headers):
+                    table_data.append(parts)
+
+            if len(table_data) > 1:
+                try:
+                    df = pd.DataFrame(table_data, columns=headers)
+                    return df, text
+                except:
+                    continue
+
+    price_pattern = r'([^$£€¥₹]+)[\s\-]+[\$£€¥₹]?(\d+\.?\d*)'
+    matches = re.findall(price_pattern, text)
+    if len(matches) >= 3:
+        df = pd.DataFrame(matches, columns=['Product', 'Price'])
+        return df, text
+
+    email_pattern = r'([^@\s]+@[^@\s]+\.[^@\s]+)'
+    phone_pattern = r'(\+?\d{1,3}[-.\s]?\(?\d{1,4}\)?[-.\s]?\d{1,4}[-.\s]?\d{1,9})'
+
+    emails = re.findall(email_pattern, text)
+    phones = re.findall(phone_pattern, text)
+
+    if emails or phones:
+        contact_data = []
+        for email in emails:
+            contact_data.append(['Email', email])
+        for phone in phones:
+            contact_data.append(['Phone', phone])
+
+        if contact_data:
+            df = pd.DataFrame(contact_data, columns=['Type', 'Contact'])
+            return df, text
+
+    return None, text
+
+
+def vectorized_format(text):
+    from formatting import format_results_as_table
+
+    return format_results_as_table(text)
+
+
+IMPLEMENTATIONS = {'legacy': legacy_format, 'vectorized': vectorized_format}
+
+
+def run_one(name, lines, shape):
+    text = make_results(lines, shape)
+    format_results = IMPLEMENTATIONS[name]
+    import pandas  # noqa: F401  (import cost is not what is being measured)
+
+    start_cpu = time.process_time()
+    start_wall = time.perf_counter()
+    df, _ = format_results(text)
+    result = {
+        'implementation': name,
+        'lines': lines,
+        'shape': shape,
+        'cpu_s': round(time.process_time() - start_cpu, 3),
+        'wall_s': round(time.perf_counter() - start_wall, 3),
+        'rows': 0 if df is None else len(df),
+        'peak_rss_mb': None,
+    }
+    if resource:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        result['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lines', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--shape', choices=['table', 'prices', 'contacts'], nargs='+',
+                        default=['table', 'prices', 'contacts'])
+    parser.add_argument('--run', choices=IMPLEMENTATIONS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_one(args.run, args.lines[0], args.shape[0])))
+        return
+
+    print(f"{'lines':>9} {'shape':>9} {'impl':>11} {'cpu s':>8} {'wall s':>8} {'peak MB':>8} {'rows':>9}")
+    for lines in args.lines:
+        for shape in args.shape:
+            for name in IMPLEMENTATIONS:
+                output = subprocess.check_output([
+                    sys.executable, os.path.abspath(__file__), '--run', name,
+                    '--lines', str(lines), '--shape', shape
+                ])
+                r = json.loads(output.decode().strip().splitlines()[-1])
+                print(f"{lines:>9} {shape:>9} {name:>11} {r['cpu_s']:>8} {r['wall_s']:>8} "
+                      f"{str(r['peak_rss_mb']):>8} {r['rows']:>9}")
+
+
+if __name__ == "__main__":
+    main()
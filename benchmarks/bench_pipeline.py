@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of every pipeline stage, for comparing commits.
+
+Pages come from benchmarks/fixtures.py and are served by a stand-in
+WebDriver; Gemini is replaced by a fake model with configurable latency
+and 429 rate, so no network, proxy or API key is involved. Every fixture
+runs in its own subprocess so peak RSS belongs to that fixture alone.
+
+    python benchmarks/bench_pipeline.py --sizes 10KB 1MB -o before.json
+    python benchmarks/bench_pipeline.py --sizes 10KB 1MB -o after.json --baseline before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import KINDS, SIZES, fixture_url, make_fixture  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+STAGES = ('scrape_website', 'extract_body_content', 'clean_body_content', 'html_to_text',
+          'split_dom_content', 'parse_with_gemini', 'format_results_as_table')
+DESCRIPTION = "Extract all product names and prices"
+
+
+class FakeDriver:
+    """Just enough of a Selenium Remote driver to serve fixtures."""
+
+    def __init__(self, pages, latency=0.0):
+        self.pages = pages
+        self.latency = latency
+        self.current_url = 'about:blank'
+        self.page_source = ""
+
+    def get(self, url):
+        time.sleep(self.latency)
+        self.current_url = url
+        self.page_source = self.pages[url]
+
+    def execute(self, command, params=None):
+        return {'value': {'status': 'not_detected'}}
+
+    def execute_script(self, script, *args):
+        # get() returns with the page fully loaded and no requests pending
+        if 'performance' in script:
+            return ['complete', 0]
+        return True
+
+    def quit(self):
+        pass
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """
+    Stand-in for genai.GenerativeModel: sleeps `latency` seconds per call
+    and fails a `rate_429` fraction of calls with a quota error.
+    """
+
+    def __init__(self, latency=0.05, rate_429=0.0, seed=0):
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.calls = 0
+        self.rejected = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        try:
+            from google.api_core.exceptions import ResourceExhausted
+            self._quota_error = ResourceExhausted
+        except ImportError:
+            self._quota_error = RuntimeError
+
+    def _answer(self, prompt):
+        # A plausible extraction: every "Product N ... $price" pair in the chunk
+        rows = re.findall(r"(Product \d+ \w+)\s+(\$\d+\.\d\d)", prompt)
+        return "\n".join(f"{name} | {price} | 4/5" for name, price in rows)
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        with self._lock:
+            self.calls += 1
+            reject = self._rng.random() < self.rate_429
+            self.rejected += reject
+        time.sleep(self.latency)
+        if reject:
+            raise self._quota_error("429 Resource has been exhausted (e.g. check quota).")
+        text = self._answer(prompt)
+        return iter([_Response(text)]) if stream else _Response(text)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def measure(fn, size_bytes, repeats, budget_s):
+    """
+    Time `fn` up to `repeats` times (fewer once `budget_s` is spent), then
+    once more under tracemalloc for the peak Python allocation.
+    """
+    timings = []
+    started = time.perf_counter()
+    output = None
+    while len(timings) < repeats and (not timings or time.perf_counter() - started < budget_s):
+        t0 = time.perf_counter()
+        output = fn()
+        timings.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50 = percentile(timings, 50)
+    return output, {
+        'runs': len(timings),
+        'p50_s': round(p50, 6),
+        'p95_s': round(percentile(timings, 95), 6),
+        'mean_s': round(sum(timings) / len(timings), 6),
+        'throughput_mb_s': round(size_bytes / 1024 ** 2 / p50, 3) if p50 > 0 else None,
+        'peak_alloc_mb': round(peak / 1024 ** 2, 3),
+    }
+
+
+def run_fixture(kind, size_name, args):
+    """Benchmark every stage on one fixture; runs inside a child process."""
+    import parse
+    import scrape
+    from driver_pool import DriverPool
+    from formatting import format_results_as_table
+
+    url = fixture_url(kind, size_name)
+    html = make_fixture(kind, SIZES[size_name], seed=args.seed)
+    scrape.driver_pool = DriverPool(lambda: FakeDriver({url: html}, args.fetch_latency), size=1)
+    parse.model = FakeModel(args.model_latency, args.rate_429, args.seed)
+
+    stages = {}
+    fetched, stages['scrape_website'] = measure(
+        lambda: scrape.scrape_website(url, use_cache=False), len(html), args.repeats, args.budget)
+    body, stages['extract_body_content'] = measure(
+        lambda: scrape.extract_body_content(fetched), len(fetched), args.repeats, args.budget)
+    _, stages['clean_body_content'] = measure(
+        lambda: scrape.clean_body_content(body), len(body), args.repeats, args.budget)
+    text, stages['html_to_text'] = measure(
+        lambda: scrape.html_to_text(fetched), len(fetched), args.repeats, args.budget)
+    chunks, stages['split_dom_content'] = measure(
+        lambda: scrape.split_dom_content(text), len(text), args.repeats, args.budget)
+
+    sent = chunks[:args.max_chunks]
+    sent_bytes = sum(len(chunk) for chunk in sent)
+    parse.model.calls = parse.model.rejected = 0
+    parsed, stages['parse_with_gemini'] = measure(
+        lambda: parse.parse_with_gemini(sent, DESCRIPTION, max_workers=args.workers, requests_per_minute=0),
+        sent_bytes, args.parse_repeats, args.budget)
+    # measure() makes one extra run under tracemalloc
+    parse_runs = stages['parse_with_gemini']['runs'] + 1
+    stages['parse_with_gemini'].update(
+        chunks=len(sent), total_chunks=len(chunks),
+        model_calls_per_run=round(parse.model.calls / parse_runs, 1),
+        rejected_429_per_run=round(parse.model.rejected / parse_runs, 1))
+    _, stages['format_results_as_table'] = measure(
+        lambda: format_results_as_table(parsed), len(parsed), args.repeats, args.budget)
+
+    result = {'kind': kind, 'size': size_name, 'bytes': len(html), 'stages': stages, 'peak_rss_mb': None}
+    if resource:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        result['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """Print the p50 ratio of every stage against a previous report."""
+    previous = {(r['kind'], r['size']): r for r in baseline['results']}
+    print(f"\nvs {baseline['meta'].get('commit')}: p50 ratio (<1 is faster)", file=sys.stderr)
+    for r in report['results']:
+        before = previous.get((r['kind'], r['size']))
+        if not before:
+            continue
+        ratios = []
+        for stage in STAGES:
+            old, new = before['stages'].get(stage), r['stages'].get(stage)
+            if old and new and old['p50_s']:
+                ratios.append(f"{stage}={new['p50_s'] / old['p50_s']:.2f}")
+        print(f"  {r['kind']:>8} {r['size']:>5}  " + " ".join(ratios), file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=list(KINDS))
+    parser.add_argument('--sizes', nargs='+', choices=SIZES, default=list(SIZES))
+    parser.add_argument('--repeats', type=int, default=5, help="Timed runs per stage")
+    parser.add_argument('--parse-repeats', type=int, default=3, help="Timed runs of the model stage")
+    parser.add_argument('--budget', type=float, default=20.0,
+                        help="Seconds after which a stage stops repeating (it always runs once)")
+    parser.add_argument('--fetch-latency', type=float, default=0.0, help="Fake page load time in seconds")
+    parser.add_argument('--model-latency', type=float, default=0.05, help="Fake Gemini latency per call")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="Fraction of model calls rejected with 429")
+    parser.add_argument('--max-chunks', type=int, default=32, help="Chunks sent to the fake model")
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent model calls")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help="Write the JSON report here (default: stdout)")
+    parser.add_argument('--baseline', help="Previous JSON report to compare against")
+    parser.add_argument('--run', nargs=2, metavar=('KIND', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_fixture(args.run[0], args.run[1], args)))
+        return
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': {key: value for key, value in vars(args).items()
+                       if key not in ('run', 'output', 'baseline')},
+        },
+        'results': [],
+    }
+
+    forwarded = []
+    for key in ('repeats', 'parse_repeats', 'budget', 'fetch_latency', 'model_latency',
+                'rate_429', 'max_chunks', 'workers', 'seed'):
+        forwarded += ['--' + key.replace('_', '-'), str(getattr(args, key))]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # Nothing may be served from, or left in, the real caches; the fake
+        # model has no token quota, only its simulated 429s, and every page
+        # comes from the fake browser
+        env = dict(os.environ, DATAHAWK_CACHE_DIR=cache_dir, PAGE_CACHE='0', GEMINI_CACHE='0',
+                   GEMINI_TPM='0', GEMINI_DAILY_TOKENS='0', FETCH_HTTP='0',
+                   GEMINI_API_KEY=os.environ.get('GEMINI_API_KEY', 'offline-benchmark'))
+        for size_name in args.sizes:
+            for kind in args.kinds:
+                output = subprocess.check_output(
+                    [sys.executable, os.path.abspath(__file__), '--run', kind, size_name] + forwarded,
+                    env=env, stderr=subprocess.DEVNULL
+                )
+                result = json.loads(output.decode().strip().splitlines()[-1])
+                report['results'].append(result)
+                parse_stage = result['stages']['parse_with_gemini']
+                print(f"{kind:>8} {size_name:>5}  clean {result['stages']['html_to_text']['p50_s']:.3f}s  "
+                      f"parse {parse_stage['p50_s']:.3f}s  peak {result['peak_rss_mb']} MB", file=sys.stderr)
+
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(encoded + "\n")
+    else:
+        print(encoded)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
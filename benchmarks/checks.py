@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+Offline correctness checks for the extraction helpers and the concurrency
+and rate-limit code: no browser, no model, no network. Exits non-zero
+when any check fails.
+
+    python benchmarks/checks.py
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+# Keep the on-disk caches the imported modules open out of the real cache directory
+os.environ.setdefault('DATAHAWK_CACHE_DIR', tempfile.mkdtemp(prefix='datahawk-checks-'))
+
+failures = []
+
+
+def check(name, condition, detail=""):
+    print(f"{'ok  ' if condition else 'FAIL'} {name}" + (f": {detail}" if detail and not condition else ""))
+    if not condition:
+        failures.append(name)
+
+
+def check_dedup():
+    from dedup import dedupe_content
+
+    grid = "\n".join(
+        line
+        for name, price in [('Widget A', '$10.00'), ('Widget B', '$10.00'), ('Widget C', '$12.50'),
+                            ('Widget D', '$10.00')]
+        for line in (name, price, "In stock", "Add to cart")
+    )
+    kept, _ = dedupe_content(grid)
+    check("dedup keeps every field of product cards that share a price",
+          kept.count("$10.00") == 3 and kept.count("Add to cart") == 4, repr(kept))
+
+    listings = [
+        f"Samsung Galaxy S24 Ultra 256GB Titanium Black unlocked smartphone with S Pen, free delivery {price}"
+        for price in ('$1199', '$1099', '$999', '$899')
+    ]
+    kept, _ = dedupe_content("\n".join(listings))
+    check("dedup keeps listings that differ only in price", kept.split("\n") == listings, repr(kept))
+
+    banner = ("We use cookies to improve your experience on our website and to show you relevant offers",
+              "By continuing to browse you agree to our use of cookies and similar technologies",
+              "Read our privacy policy to learn more about how we use your information")
+    page = "\n".join(banner + ("Widget A", "$10.00") + banner + ("Widget B", "$12.00"))
+    kept, stats = dedupe_content(page)
+    check("dedup still drops a long repeated banner",
+          kept.count(banner[0]) == 1 and "Widget B" in kept and stats['duplicate_lines'] == 3, repr(kept))
+
+    from dedup import BoilerplateStore
+
+    store = BoilerplateStore(os.path.join(tempfile.mkdtemp(prefix='datahawk-checks-'), 'boilerplate.sqlite3'))
+    for n in range(1, 5):
+        cards = [line for name in ('A', 'B', 'C') for line in (f"Widget {n}{name}", "$10.00", "In stock", "Add to cart")]
+        kept, stats = dedupe_content("\n".join(banner + tuple(cards)), host='shop.test',
+                                     page=f"https://shop.test/c/{n}", store=store)
+    check("dedup keeps record fields shared by the host's other pages",
+          kept.count("$10.00") == 3 and kept.count("In stock") == 3, repr(kept))
+    check("dedup still drops a banner shared by the host's other pages",
+          banner[0] not in kept and stats['boilerplate_lines'] == 3, repr(stats))
+
+    notice = "Free shipping on all orders over $50 placed before 2pm, delivered within 3 working days across the country"
+    kept, stats = dedupe_content(notice + "\n" + notice.upper())
+    check("dedup still drops near-duplicate lines with the same numbers",
+          stats['near_duplicate_lines'] == 1, repr(kept))
+
+
+def check_formatting():
+    from formatting import format_results_as_table
+    from bench_format import legacy_format
+
+    cases = {
+        'short row': "a - 1 - x\nb - 2 - y\nshort - 3\nc - 3 - z",
+        'wide row': "a | 1\nb | 2\nc | 3 | extra\nd | 4",
+        'empty field': "a - 1 - x\nb -  - y\nc - 3 - z",
+        'blank lines and padding': "  Name | Price  \n\n Widget | $5 \n   \nGadget |  $7\n",
+        'two columns': "Color: red\nSize: large\nWeight: 2kg",
+        'prices': "Widget $10.99\nGadget $5.00\nGizmo $7.50",
+        'contacts': "Mail sales@example.com or call +1 555 123 4567",
+        'prose': "Nothing tabular here",
+    }
+    for name, text in cases.items():
+        new, _ = format_results_as_table(text)
+        old, _ = legacy_format(text)
+        # The legacy price regex let names start with the previous line's newline; cells are compared stripped
+        same = (new is None and old is None) or (
+            new is not None and old is not None and list(new.columns) == list(old.columns)
+            and [[cell.strip() for cell in row] for row in new.astype(str).values.tolist()]
+            == [[cell.strip() for cell in row] for row in old.astype(str).values.tolist()]
+        )
+        check(f"formatting matches the legacy formatter: {name}", same,
+              f"new={None if new is None else new.values.tolist()} old={None if old is None else old.values.tolist()}")
+
+
+def check_fastpath():
+    from fastpath import extract_phones, extract_prices, recognize
+
+    cases = {
+        "Call 555-123-4567.": ['555-123-4567'],
+        "Call +1 415 555 0132.": ['+1 415 555 0132'],
+        "Phone 020 7946 0958, fax 020 7946 0959.": ['020 7946 0958', '020 7946 0959'],
+        "Reach us on (02) 9374 4000. We reply within a day.": ['(02) 9374 4000'],
+        "Measured 120 4567.5 mm on the left side": [],
+        "Posted on 2024-02-02. Call 555-123-4567": ['555-123-4567'],
+        "Released 17.05.2024": [],
+        # Order numbers and SKUs look like phone numbers; the model decides
+        "Posted on 2024-02-02. Order 1234 5678 shipped. SKU 100-200-300. Call 555-123-4567": None,
+    }
+    for text, expected in cases.items():
+        found = extract_phones(text)
+        check(f"fast path phones: {text!r}", found == expected, f"got {found}")
+
+    check("fast path leaves bare numbers to the model", recognize("Extract all numbers") is None)
+    check("fast path still answers phone numbers", recognize("Extract all phone numbers") == {'phone'})
+    prices = extract_prices("Widget A $10.00\nWidget B $10.00\nWidget C $12.50")
+    check("fast path keeps every listing's price", prices == ['$10.00', '$10.00', '$12.50'], f"got {prices}")
+
+
+def check_schema():
+    from schema import infer_schema
+
+    # The web interface's own example prompts, with the Columns field left blank
+    cases = {
+        "Extract all product names and prices in table format": ['Product Name', 'Price'],
+        "Get article titles, authors, and dates as structured data": ['Article Title', 'Author', 'Date'],
+        "Find all contact details organized in table view": ['Contact Detail'],
+        "Extract job data in: Title | Company | Salary format": ['Title', 'Company', 'Salary'],
+        "Get product name | price | rating for easy viewing": ['Product Name', 'Price', 'Rating'],
+        "Find contact info: Name - Email - Phone structure": ['Name', 'Email', 'Phone'],
+        "List jobs as: Title | Company | Salary | Location": ['Title', 'Company', 'Salary', 'Location'],
+        "Get all job listings with salaries and locations": ['Job Listing', 'Salary', 'Location'],
+    }
+    for description, expected in cases.items():
+        columns = list(infer_schema(description))
+        check(f"inferred columns: {description!r}", columns == expected, f"got {columns}")
+
+
+def check_status():
+    from datahawk import ExtractionResult, StageError
+
+    def result(chunks, failed):
+        return ExtractionResult(url="", chunks=chunks,
+                                errors=[StageError('parse', "QuotaExceeded", chunk=i) for i in failed])
+
+    check("a page whose every chunk failed is an error", result(3, [0, 1, 2]).status == 'error')
+    check("a page with some failed chunks is partial", result(3, [1]).status == 'partial')
+    check("a page without errors is ok", result(3, []).status == 'ok')
+
+
+class _LateNavigationDriver:
+    """
+    A pooled session whose `get` returns before the new document commits,
+    like the remote browser with page_load_strategy 'none': the previous
+    page stays loaded (and complete) for a few more script calls.
+    """
+
+    def __init__(self, pages, commit_after=3):
+        self.pages = pages
+        self.commit_after = commit_after
+        self.page_source = "<html><body>previous page</body></html>"
+        self.marker = False
+        self.pending = None
+
+    def get(self, url):
+        self.pending, self.polls = url, 0
+
+    def execute_script(self, script, *args):
+        if self.pending is not None:
+            self.polls += 1
+            if self.polls > self.commit_after:
+                self.page_source, self.marker, self.pending = self.pages[self.pending], False, None
+        if '!== true' in script:
+            return not self.marker
+        if script.endswith('= true'):
+            self.marker = True
+            return None
+        if 'performance' in script:
+            return ['complete', 0]
+        return True
+
+
+def check_readiness():
+    from scrape import navigate, wait_until_ready
+
+    for ready in ('load', 'selector:.product', 'wait:0'):
+        driver = _LateNavigationDriver({'https://shop.test/b': "<html><body>page b</body></html>"})
+        navigate(driver, 'https://shop.test/b')
+        met = wait_until_ready(driver, ready, timeout=5)
+        check(f"readiness waits for the new document: {ready}", met and 'page b' in driver.page_source,
+              driver.page_source)
+
+
+def check_page_flight():
+    import threading
+    import time
+    import scrape
+
+    calls = []
+
+    def fake_fetch(website, ready=None, on_event=None):
+        calls.append(ready)
+        time.sleep(0.2)
+        return f"<html><body>{ready}</body></html>"
+
+    def fetch_concurrently(readies):
+        threads = [threading.Thread(target=scrape.scrape_website, args=("https://shop.test/",),
+                                    kwargs={'use_cache': False, 'ready': ready}) for ready in readies]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    original, scrape.fetch_tiered = scrape.fetch_tiered, fake_fetch
+    try:
+        fetch_concurrently([None, None, None])
+        check("concurrent fetches of a page share one fetch", len(calls) == 1, f"{len(calls)} fetches")
+        calls.clear()
+        fetch_concurrently([None, 'selector:.product'])
+        check("fetches with another readiness condition don't share", len(calls) == 2, f"{len(calls)} fetches")
+    finally:
+        scrape.fetch_tiered = original
+
+
+def check_cleaning():
+    from scrape import html_to_text
+
+    text = html_to_text(
+        '<html><body><p>Widget</p><span aria-hidden="true">$10.00</span>'
+        '<span hidden>old price</span><div style="display: none">popup</div>'
+        '<p style="VISIBILITY:hidden">tracker</p></body></html>'
+    )
+    check("cleaning keeps aria-hidden text that is on screen", text == "Widget\n$10.00", repr(text))
+
+
+def check_host_profiles():
+    from host_profiles import HostProfiles
+    from scrape import _UNKNOWN_COMMAND
+
+    profiles = HostProfiles(store=None)
+    for reason in ('status_404', 'network', 'not_html'):
+        profiles.record_http('shop.test', False, reason)
+    check("dead links don't send a host to the browser", not profiles.get('shop.test').needs_browser)
+    for reason in ('spa_shell', 'challenge'):
+        profiles.record_http('shop.test', False, reason)
+    check("client-rendered pages send a host to the browser", profiles.get('shop.test').needs_browser)
+
+    profiles.record_browser('shop.test', True, 'error')
+    check("a failed CAPTCHA check keeps the solver on", profiles.get('shop.test').captcha_solver)
+    profiles.record_browser('shop.test', True, 'unavailable')
+    check("a missing solver turns the CAPTCHA check off", not profiles.get('shop.test').captcha_solver)
+
+    check("an unknown CDP method means no solver",
+          _UNKNOWN_COMMAND.search("unknown error: {\"code\":-32601,\"message\":\"'Captcha.waitForSolve' wasn't found\"}"))
+    check("a timeout does not mean no solver", not _UNKNOWN_COMMAND.search("timeout: Timed out receiving message from renderer: 30.000"))
+
+
+class _FakeClock:
+    """Stands in for the `time` module: sleeping just moves the clock forward."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def check_scheduler():
+    import scheduler
+    from scheduler import QuotaExceeded, Scheduler, TokenBucket
+
+    clock = _FakeClock()
+    original, scheduler.time = scheduler.time, clock
+    try:
+        bucket = TokenBucket(1, 0.25)
+        waits = [bucket.reserve(1) for _ in range(3)]
+        check("token bucket queues callers at its rate", waits == [0.0, 4.0, 8.0], f"got {waits}")
+
+        paced = Scheduler(requests_per_minute=15, tokens_per_minute=0, daily_tokens=0, store=None)
+        for _ in range(3):
+            paced.call(lambda: ("ok", None))
+        check("scheduler spaces calls by the requests-per-minute limit", clock.slept == [4.0, 4.0],
+              f"slept {clock.slept}")
+
+        budget = Scheduler(requests_per_minute=0, tokens_per_minute=600, daily_tokens=1000, store=None)
+
+        def rejected():
+            raise ValueError("400 invalid argument")
+        try:
+            budget.call(rejected, estimated_tokens=100)
+            raised = False
+        except ValueError:
+            raised = True
+        remaining = budget.remaining()
+        check("a failed call refunds its tokens", raised and remaining['minute_tokens_available'] == 600
+              and remaining['daily_tokens_used'] == 0, repr(remaining))
+        budget.call(lambda: ("ok", 40), estimated_tokens=100)
+        remaining = budget.remaining()
+        check("a call is charged the tokens it really used", remaining['minute_tokens_available'] == 560
+              and remaining['daily_tokens_used'] == 40, repr(remaining))
+
+        called = []
+        try:
+            budget.call(lambda: called.append(1) or ("ok", 0), estimated_tokens=961)
+            raised = False
+        except QuotaExceeded:
+            raised = True
+        check("the daily budget raises QuotaExceeded before calling", raised and not called)
+
+        attempts, retries = [], []
+
+        def rate_limited():
+            attempts.append(clock.now)
+            if len(attempts) == 1:
+                raise Exception("429 Resource has been exhausted, retry in 7s")
+            return "ok", None
+        clock.slept.clear()
+        retrying = Scheduler(requests_per_minute=0, tokens_per_minute=0, daily_tokens=0, base_delay=2.0,
+                             store=None)
+        value = retrying.call(rate_limited, on_retry=lambda attempt, delay, e: retries.append(delay))
+        check("a 429 is retried after the delay the server asked for",
+              value == "ok" and len(retries) == 1 and 7 <= retries[0] <= 9 and attempts[1] - attempts[0] >= 7,
+              f"retries {retries}, attempts at {attempts}")
+        check("a 429 holds back the other workers too", retrying._paused_until >= attempts[0] + 7)
+    finally:
+        scheduler.time = original
+
+
+def check_singleflight():
+    import threading
+    import time
+    from singleflight import Group
+
+    group = Group('check')
+    release = threading.Event()
+    errors = {}
+    follower_calls = []
+
+    def leader():
+        release.wait(5)
+        raise RuntimeError("fetch failed")
+
+    def run(name, fn):
+        try:
+            group.do('page', fn)
+        except RuntimeError as e:
+            errors[name] = e
+
+    first = threading.Thread(target=run, args=('leader', leader))
+    first.start()
+    while not group.in_flight():
+        time.sleep(0.001)
+    second = threading.Thread(target=run, args=('follower', lambda: follower_calls.append(1)))
+    second.start()
+    while group._calls['page'].waiters < 1:
+        time.sleep(0.001)
+    release.set()
+    first.join()
+    second.join()
+    check("single-flight hands the leader's error to waiting callers",
+          errors.get('leader') is not None and errors.get('follower') is errors.get('leader')
+          and not follower_calls and group.in_flight() == 0, repr(errors))
+
+
+def check_driver_pool():
+    import driver_pool
+    from driver_pool import DriverPool
+
+    class Driver:
+        def __init__(self):
+            self.quit_called = False
+            self.healthy = True
+
+        def quit(self):
+            self.quit_called = True
+
+    clock = _FakeClock()
+    original, driver_pool.time = driver_pool.time, clock
+    pool = DriverPool(Driver, size=1, max_pages_per_session=2, idle_timeout=60,
+                      health_check=lambda driver: driver.healthy)
+    try:
+        first = pool.acquire()
+        pool.release(first)
+        reused = pool.acquire()
+        pool.release(reused)
+        check("the pool reuses a session until it has served max_pages_per_session pages",
+              reused is first and first.quit_called and pool.stats()['idle'] == 0, repr(pool.stats()))
+
+        second = pool.acquire()
+        pool.release(second, discard=True)
+        check("a discarded session is closed", second.quit_called and pool.stats()['idle'] == 0)
+
+        third = pool.acquire()
+        pool.release(third)
+        third.healthy = False
+        fourth = pool.acquire()
+        check("an unhealthy idle session is replaced", fourth is not third and third.quit_called)
+        pool.release(fourth)
+
+        clock.now += 61
+        pool.prune_idle()
+        check("sessions idle past idle_timeout are closed", fourth.quit_called and pool.stats()['idle'] == 0,
+              repr(pool.stats()))
+        check("the pool counts every session it created and recycled",
+              pool.stats()['created'] == 4 and pool.stats()['recycled'] == 4, repr(pool.stats()))
+    finally:
+        pool.close()
+        driver_pool.time = original
+
+
+def check_frontier():
+    import time
+    from crawler import Frontier
+
+    frontier = Frontier()
+    frontier.push("https://a.test/low", 1, priority=1.0)
+    frontier.push("https://a.test/high", 1, priority=0.0)
+    frontier.push("https://b.test/", 0)
+    first, second = frontier.pop(), frontier.pop()
+    check("the frontier hands out one page per host, best priority first",
+          first == ('a.test', "https://a.test/high", 1) and second[0] == 'b.test', f"{first}, {second}")
+    frontier.done('b.test')
+    frontier.done('a.test', delay=0.2)
+    started = time.monotonic()
+    third = frontier.pop()
+    waited = time.monotonic() - started
+    check("a host's next page waits for its crawl delay",
+          third == ('a.test', "https://a.test/low", 1) and waited >= 0.19, f"{third} after {waited:.2f}s")
+    frontier.done('a.test')
+    check("an empty frontier with nothing in flight is finished", frontier.pop() is None)
+
+
+def main():
+    check_dedup()
+    check_formatting()
+    check_fastpath()
+    check_schema()
+    check_status()
+    check_readiness()
+    check_cleaning()
+    check_page_flight()
+    check_scheduler()
+    check_singleflight()
+    check_driver_pool()
+    check_frontier()
+    check_host_profiles()
+    print(f"\n{len(failures)} failed" if failures else "\nAll checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
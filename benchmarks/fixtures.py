@@ -0,0 +1,109 @@
+"""
+Deterministic HTML fixtures for the benchmarks.
+
+Pages are generated rather than checked in so that 50 MB inputs don't
+bloat the repository; the same kind, size and seed always give the same
+bytes. `python benchmarks/fixtures.py DIR` writes them out for inspection.
+"""
+
+import os
+import random
+import sys
+
+KINDS = ('products', 'tables', 'articles')
+SIZES = {'10KB': 10 * 1024, '100KB': 100 * 1024, '1MB': 1024 ** 2, '10MB': 10 * 1024 ** 2, '50MB': 50 * 1024 ** 2}
+
+_WORDS = (
+    "data hawk market price review quality delivery customer service product order "
+    "shipping return policy warranty model color size stock offer discount premium "
+    "design feature battery screen camera storage memory performance update release"
+).split()
+
+_HEAD = (
+    "<!DOCTYPE html><html><head><meta charset='utf-8'><title>{title}</title>"
+    "<style>body{{font-family:sans-serif}} .hidden{{display:none}}</style>"
+    "<script>window.dataLayer = window.dataLayer || [];</script></head><body>"
+    "<nav><a href='/'>Home</a> <a href='/shop'>Shop</a> <a href='/blog'>Blog</a>"
+    " <a href='/contact'>Contact</a></nav>\n"
+)
+_FOOT = (
+    "<footer><p>Contact us: sales@example.com | +1 555 010 0200</p>"
+    "<p>&copy; 2024 Example Store. All rights reserved.</p></footer>"
+    "<script>track('pageview');</script></body></html>"
+)
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _product_card(rng, i):
+    return (
+        f"<div class='card' data-id='{i}'><h2 class='title'>Product {i} {rng.choice(_WORDS).title()}</h2>"
+        f"<span class='price'>${rng.randint(1, 999)}.{rng.randint(0, 99):02d}</span>"
+        f"<p class='rating'>Rating {rng.randint(1, 5)} of 5 &amp; free shipping</p>"
+        f"<p>{_sentence(rng)}</p>"
+        f"<script>track({i})</script><noscript>Enable JavaScript</noscript>"
+        f"<svg viewBox='0 0 10 10'><path d='M0 0L10 10'/></svg>"
+        f"<div style='display:none'>tracking pixel {i}</div></div>\n"
+    )
+
+
+def _table_block(rng, i, rows=50):
+    body = "".join(
+        f"<tr><td>Item {i}-{r}</td><td>{rng.choice(_WORDS)}</td>"
+        f"<td>${rng.randint(1, 999)}.{rng.randint(0, 99):02d}</td><td>{rng.randint(0, 500)}</td></tr>"
+        for r in range(rows)
+    )
+    return (
+        f"<h3>Price list {i}</h3><table class='prices'><thead><tr><th>Name</th><th>Category</th>"
+        f"<th>Price</th><th>Stock</th></tr></thead><tbody>{body}</tbody></table>\n"
+    )
+
+
+def _article_section(rng, i):
+    paragraphs = "".join(f"<p>{' '.join(_sentence(rng, rng.randint(8, 20)) for _ in range(5))}</p>"
+                         for _ in range(4))
+    return (
+        f"<article><h2>Chapter {i}: {_sentence(rng, 4)}</h2>"
+        f"<p class='byline'>By Author {i % 17} on 2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}</p>"
+        f"{paragraphs}<aside hidden>Related: {_sentence(rng, 6)}</aside></article>\n"
+    )
+
+
+_BLOCKS = {'products': _product_card, 'tables': _table_block, 'articles': _article_section}
+
+
+def make_fixture(kind, size_bytes, seed=0):
+    """An HTML page of `kind` that is roughly `size_bytes` long."""
+    rng = random.Random(f"{kind}-{size_bytes}-{seed}")
+    block = _BLOCKS[kind]
+    parts = [_HEAD.format(title=f"{kind.title()} fixture")]
+    size = len(parts[0]) + len(_FOOT)
+    i = 0
+    while size < size_bytes:
+        part = block(rng, i)
+        parts.append(part)
+        size += len(part)
+        i += 1
+    parts.append(_FOOT)
+    return "".join(parts)
+
+
+def fixture_url(kind, size_name):
+    return f"https://fixtures.datahawk.test/{kind}/{size_name}.html"
+
+
+def main():
+    out_dir = sys.argv[1] if len(sys.argv) > 1 else 'fixtures'
+    os.makedirs(out_dir, exist_ok=True)
+    for kind in KINDS:
+        for size_name, size_bytes in SIZES.items():
+            path = os.path.join(out_dir, f"{kind}-{size_name}.html")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(make_fixture(kind, size_bytes))
+            print(path)
+
+
+if __name__ == "__main__":
+    main()
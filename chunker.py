@@ -0,0 +1,109 @@
+# Rough characters-per-token ratio of Gemini's tokenizer on web text
+CHARS_PER_TOKEN = 4
+
+# Content tokens per chunk for each model, leaving room for the prompt and answer
+MODEL_CHUNK_TOKENS = {
+    'gemini-1.5-flash': 8000,
+    'gemini-1.5-flash-8b': 8000,
+    'gemini-1.5-pro': 16000,
+}
+DEFAULT_CHUNK_TOKENS = 4000
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate that never needs an API call.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def chunk_budget(model_name):
+    return MODEL_CHUNK_TOKENS.get(model_name, DEFAULT_CHUNK_TOKENS)
+
+
+def _split_long_line(line, max_tokens, count):
+    """
+    Break a line that exceeds the budget at word boundaries, slicing only
+    words that are themselves too long.
+    """
+    pieces = []
+    current = ""
+    for word in line.split(" "):
+        candidate = f"{current} {word}" if current else word
+        if count(candidate) <= max_tokens:
+            current = candidate
+            continue
+        if current:
+            pieces.append(current)
+        # A single word over the budget is sliced proportionally
+        while count(word) > max_tokens:
+            cut = max(1, len(word) * max_tokens // count(word))
+            pieces.append(word[:cut])
+            word = word[cut:]
+        current = word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_text(text, max_tokens, overlap_tokens=0, count=estimate_tokens):
+    """
+    Pack whole lines of `text` into chunks of at most `max_tokens`.
+
+    Records and words are only split when a single line is larger than the
+    budget itself. `count` measures a piece of text (pass `len` for a character budget).
+    With `overlap_tokens`, each chunk starts with trailing lines of the
+    previous chunk worth up to that many tokens.
+    """
+    separator = count("\n")
+    chunks = []
+    current = []
+    size = 0
+
+    def flush():
+        nonlocal current, size
+        chunks.append("\n".join(current))
+        carried = []
+        carried_size = 0
+        if overlap_tokens:
+            for line in reversed(current):
+                line_size = count(line) + separator
+                if carried_size + line_size > overlap_tokens:
+                    break
+                carried.insert(0, line)
+                carried_size += line_size
+        current = carried
+        size = carried_size
+
+    for line in text.split("\n"):
+        for piece in _split_long_line(line, max_tokens, count) if count(line) > max_tokens else [line]:
+            piece_size = count(piece) + (separator if current else 0)
+            if current and size + piece_size > max_tokens:
+                flush()
+                # Drop carried overlap that would leave no room for this piece
+                while current and size + count(piece) + separator > max_tokens:
+                    size -= count(current.pop(0)) + separator
+                piece_size = count(piece) + (separator if current else 0)
+            current.append(piece)
+            size += piece_size
+
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def plan_chunks(text, model_name, max_tokens=None, overlap_tokens=0):
+    """
+    Chunk `text` for `model_name` and describe the plan before any API call.
+    """
+    max_tokens = max_tokens or chunk_budget(model_name)
+    chunks = chunk_text(text, max_tokens, overlap_tokens=overlap_tokens)
+    tokens = [estimate_tokens(chunk) for chunk in chunks]
+    return {
+        'chunks': chunks,
+        'count': len(chunks),
+        'tokens': tokens,
+        'total_tokens': sum(tokens),
+        'max_tokens': max_tokens,
+        'overlap_tokens': overlap_tokens,
+    }
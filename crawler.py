@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+"""
+DataHawk Crawler
+Follow links from a start page and extract the same description from every page found.
+
+    python crawler.py https://example.com "Extract all product names and prices" -o site.jsonl
+"""
+
+import argparse
+import gzip
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import queue
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from urllib.parse import urldefrag, urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+from dotenv import load_dotenv
+from lxml import etree, html as lxml_html
+
+import metrics
+from cache import CACHE_DIR, SQLiteCache
+from datahawk import ExtractionResult, Pipeline, StageError
+from events import emit
+from scrape import normalize_url
+from singleflight import Group
+
+load_dotenv()
+
+# Crawl limits
+CRAWL_MAX_PAGES = int(os.getenv('CRAWL_MAX_PAGES', '100'))
+CRAWL_MAX_DEPTH = int(os.getenv('CRAWL_MAX_DEPTH', '2'))
+# Pages fetched at once; at most one per host, so this is spread over hosts
+CRAWL_CONCURRENCY = int(os.getenv('CRAWL_CONCURRENCY', '8'))
+# Seconds between two requests to the same host, unless robots.txt asks for more
+CRAWL_HOST_DELAY = float(os.getenv('CRAWL_HOST_DELAY', '1.0'))
+CRAWL_USER_AGENT = os.getenv('CRAWL_USER_AGENT', 'DataHawkBot')
+CRAWL_ROBOTS_TTL = int(os.getenv('CRAWL_ROBOTS_TTL', str(24 * 3600)))
+# Seen URLs kept in memory before the rest spill to a temporary SQLite file
+CRAWL_SEEN_MEMORY = int(os.getenv('CRAWL_SEEN_MEMORY', '100000'))
+
+# Sitemap files read per site (a sitemap index can point at many)
+MAX_SITEMAP_FILES = 20
+HTTP_TIMEOUT = 10
+
+# Links to files the browser can't turn into page text
+_SKIP_EXTENSIONS = re.compile(
+    r'\.(?:jpe?g|png|gif|webp|svg|ico|bmp|pdf|zip|gz|tgz|rar|7z|exe|dmg|msi|mp[34]|avi|mov|wmv|webm'
+    r'|wav|ogg|woff2?|ttf|eot|css|js|json|xml|rss|atom|docx?|xlsx?|pptx?|csv)$',
+    re.IGNORECASE
+)
+_WORD = re.compile(r'[a-z0-9]+')
+_XML_PARSER = etree.XMLParser(recover=True, resolve_entities=False, no_network=True, huge_tree=True)
+
+
+def _http_get(url, timeout=HTTP_TIMEOUT):
+    """
+    Plain HTTP GET for robots.txt and sitemaps, which don't need a browser.
+    Returns (status, body); status is None when the host could not be reached.
+    """
+    request = urllib.request.Request(url, headers={'User-Agent': CRAWL_USER_AGENT, 'Accept-Encoding': 'gzip'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = response.read()
+            if response.headers.get('Content-Encoding') == 'gzip' or body[:2] == b'\x1f\x8b':
+                body = gzip.decompress(body)
+            return response.status, body
+    except urllib.error.HTTPError as e:
+        return e.code, b""
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        print(f"Could not fetch {url}: {str(e)}")
+        return None, b""
+
+
+def _origin(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class RobotsCache:
+    """
+    robots.txt rules per origin, fetched once and kept in memory and in a
+    SQLite cache for `ttl` seconds. Following RFC 9309, a missing robots.txt
+    (4xx) allows everything and a server error (5xx) disallows everything;
+    an unreachable host is treated as allowing everything, since the browser
+    may still reach it through the proxy.
+    """
+
+    def __init__(self, user_agent=CRAWL_USER_AGENT, ttl=CRAWL_ROBOTS_TTL, store=None):
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.store = store
+        self._parsers = {}
+        self._lock = threading.Lock()
+        self._flight = Group('robots')
+
+    def _download(self, origin):
+        status, body = _http_get(origin + '/robots.txt')
+        if status is not None and 500 <= status < 600:
+            return {'rule': 'disallow_all', 'body': ""}
+        if status != 200:
+            return {'rule': 'allow_all', 'body': ""}
+        return {'rule': None, 'body': body.decode('utf-8', errors='replace')}
+
+    def _load(self, origin):
+        cached = self.store.get(origin) if self.store else None
+        if cached is not None:
+            entry = json.loads(cached.decode('utf-8'))
+        else:
+            entry = self._download(origin)
+            if self.store:
+                self.store.set(origin, json.dumps(entry).encode('utf-8'), ttl=self.ttl)
+        parser = RobotFileParser(origin + '/robots.txt')
+        if entry['rule'] == 'disallow_all':
+            parser.disallow_all = True
+        elif entry['rule'] == 'allow_all':
+            parser.allow_all = True
+        parser.parse(entry['body'].splitlines())
+        return parser
+
+    def parser(self, url):
+        origin = _origin(url)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._parsers.get(origin)
+        if entry is not None and now - entry[1] < self.ttl:
+            return entry[0]
+        # Many workers reaching a new host at once fetch its robots.txt once
+        parser, _ = self._flight.do(origin, lambda: self._load(origin))
+        with self._lock:
+            self._parsers[origin] = (parser, now)
+        return parser
+
+    def allowed(self, url):
+        return self.parser(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url):
+        """Seconds robots.txt asks between requests (Crawl-delay or Request-rate), or None."""
+        parser = self.parser(url)
+        delay = parser.crawl_delay(self.user_agent)
+        if delay is not None:
+            return float(delay)
+        rate = parser.request_rate(self.user_agent)
+        if rate is not None and rate.requests:
+            return rate.seconds / rate.requests
+        return None
+
+    def sitemaps(self, url):
+        return self.parser(url).site_maps() or []
+
+
+robots_cache = RobotsCache(store=SQLiteCache(os.path.join(CACHE_DIR, 'robots.sqlite3'), default_ttl=CRAWL_ROBOTS_TTL))
+
+
+def sitemap_urls(start_url, robots=None, limit=CRAWL_MAX_PAGES):
+    """
+    Page URLs listed in the site's sitemaps (those named in robots.txt, or
+    /sitemap.xml), following sitemap indexes, up to `limit` URLs.
+    """
+    robots = robots or robots_cache
+    pending = robots.sitemaps(start_url) or [_origin(start_url) + '/sitemap.xml']
+    visited = set()
+    found = []
+    while pending and len(visited) < MAX_SITEMAP_FILES and len(found) < limit:
+        sitemap = pending.pop(0)
+        if sitemap in visited:
+            continue
+        visited.add(sitemap)
+        status, body = _http_get(sitemap)
+        if status != 200 or not body:
+            continue
+        try:
+            root = etree.fromstring(body, _XML_PARSER)
+        except etree.XMLSyntaxError:
+            continue
+        if root is None:
+            continue
+        locations = [loc.text.strip() for loc in root.iter('{*}loc') if loc.text and loc.text.strip()]
+        if etree.QName(root).localname == 'sitemapindex':
+            pending.extend(locations)
+        else:
+            found.extend(locations[:limit - len(found)])
+    return found
+
+
+def extract_links(html, base_url):
+    """
+    Absolute http(s) links of a page, without fragments, nofollow links or
+    links to images, archives and other non-page files; with anchor text.
+    """
+    if not html:
+        return []
+    try:
+        document = lxml_html.fromstring(html)
+    except (etree.ParserError, ValueError):
+        return []
+    base = document.xpath('string(//base/@href)').strip()
+    base_url = urljoin(base_url, base) if base else base_url
+    links = []
+    for anchor in document.xpath('//a[@href]'):
+        if 'nofollow' in (anchor.get('rel') or '').lower().split():
+            continue
+        href = anchor.get('href').strip()
+        if not href or href.startswith(('javascript:', 'mailto:', 'tel:', 'data:')):
+            continue
+        url, _ = urldefrag(urljoin(base_url, href))
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or _SKIP_EXTENSIONS.search(parts.path):
+            continue
+        links.append((url, anchor.text_content().strip()))
+    return links
+
+
+class SeenURLs:
+    """
+    Normalized URLs already queued. Compact digests are kept in a set until
+    `max_memory` of them, then moved to a temporary SQLite file so huge
+    crawls don't grow memory without bound.
+    """
+
+    def __init__(self, max_memory=CRAWL_SEEN_MEMORY):
+        self.max_memory = max_memory
+        self.count = 0
+        self._memory = set()
+        self._db = None
+        self._path = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(url):
+        return hashlib.sha1(normalize_url(url).encode('utf-8')).digest()[:12]
+
+    def add(self, url):
+        """Remember `url`; True if it had not been seen before."""
+        key = self._key(url)
+        with self._lock:
+            if key in self._memory:
+                return False
+            if self._db is not None and self._db.execute("SELECT 1 FROM seen WHERE key = ?", (key,)).fetchone():
+                return False
+            self._memory.add(key)
+            self.count += 1
+            if len(self._memory) >= self.max_memory:
+                self._spill()
+            return True
+
+    def _spill(self):
+        if self._db is None:
+            fd, self._path = tempfile.mkstemp(prefix='datahawk-seen-', suffix='.sqlite3')
+            os.close(fd)
+            self._db = sqlite3.connect(self._path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS seen (key BLOB PRIMARY KEY) WITHOUT ROWID")
+        self._db.executemany("INSERT OR IGNORE INTO seen (key) VALUES (?)", ((key,) for key in self._memory))
+        self._db.commit()
+        self._memory.clear()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                os.remove(self._path)
+                self._db = None
+
+
+class Frontier:
+    """
+    URLs waiting to be fetched: a priority queue per host, and hosts handed
+    out in the order they become due. A host has at most one page in flight
+    and is due again `delay` seconds after that page finishes, so many
+    hosts are crawled in parallel while each one is visited politely.
+    """
+
+    def __init__(self):
+        self._hosts = {}
+        self._due = []
+        self._next_allowed = {}
+        self._busy = set()
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self.closed = False
+
+    def push(self, url, depth, priority=0.0):
+        host = urlsplit(url).netloc
+        with self._cond:
+            pending = self._hosts.setdefault(host, [])
+            heapq.heappush(pending, (priority, next(self._order), url, depth))
+            if len(pending) == 1 and host not in self._busy:
+                heapq.heappush(self._due, (self._next_allowed.get(host, 0.0), host))
+                self._cond.notify()
+
+    def pop(self):
+        """
+        Wait for the next (host, url, depth) that may be fetched now. Returns
+        None once the frontier is closed, or empty with nothing in flight.
+        """
+        with self._cond:
+            while True:
+                if self.closed:
+                    return None
+                if self._due:
+                    due_at, host = self._due[0]
+                    wait = due_at - time.monotonic()
+                    if wait <= 0:
+                        heapq.heappop(self._due)
+                        self._busy.add(host)
+                        _, _, url, depth = heapq.heappop(self._hosts[host])
+                        return host, url, depth
+                    self._cond.wait(wait)
+                elif not self._busy:
+                    return None
+                else:
+                    self._cond.wait()
+
+    def done(self, host, delay=0.0):
+        """Mark the host's page finished; its next URL is due after `delay` seconds."""
+        with self._cond:
+            self._busy.discard(host)
+            self._next_allowed[host] = time.monotonic() + delay
+            if self._hosts.get(host):
+                heapq.heappush(self._due, (self._next_allowed[host], host))
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return sum(len(pending) for pending in self._hosts.values())
+
+
+@dataclass
+class CrawlPage:
+    """One crawled page: its extraction result and where it sat in the crawl."""
+    url: str
+    depth: int
+    result: ExtractionResult
+    links: int = 0
+
+
+def _same_site(host, allowed_hosts):
+    host = host.lower()
+    host = host[4:] if host.startswith('www.') else host
+    return any(host == allowed or host.endswith('.' + allowed) for allowed in allowed_hosts)
+
+
+class Crawler:
+    """
+    Breadth-first-ish crawl on top of the pipeline's fetch path (page cache,
+    browser pool, request coalescing): links are followed up to `max_depth`
+    and `max_pages`, robots.txt is honoured, sitemaps seed the frontier and
+    each host gets `delay` seconds (or its Crawl-delay) between requests.
+    """
+
+    def __init__(self, pipeline=None, max_pages=CRAWL_MAX_PAGES, max_depth=CRAWL_MAX_DEPTH,
+                 same_domain=True, concurrency=CRAWL_CONCURRENCY, delay=CRAWL_HOST_DELAY,
+                 use_sitemaps=True, respect_robots=True, robots=None):
+        self.pipeline = pipeline or Pipeline()
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.same_domain = same_domain
+        self.concurrency = concurrency
+        self.delay = delay
+        self.use_sitemaps = use_sitemaps
+        self.respect_robots = respect_robots
+        self.robots = robots or robots_cache
+
+    def _priority(self, url, anchor, depth, keywords):
+        # Shallow pages first; links whose URL or text mention the description jump ahead
+        if not keywords:
+            return float(depth)
+        words = set(_WORD.findall((url + " " + anchor).lower()))
+        return depth - 0.5 * min(len(words & keywords), 2)
+
+    def crawl(self, start_urls, description=None, columns=None, on_event=None):
+        """
+        Crawl from `start_urls` (one URL or a list) and yield a CrawlPage per
+        page as it finishes. With a `description`, every page is also parsed
+        like `Pipeline.extract`. Stopping the iteration stops the crawl.
+        """
+        if isinstance(start_urls, str):
+            start_urls = [start_urls]
+        start_urls = [url if url.startswith(('http://', 'https://')) else 'https://' + url for url in start_urls]
+        allowed_hosts = {urlsplit(url).hostname.lower().removeprefix('www.') for url in start_urls}
+        keywords = {word for word in _WORD.findall((description or "").lower()) if len(word) > 3}
+
+        frontier = Frontier()
+        seen = SeenURLs()
+        results = queue.Queue()
+        scheduled = itertools.count(1)
+        counter_lock = threading.Lock()
+
+        def in_scope(url):
+            return not self.same_domain or _same_site(urlsplit(url).hostname or "", allowed_hosts)
+
+        def enqueue(url, depth, anchor=""):
+            if in_scope(url) and seen.add(url):
+                frontier.push(url, depth, self._priority(url, anchor, depth, keywords))
+
+        for url in start_urls:
+            enqueue(url, 0)
+        if self.use_sitemaps:
+            for url in start_urls:
+                with metrics.span('sitemap', url=url) as sitemap_span:
+                    listed = sitemap_urls(url, self.robots, limit=self.max_pages)
+                    sitemap_span.attrs['urls'] = len(listed)
+                for listed_url in listed:
+                    enqueue(listed_url, 1)
+                emit(on_event, 'crawl', 'sitemap', url=url, urls=len(listed))
+
+        def visit(host, url, depth):
+            if self.respect_robots and not self.robots.allowed(url):
+                metrics.count('robots_blocked')
+                emit(on_event, 'crawl', 'blocked', url=url)
+                return None, 0.0
+            delay = self.delay
+            if self.respect_robots:
+                delay = max(delay, self.robots.crawl_delay(url) or 0.0)
+
+            result = self.pipeline.fetch(url)
+            links = 0
+            if result.html and depth < self.max_depth:
+                for link, anchor in extract_links(result.html, url):
+                    links += 1
+                    enqueue(link, depth + 1, anchor)
+            metrics.count('pages_crawled')
+            return CrawlPage(url=url, depth=depth, result=result, links=links), delay
+
+        def parse(page):
+            result = page.result
+            if description and result.ok:
+                try:
+                    self.pipeline.parse(result.content, description, result=result, html=result.html,
+                                        columns=columns)
+                except Exception as e:
+                    result.errors.append(StageError('parse', str(e)))
+
+        def worker():
+            while True:
+                item = frontier.pop()
+                if item is None:
+                    break
+                host, url, depth = item
+                page, delay = None, self.delay
+                try:
+                    with counter_lock:
+                        if next(scheduled) > self.max_pages:
+                            frontier.close()
+                            break
+                    page, delay = visit(host, url, depth)
+                except Exception as e:
+                    result = ExtractionResult(url=url)
+                    result.errors.append(StageError('crawl', str(e)))
+                    page = CrawlPage(url=url, depth=depth, result=result)
+                finally:
+                    frontier.done(host, delay)
+                if page is not None:
+                    # The host is free again: the model call doesn't hold up its next fetch
+                    parse(page)
+                    results.put(page)
+            results.put(None)
+
+        emit(on_event, 'crawl', 'started', urls=start_urls, queued=len(frontier))
+        workers = max(1, self.concurrency)
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='datahawk-crawl')
+        pages = 0
+        try:
+            for _ in range(workers):
+                executor.submit(worker)
+            finished = 0
+            while finished < workers:
+                page = results.get()
+                if page is None:
+                    finished += 1
+                    continue
+                pages += 1
+                emit(on_event, 'crawl', 'page', url=page.url, depth=page.depth, pages=pages,
+                     queued=len(frontier), status=page.result.status)
+                yield page
+            emit(on_event, 'crawl', 'finished', pages=pages, seen=seen.count)
+        finally:
+            frontier.close()
+            executor.shutdown(wait=False, cancel_futures=True)
+            seen.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl a site and run a DataHawk extraction on every page.")
+    parser.add_argument('url', help="Start page (more can be given with --seed)")
+    parser.add_argument('description', nargs='?', help="What to extract from every page (omit to only crawl)")
+    parser.add_argument('-o', '--output', default='datahawk_crawl.jsonl', help="JSONL output file")
+    parser.add_argument('--seed', action='append', default=[], help="Additional start URL")
+    parser.add_argument('--max-pages', type=int, default=CRAWL_MAX_PAGES)
+    parser.add_argument('--max-depth', type=int, default=CRAWL_MAX_DEPTH)
+    parser.add_argument('-c', '--concurrency', type=int, default=CRAWL_CONCURRENCY, help="Pages fetched at once")
+    parser.add_argument('--delay', type=float, default=CRAWL_HOST_DELAY, help="Seconds between requests to a host")
+    parser.add_argument('--all-domains', action='store_true', help="Follow links to other sites too")
+    parser.add_argument('--no-sitemap', action='store_true', help="Don't seed the crawl from sitemap.xml")
+    parser.add_argument('--columns', help="Comma-separated output columns (JSON rows)")
+    parser.add_argument('--refresh', action='store_true', help="Ignore cached pages and refetch")
+    args = parser.parse_args()
+
+    metrics.start_server()
+    crawler = Crawler(
+        pipeline=Pipeline(refresh=args.refresh, structured=bool(args.columns)),
+        max_pages=args.max_pages, max_depth=args.max_depth, same_domain=not args.all_domains,
+        concurrency=args.concurrency, delay=args.delay, use_sitemaps=not args.no_sitemap
+    )
+    counts = {'ok': 0, 'partial': 0, 'error': 0}
+    print(f"🕸️ Crawling {args.url} (up to {args.max_pages} pages, depth {args.max_depth})")
+    with open(args.output, 'w', encoding='utf-8') as out:
+        for done, page in enumerate(crawler.crawl([args.url] + args.seed, args.description, args.columns), start=1):
+            record = page.result.to_dict()
+            # The raw and cleaned page are intermediate products, keep the output lean
+            record.pop('content', None)
+            record.pop('html', None)
+            record.update(url=page.url, depth=page.depth, links=page.links)
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            counts[record['status']] += 1
+            print(f"[{done}] depth {page.depth} {record['status']}: {page.url}")
+    print(f"✅ Done: {counts['ok']} ok, {counts['partial']} partial, {counts['error']} failed -> {args.output}")
+    return 1 if counts['error'] and not (counts['ok'] or counts['partial']) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
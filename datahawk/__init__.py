@@ -0,0 +1,12 @@
+"""
+DataHawk extraction pipeline as an importable library.
+
+    from datahawk import extract
+
+    result = extract("https://example.com", "Extract all product names and prices")
+    print(result.text, result.rows, result.timings, result.errors)
+"""
+
+from datahawk.pipeline import ExtractionResult, Pipeline, StageError, extract
+
+__all__ = ['ExtractionResult', 'Pipeline', 'StageError', 'extract']
@@ -0,0 +1,265 @@
+import time
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+import metrics
+from chunker import plan_chunks
+from dedup import boilerplate_store, dedupe_content
+from events import emit
+from fastpath import try_fast_path
+from formatting import format_results_as_table, rows_to_text
+from parse import GEMINI_MAX_WORKERS, MODEL_NAME, iter_parse_chunks
+from relevance import RelevanceIndex
+from schema import infer_schema, normalize_schema
+from scrape import html_to_text, normalize_url, scrape_website
+
+
+# Nullable pandas dtypes for the column types a schema can declare
+_DTYPES = {'string': 'string', 'number': 'Float64', 'integer': 'Int64', 'boolean': 'boolean'}
+
+
+@dataclass
+class StageError:
+    """A failure in one pipeline stage; `chunk` is set for per-chunk parse failures."""
+    stage: str
+    message: str
+    chunk: Optional[int] = None
+
+
+@dataclass
+class ExtractionResult:
+    """Everything one extraction produced, including partial output on failure."""
+    url: str
+    description: str = ""
+    content: str = ""
+    html: str = field(default="", repr=False)
+    text: str = ""
+    columns: List[str] = field(default_factory=list)
+    rows: List[dict] = field(default_factory=list)
+    schema: dict = field(default_factory=dict)
+    chunks: int = 0
+    skipped_chunks: int = 0
+    fast_path: str = ""
+    dedup: dict = field(default_factory=dict)
+    timings: dict = field(default_factory=dict)
+    metrics: dict = field(default_factory=dict)
+    errors: List[StageError] = field(default_factory=list)
+
+    @property
+    def status(self):
+        """'ok', 'partial' when some chunks failed, or 'error' when nothing usable came out."""
+        if any(error.chunk is None for error in self.errors):
+            return 'error'
+        failed_chunks = {error.chunk for error in self.errors}
+        if self.chunks and len(failed_chunks) >= self.chunks:
+            return 'error'
+        return 'partial' if self.errors else 'ok'
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def to_dataframe(self):
+        """Rows as a DataFrame, or None when the output was not tabular."""
+        if not self.rows:
+            return None
+        df = pd.DataFrame(self.rows, columns=self.columns)
+        if self.schema:
+            df = df.astype({name: _DTYPES[kind] for name, kind in self.schema.items()})
+        return df
+
+    def to_dict(self):
+        record = asdict(self)
+        record['status'] = self.status
+        return record
+
+
+class Pipeline:
+    """
+    Fetch -> clean -> chunk -> parse -> format, without any UI.
+
+    `fetch` and `parse` can be called separately (the web interface fetches
+    once and parses many times); `extract` runs both. With `structured=True`
+    the model answers in JSON rows whose columns are inferred from the
+    description when no `columns` are passed to parse.
+    """
+
+    def __init__(self, max_tokens=None, overlap_tokens=0, max_workers=GEMINI_MAX_WORKERS,
+                 use_cache=True, refresh=False, select_relevant=True, min_relevance=0.15,
+                 dedupe=True, fast_path=True, structured=False):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.max_workers = max_workers
+        self.use_cache = use_cache
+        self.refresh = refresh
+        self.select_relevant = select_relevant
+        self.min_relevance = min_relevance
+        self.dedupe = dedupe
+        self.fast_path = fast_path
+        self.structured = structured
+
+    def fetch(self, url, result=None, on_event=None):
+        """Fetch and clean `url`, filling `result.content`; progress goes to `on_event`."""
+        if not url.startswith(('http://', 'https://')):
+            url = 'https://' + url
+        result = result or ExtractionResult(url=url)
+        with metrics.run('fetch', url=url) as trace:
+            self._fetch(url, result, on_event)
+        trace.summary(into=result.metrics)
+        return result
+
+    def _fetch(self, url, result, on_event):
+        started = time.perf_counter()
+        html = scrape_website(url, use_cache=self.use_cache, refresh=self.refresh,
+                              on_event=on_event)
+        result.timings['fetch'] = time.perf_counter() - started
+        if not html or html.startswith("Error"):
+            result.errors.append(StageError('fetch', html or "Empty response"))
+            return
+
+        with metrics.span('clean', bytes=len(html)) as clean_span:
+            content = html_to_text(html)
+            if content.startswith("Error") or content == "No body content found.":
+                metrics.fail(clean_span, content)
+        result.timings['clean'] = clean_span.duration
+        if clean_span.error:
+            result.errors.append(StageError('clean', content))
+            emit(on_event, 'clean', 'failed', error=content)
+            return
+        result.html = html
+        emit(on_event, 'clean', 'finished', bytes=len(html), chars=len(content))
+
+        if self.dedupe:
+            with metrics.span('dedup') as dedup_span:
+                content, result.dedup = dedupe_content(
+                    content, host=urlsplit(url).hostname, page=normalize_url(url), store=boilerplate_store
+                )
+            result.timings['dedup'] = dedup_span.duration
+            emit(on_event, 'dedup', 'finished', **result.dedup)
+
+        result.content = content
+
+    def plan(self, content):
+        """Chunk plan for `content` (count and token estimates) before any API call."""
+        return plan_chunks(content, MODEL_NAME, max_tokens=self.max_tokens,
+                           overlap_tokens=self.overlap_tokens)
+
+    def index(self, chunk_plan):
+        """Relevance index over a chunk plan; build it once per fetched page."""
+        return RelevanceIndex(chunk_plan['chunks'])
+
+    def parse(self, content, description, result=None, chunk_plan=None, index=None,
+              parse_all=False, html=None, columns=None, on_event=None):
+        """
+        Extract `description` from cleaned `content`.
+
+        Pass a `chunk_plan` from `plan` and an `index` from `index` to reuse
+        them. Unless `parse_all` is set (or the pipeline was built with
+        `select_relevant=False`), chunks that score too low for the
+        description are skipped. With the page's raw `html`, descriptions
+        the rules in fastpath.py can answer (emails, phones, prices, links,
+        tables, CSS selectors) skip the model entirely. `columns` (names, a
+        {name: type} dict or "Name, Price") asks the model for JSON rows with
+        exactly those columns instead of free text. Parse progress events go
+        to `on_event`.
+        """
+        result = result or ExtractionResult(url="", content=content)
+        for _ in self.iter_parse(content, description, result=result, chunk_plan=chunk_plan,
+                                 index=index, parse_all=parse_all, html=html, columns=columns,
+                                 on_event=on_event):
+            pass
+        return result
+
+    def iter_parse(self, content, description, result=None, chunk_plan=None, index=None,
+                   parse_all=False, html=None, columns=None, ordered=False, stream=False,
+                   on_event=None):
+        """
+        Like `parse`, but yield chunk results (and text deltas with
+        `stream=True`) as they arrive; see parse.iter_parse_chunks for the
+        item format. `result` is complete once the iterator is exhausted.
+        """
+        result = result if result is not None else ExtractionResult(url="", content=content)
+        result.description = description
+        schema = normalize_schema(columns) if columns else infer_schema(description) if self.structured else None
+        # A generator can't hold the active trace across yields, so it is passed explicitly
+        trace = metrics.Trace('parse', url=result.url, description=description)
+
+        # Explicit columns are a contract the rule-based answers don't follow
+        if self.fast_path and not columns:
+            with metrics.span('fast_path', trace=trace) as fast_span:
+                answer = try_fast_path(description, content, html=html or result.html, url=result.url)
+            if answer is not None:
+                result.fast_path = answer.rule
+                result.text = answer.text
+                result.columns = answer.columns
+                result.rows = answer.rows
+                result.timings['fast_path'] = fast_span.duration
+                trace.summary(into=result.metrics)
+                metrics.finish(trace)
+                emit(on_event, 'parse', 'fast_path', rule=answer.rule, rows=len(answer.rows))
+                yield {'index': 0, 'text': answer.text, 'error': None, 'cached': False}
+                return
+
+        with metrics.span('chunk', trace=trace) as chunk_span:
+            chunk_plan = chunk_plan or self.plan(content)
+            chunks = chunk_plan['chunks']
+            if self.select_relevant and not parse_all and len(chunks) > 1:
+                index = index or self.index(chunk_plan)
+                chunks = [chunks[i] for i in index.select(description, min_ratio=self.min_relevance)]
+                emit(on_event, 'parse', 'filtered', kept=len(chunks), total=chunk_plan['count'])
+            chunk_span.attrs.update(chunks=len(chunks), total=chunk_plan['count'])
+        result.chunks = len(chunks)
+        result.skipped_chunks = chunk_plan['count'] - len(chunks)
+        result.timings['chunk'] = chunk_span.duration
+
+        texts = {}
+        chunk_rows = {}
+        with metrics.span('parse', trace=trace) as parse_span:
+            for item in iter_parse_chunks(chunks, description, max_workers=self.max_workers,
+                                          ordered=ordered, stream=stream, schema=schema, trace=trace,
+                                          on_event=on_event):
+                if 'delta' not in item:
+                    texts[item['index']] = item['text']
+                    chunk_rows[item['index']] = item.get('rows') or []
+                    if item['error']:
+                        result.errors.append(StageError('parse', item['error'], chunk=item['index']))
+                yield item
+        result.timings['parse'] = parse_span.duration
+        result.errors.sort(key=lambda error: error.chunk or 0)
+
+        with metrics.span('format', trace=trace) as format_span:
+            self._format(result, schema, texts, chunk_rows)
+        result.timings['format'] = format_span.duration
+        trace.summary(into=result.metrics)
+        metrics.finish(trace)
+
+    def _format(self, result, schema, texts, chunk_rows):
+        if schema:
+            # Validated JSON rows need no guessing, just concatenation in page order
+            result.schema = schema
+            result.columns = list(schema)
+            result.rows = [row for index in sorted(chunk_rows) for row in chunk_rows[index]]
+            result.text = rows_to_text(result.columns, result.rows)
+        else:
+            result.text = "\n".join(texts[index] for index in sorted(texts))
+            df, _ = format_results_as_table(result.text)
+            if df is not None:
+                result.columns = list(df.columns)
+                result.rows = df.to_dict('records')
+
+    def extract(self, url, description, columns=None, on_event=None):
+        """Run the whole pipeline for one URL."""
+        result = self.fetch(url, on_event=on_event)
+        result.description = description
+        if result.content:
+            self.parse(result.content, description, result=result, html=result.html,
+                       columns=columns, on_event=on_event)
+        return result
+
+
+def extract(url, description, columns=None, on_event=None, **options):
+    """Run a one-off extraction; `options` are passed to Pipeline."""
+    return Pipeline(**options).extract(url, description, columns=columns, on_event=on_event)
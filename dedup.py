@@ -0,0 +1,175 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+
+from cache import CACHE_DIR
+from chunker import estimate_tokens
+
+# Consecutive lines hashed together; a single line like "Add to cart" is
+# data context, a repeated run of lines is a menu, footer or banner
+BLOCK_LINES = 3
+# A repeated block (within a page or across a host's pages) is only dropped
+# when it is at least this long and has no digits; short repeats like
+# "$10.00 / In stock / Add to cart" are the fields of different records
+DUPLICATE_BLOCK_MIN_CHARS = 200
+# Lines shorter than this are never compared for near-duplicates
+NEAR_DUPLICATE_MIN_CHARS = 80
+# SimHash bits that may differ for two lines to count as near-duplicates
+# (kept below the 8 bands used for lookup, so every match shares a band)
+NEAR_DUPLICATE_MAX_DISTANCE = 7
+# A block seen on this many other pages of the same host is boilerplate
+BOILERPLATE_MIN_PAGES = 3
+
+
+_DIGITS = re.compile(r'\d+')
+
+
+def _fingerprint(text):
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+def _boilerplate_shaped(block):
+    return sum(len(line) for line in block) >= DUPLICATE_BLOCK_MIN_CHARS and \
+        not any(_DIGITS.search(line) for line in block)
+
+
+def block_fingerprints(lines, size=BLOCK_LINES):
+    """Fingerprint of every run of `size` consecutive lines."""
+    return [_fingerprint("\n".join(lines[i:i + size])) for i in range(len(lines) - size + 1)]
+
+
+def simhash(text):
+    """64-bit SimHash over word 3-shingles."""
+    words = text.lower().split()
+    shingles = [" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))]
+    hashes = np.array(
+        [hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest() for s in shingles], dtype='S8'
+    ).view(np.uint8).reshape(-1, 8)
+    weights = np.unpackbits(hashes, axis=1).astype(np.int32) * 2 - 1
+    bits = weights.sum(axis=0) > 0
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+class BoilerplateStore:
+    """
+    Per-host record of which line blocks appeared on which pages.
+
+    Blocks that recur across many pages of a host (navigation, footers,
+    cookie banners) are flagged as boilerplate on later pages.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS blocks ("
+            " host TEXT NOT NULL, fingerprint INTEGER NOT NULL, pages INTEGER NOT NULL,"
+            " PRIMARY KEY (host, fingerprint))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages (host TEXT NOT NULL, page TEXT NOT NULL,"
+            " PRIMARY KEY (host, page))"
+        )
+        self._conn.commit()
+
+    def boilerplate(self, host, page, fingerprints, min_pages=BOILERPLATE_MIN_PAGES):
+        """
+        Record `page`'s blocks and return the set of them seen on at least
+        `min_pages` other pages of `host`.
+        """
+        unique = list(set(fingerprints))
+        with self._lock:
+            seen_before = self._conn.execute(
+                "SELECT 1 FROM pages WHERE host = ? AND page = ?", (host, page)
+            ).fetchone() is not None
+            if not seen_before:
+                self._conn.execute("INSERT INTO pages (host, page) VALUES (?, ?)", (host, page))
+                self._conn.executemany(
+                    "INSERT INTO blocks (host, fingerprint, pages) VALUES (?, ?, 1)"
+                    " ON CONFLICT (host, fingerprint) DO UPDATE SET pages = pages + 1",
+                    [(host, fp) for fp in unique]
+                )
+                self._conn.commit()
+
+            flagged = set()
+            # Each page's own visit is counted once; don't let it vouch for itself
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT fingerprint FROM blocks WHERE host = ? AND pages > ?"
+                    f" AND fingerprint IN ({','.join('?' * len(batch))})",
+                    [host, min_pages] + batch
+                ).fetchall()
+                flagged.update(row[0] for row in rows)
+        return flagged
+
+
+boilerplate_store = BoilerplateStore(os.path.join(CACHE_DIR, 'boilerplate.sqlite3'))
+
+
+def dedupe_content(text, host=None, page=None, store=None):
+    """
+    Remove repeated and near-duplicate blocks from cleaned page text.
+
+    Drops (1) long runs of lines without numbers already seen earlier on
+    the page, (2) long lines that are near-duplicates (SimHash) of an
+    earlier line with the same numbers and (3) with `host`, `page` and a
+    `store`, such long runs that recur across the host's other pages.
+    Returns `(text, stats)` where stats counts what was removed.
+    """
+    lines = text.split("\n")
+    drop = np.zeros(len(lines), dtype=bool)
+    fingerprints = block_fingerprints(lines)
+
+    # 1. Exact repeats of long multi-line blocks within the page; numbers
+    # (prices, dates, counts) mark record data, which may repeat legitimately
+    seen = set()
+    for i, fp in enumerate(fingerprints):
+        if fp not in seen:
+            seen.add(fp)
+            continue
+        if _boilerplate_shaped(lines[i:i + BLOCK_LINES]):
+            drop[i:i + BLOCK_LINES] = True
+    duplicate_lines = int(drop.sum())
+
+    # 2. Near-duplicate long lines, bucketed by 8-bit bands of the SimHash.
+    # Only lines with the same numbers are compared: two listings that differ
+    # in price or model number are different records, not near-duplicates
+    bands = {}
+    for i, line in enumerate(lines):
+        if drop[i] or len(line) < NEAR_DUPLICATE_MIN_CHARS:
+            continue
+        signature = simhash(line)
+        numbers = tuple(_DIGITS.findall(line))
+        keys = [(numbers, band, (signature >> (8 * band)) & 0xFF) for band in range(8)]
+        candidates = {other for key in keys for other in bands.get(key, ())}
+        if any(bin(signature ^ other).count('1') <= NEAR_DUPLICATE_MAX_DISTANCE for other in candidates):
+            drop[i] = True
+            continue
+        for key in keys:
+            bands.setdefault(key, []).append(signature)
+    near_duplicate_lines = int(drop.sum()) - duplicate_lines
+
+    # 3. Blocks shared with other pages of the same host
+    if host and page and store is not None:
+        flagged = store.boilerplate(host, page, fingerprints)
+        for i, fp in enumerate(fingerprints):
+            if fp in flagged and _boilerplate_shaped(lines[i:i + BLOCK_LINES]):
+                drop[i:i + BLOCK_LINES] = True
+    boilerplate_lines = int(drop.sum()) - duplicate_lines - near_duplicate_lines
+
+    kept = "\n".join(line for line, dropped in zip(lines, drop) if not dropped)
+    stats = {
+        'lines_removed': int(drop.sum()),
+        'duplicate_lines': duplicate_lines,
+        'near_duplicate_lines': near_duplicate_lines,
+        'boilerplate_lines': boilerplate_lines,
+        'bytes_removed': len(text.encode('utf-8')) - len(kept.encode('utf-8')),
+        'tokens_removed': estimate_tokens(text) - estimate_tokens(kept),
+    }
+    return kept, stats
@@ -0,0 +1,172 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+def default_health_check(driver):
+    """
+    A session is healthy if the remote end still answers a trivial command.
+    """
+    driver.current_url
+    return True
+
+
+class _Session:
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class DriverPool:
+    """
+    Pool of reusable WebDriver sessions.
+
+    `factory()` creates a new driver; sessions are health-checked before they
+    are handed out, closed once they have served `max_pages_per_session`
+    pages, and closed when they sat idle longer than `idle_timeout` seconds
+    (by a background thread, so a quiet pool doesn't hold remote browsers).
+    Any object with `quit()` works as a driver, so tests can plug in a local
+    WebDriver or a stand-in instead of the remote browser.
+    """
+
+    def __init__(self, factory, size=2, max_pages_per_session=25, idle_timeout=300,
+                 health_check=default_health_check):
+        self.factory = factory
+        self.size = size
+        self.max_pages_per_session = max_pages_per_session
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = deque()
+        self._in_use = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._reaper = None
+        self._stopped = threading.Event()
+        self.created = 0
+        self.recycled = 0
+
+    def acquire(self, timeout=None):
+        """
+        Borrow a driver, creating one if no healthy idle session is available.
+        """
+        if self._closed:
+            raise RuntimeError("Driver pool is closed")
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("Timed out waiting for a browser session")
+
+        try:
+            session = self._take_idle()
+            if session is None:
+                session = _Session(self.factory())
+                with self._lock:
+                    self.created += 1
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use[id(session.driver)] = session
+        return session.driver
+
+    def release(self, driver, discard=False):
+        """
+        Return a borrowed driver; `discard=True` closes it instead of reusing it.
+        """
+        with self._lock:
+            session = self._in_use.pop(id(driver), None)
+        if session is None:
+            return
+
+        session.pages += 1
+        session.last_used = time.monotonic()
+        self.prune_idle()
+        if discard or self._closed or session.pages >= self.max_pages_per_session:
+            self._quit(session)
+        else:
+            with self._lock:
+                self._idle.append(session)
+            self._start_reaper()
+        self._slots.release()
+
+    @contextmanager
+    def borrow(self, timeout=None):
+        driver = self.acquire(timeout=timeout)
+        try:
+            yield driver
+        except Exception:
+            self.release(driver, discard=True)
+            raise
+        else:
+            self.release(driver)
+
+    def prune_idle(self):
+        """
+        Close idle sessions that exceeded the idle timeout.
+        """
+        now = time.monotonic()
+        with self._lock:
+            expired = [s for s in self._idle if now - s.last_used > self.idle_timeout]
+            for session in expired:
+                self._idle.remove(session)
+        for session in expired:
+            self._quit(session)
+
+    def close(self):
+        self._closed = True
+        self._stopped.set()
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for session in idle:
+            self._quit(session)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'created': self.created,
+                'recycled': self.recycled,
+            }
+
+    def _start_reaper(self):
+        if not self.idle_timeout:
+            return
+        with self._lock:
+            if self._reaper is not None or self._closed:
+                return
+            self._reaper = threading.Thread(target=self._reap, name='datahawk-driver-reaper', daemon=True)
+        self._reaper.start()
+
+    def _reap(self):
+        # Checking twice per timeout closes a session at most 1.5x idle_timeout after its last use
+        while not self._stopped.wait(self.idle_timeout / 2):
+            self.prune_idle()
+
+    def _take_idle(self):
+        self.prune_idle()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                # Most recently used first, so spare sessions age out
+                session = self._idle.pop()
+            try:
+                if self.health_check is None or self.health_check(session.driver):
+                    return session
+            except Exception as e:
+                print(f"Discarding unhealthy browser session: {str(e)}")
+            self._quit(session)
+
+    def _quit(self, session):
+        with self._lock:
+            self.recycled += 1
+        try:
+            session.driver.quit()
+        except Exception:
+            pass
@@ -0,0 +1,29 @@
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class ProgressEvent:
+    """
+    Something that really happened in a pipeline stage.
+
+    `stage` is one of fetch, captcha, clean, parse; `kind` is e.g. started,
+    finished, failed, cache_hit, chunk_done or retry. `data` carries the
+    details (url, bytes, chunk index, ...).
+    """
+    stage: str
+    kind: str
+    data: dict = field(default_factory=dict)
+    timestamp: float = field(default_factory=time.time)
+
+
+def emit(on_event, stage, kind, **data):
+    """
+    Send an event to `on_event` if there is one; observer errors never break the pipeline.
+    """
+    if on_event is None:
+        return
+    try:
+        on_event(ProgressEvent(stage, kind, data))
+    except Exception as e:
+        print(f"Progress observer failed on {stage}.{kind}: {str(e)}")
@@ -0,0 +1,265 @@
+import re
+from dataclasses import dataclass, field
+from typing import List
+from urllib.parse import urljoin
+
+from cssselect import SelectorError
+from lxml import html as lxml_html
+from lxml.cssselect import CSSSelector
+
+from formatting import rows_to_text
+
+EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+PHONE_PATTERN = re.compile(r"(?<![\w.])(?:\+\d{1,3}[\s.-]?)?(?:\(\d{1,4}\)[\s.-]?)?\d{2,4}(?:[\s.-]?\d{2,4}){1,3}(?!\w|\.\d)")
+# A bare run of digit groups is only a phone number with something phone-like
+# about it: an international prefix, a bracketed area code, North American
+# 3-3-4 grouping or a label just before it. Dates never are.
+_PHONE_LABEL = re.compile(r"\b(?:call|phone|tel|telephone|mobile|cell|fax|whatsapp|hotline|contact)\b[^\n]{0,25}$",
+                          re.IGNORECASE)
+_PHONE_SHAPE = re.compile(r"^\+|\(\d{1,4}\)|^\d{3}([-. ])\d{3}\1\d{4}$")
+_DATE_SHAPE = re.compile(r"^(?:\d{4}([-./])\d{1,2}\1\d{1,2}|\d{1,2}([-./])\d{1,2}\2\d{2,4})$")
+PRICE_PATTERN = re.compile(
+    r"[$£€¥₹]\s?\d[\d,]*(?:\.\d{1,2})?|\b\d[\d,]*(?:\.\d{1,2})?\s?(?:USD|EUR|GBP|INR|LKR)\b"
+)
+WORD_PATTERN = re.compile(r"[a-z][a-z-]*")
+CSS_PREFIX = re.compile(r"^\s*(?:css|selector)\s*:\s*(.+)$", re.IGNORECASE | re.DOTALL)
+
+# Words that name something the rules can extract on their own
+_TARGET_WORDS = {
+    'email': {'email', 'emails', 'e-mail', 'e-mails', 'mail', 'mails'},
+    'phone': {'phone', 'phones', 'telephone', 'telephones', 'mobile', 'mobiles', 'tel'},
+    'price': {'price', 'prices', 'cost', 'costs'},
+    'link': {'link', 'links', 'url', 'urls', 'hyperlink', 'hyperlinks', 'href', 'hrefs'},
+    'table': {'table', 'tables'},
+}
+_TARGET_BY_WORD = {word: target for target, words in _TARGET_WORDS.items() for word in words}
+
+# Words that don't change what is being asked for
+_FILLER_WORDS = frozenset("""
+a an and or the all any every each of on in from this that these page website site web
+extract get find list show give return output collect scrape pull me please i want need
+address addresses contact contacts detail details info information available data
+as into with format formatted view structured separated plain text only number numbers
+""".split())
+
+
+@dataclass
+class FastPathResult:
+    """Answer produced by a rule instead of the model."""
+    rule: str
+    columns: List[str]
+    rows: List[dict]
+    text: str = ""
+
+
+@dataclass
+class SelectorRule:
+    """
+    Descriptions matching `pattern` are answered by CSS selection: one row
+    per element matched by `selector`, with `fields` mapping column names to
+    sub-selectors inside it (or a single Text column without fields).
+    """
+    pattern: re.Pattern
+    selector: str
+    fields: dict = field(default_factory=dict)
+
+
+SELECTOR_RULES: List[SelectorRule] = []
+
+
+def register_selector_rule(pattern, selector, fields=None):
+    """Answer descriptions matching the regex `pattern` with a CSS selector rule."""
+    SELECTOR_RULES.append(SelectorRule(re.compile(pattern, re.IGNORECASE), selector, fields or {}))
+
+
+def recognize(description):
+    """
+    The set of rule targets that fully covers `description`, or None when
+    it asks for anything the rules can't produce.
+    """
+    targets = set()
+    for word in WORD_PATTERN.findall(description.lower()):
+        if word in _TARGET_BY_WORD:
+            targets.add(_TARGET_BY_WORD[word])
+        elif word not in _FILLER_WORDS:
+            return None
+    # "emails in table format" asks for emails, not for the page's tables
+    if len(targets) > 1:
+        targets.discard('table')
+    return targets or None
+
+
+def _unique(values):
+    return list(dict.fromkeys(value.strip() for value in values if value.strip()))
+
+
+def _element_text(element):
+    return " ".join(" ".join(element.itertext()).split())
+
+
+def extract_emails(text, document=None):
+    found = EMAIL_PATTERN.findall(text)
+    if document is not None:
+        found += [href[7:].split('?')[0] for href in document.xpath("//a/@href") if href.lower().startswith('mailto:')]
+    return _unique(found)
+
+
+def extract_phones(text, document=None):
+    """
+    Phone numbers in `text` and the page's tel: links, or None when a
+    match could as well be an order number, SKU or the like and the
+    model should decide.
+    """
+    found = []
+    for match in PHONE_PATTERN.finditer(text):
+        number = match.group()
+        if not 7 <= sum(ch.isdigit() for ch in number) <= 15 or _DATE_SHAPE.match(number):
+            continue
+        if not (_PHONE_SHAPE.search(number) or _PHONE_LABEL.search(text, max(0, match.start() - 40), match.start())):
+            return None
+        found.append(number)
+    if document is not None:
+        found += [href[4:] for href in document.xpath("//a/@href") if href.lower().startswith('tel:')]
+    return _unique(found)
+
+
+def extract_prices(text):
+    # Every listing's price, repeats included: prices belong to records, not a set
+    return [price.strip() for price in PRICE_PATTERN.findall(text)]
+
+
+def extract_links(document, base_url=""):
+    links = []
+    seen = set()
+    for anchor in document.xpath("//a[@href]"):
+        href = anchor.get('href').strip()
+        if not href or href.startswith(('#', 'javascript:', 'mailto:', 'tel:')):
+            continue
+        url = urljoin(base_url, href)
+        if url not in seen:
+            seen.add(url)
+            links.append({'Text': _element_text(anchor), 'URL': url})
+    return links
+
+
+def extract_tables(document):
+    """Rows of every <table>, keyed by its header cells when it has them."""
+    columns = []
+    rows = []
+    tables = document.xpath("//table")
+    for number, table in enumerate(tables, start=1):
+        table_rows = [
+            [_element_text(cell) for cell in row.xpath("./th|./td")]
+            for row in table.xpath(".//tr")
+        ]
+        table_rows = [cells for cells in table_rows if any(cells)]
+        if not table_rows:
+            continue
+
+        first = table.xpath(".//tr")[0]
+        if first.xpath("./th"):
+            header, body = table_rows[0], table_rows[1:]
+        else:
+            header, body = [], table_rows
+        width = max(len(cells) for cells in table_rows)
+        header = [name or f"Column {i + 1}" for i, name in enumerate(header)]
+        header += [f"Column {i + 1}" for i in range(len(header), width)]
+
+        for cells in body:
+            row = {'Table': number} if len(tables) > 1 else {}
+            row.update(zip(header, cells))
+            rows.append(row)
+        for name in (['Table'] if len(tables) > 1 else []) + header:
+            if name not in columns:
+                columns.append(name)
+    return columns, rows
+
+
+def extract_with_selector(document, selector, fields=None):
+    columns = list(fields) if fields else ['Text']
+    rows = []
+    for element in CSSSelector(selector)(document):
+        if fields:
+            row = {}
+            for name, sub_selector in fields.items():
+                matches = CSSSelector(sub_selector)(element)
+                row[name] = _element_text(matches[0]) if matches else ""
+            if any(row.values()):
+                rows.append(row)
+        else:
+            text = _element_text(element)
+            if text:
+                rows.append({'Text': text})
+    return columns, rows
+
+
+def try_fast_path(description, content, html=None, url=""):
+    """
+    Answer `description` from the cleaned `content` (and raw `html`) with
+    rules alone. Returns a FastPathResult, or None when the model is needed.
+    """
+    document = None
+    if html and html.strip():
+        try:
+            document = lxml_html.document_fromstring(html)
+        except Exception as e:
+            print(f"Fast path could not parse HTML: {str(e)}")
+
+    css = CSS_PREFIX.match(description)
+    if css:
+        if document is None:
+            return None
+        try:
+            columns, rows = extract_with_selector(document, css.group(1).strip())
+        except SelectorError as e:
+            print(f"Invalid CSS selector in description: {str(e)}")
+            return None
+        return FastPathResult('css', columns, rows, rows_to_text(columns, rows)) if rows else None
+
+    for rule in SELECTOR_RULES:
+        if rule.pattern.search(description) and document is not None:
+            columns, rows = extract_with_selector(document, rule.selector, rule.fields)
+            if rows:
+                return FastPathResult(f"selector:{rule.selector}", columns, rows, rows_to_text(columns, rows))
+
+    targets = recognize(description)
+    if not targets:
+        return None
+
+    if targets == {'table'}:
+        if document is None:
+            return None
+        columns, rows = extract_tables(document)
+        return FastPathResult('table', columns, rows, rows_to_text(columns, rows)) if rows else None
+
+    if targets == {'link'}:
+        if document is None:
+            return None
+        rows = extract_links(document, url)
+        columns = ['Text', 'URL']
+        return FastPathResult('link', columns, rows, rows_to_text(columns, rows)) if rows else None
+
+    found = {}
+    for target in sorted(targets):
+        if target == 'email':
+            found['Email'] = extract_emails(content, document)
+        elif target == 'phone':
+            found['Phone'] = extract_phones(content, document)
+        elif target == 'price':
+            found['Price'] = extract_prices(content)
+        elif target == 'link' and document is not None:
+            found['Link'] = [link['URL'] for link in extract_links(document, url)]
+        else:
+            return None
+    # Anything the rules came up empty on may still be findable by the model
+    if not all(found.values()):
+        return None
+
+    if len(found) == 1:
+        (column, values), = found.items()
+        columns, rows = [column], [{column: value} for value in values]
+        return FastPathResult('+'.join(sorted(targets)), columns, rows, "\n".join(values))
+
+    columns = ['Type', 'Value']
+    rows = [{'Type': kind, 'Value': value} for kind, values in found.items() for value in values]
+    return FastPathResult('+'.join(sorted(targets)), columns, rows, rows_to_text(columns, rows))
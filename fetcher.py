@@ -0,0 +1,162 @@
+import os
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from lxml import etree, html as lxml_html
+from dotenv import load_dotenv
+
+import metrics
+from events import emit
+
+load_dotenv()
+
+# Try a plain HTTP request before opening a browser session (0 always uses the browser)
+FETCH_HTTP_ENABLED = os.getenv('FETCH_HTTP', '1') != '0'
+FETCH_HTTP_TIMEOUT = float(os.getenv('FETCH_HTTP_TIMEOUT', '10'))
+# Keep-alive connections kept per host, and hosts kept in the pool
+FETCH_HTTP_POOL_SIZE = int(os.getenv('FETCH_HTTP_POOL_SIZE', '10'))
+FETCH_HTTP_POOL_HOSTS = int(os.getenv('FETCH_HTTP_POOL_HOSTS', '50'))
+# Pages with less visible text than this are assumed to need JavaScript
+FETCH_MIN_TEXT_CHARS = int(os.getenv('FETCH_MIN_TEXT_CHARS', '500'))
+FETCH_USER_AGENT = os.getenv(
+    'FETCH_USER_AGENT',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/124.0 Safari/537.36'
+)
+
+# Empty mount points of client-rendered apps (React, Vue, Angular, Nuxt, Svelte, Ember)
+_SPA_SHELL = re.compile(
+    r'<(?:div|main)[^>]+id=["\'](?:root|app|__nuxt|svelte|ember-app|main-app)["\'][^>]*>\s*</(?:div|main)>'
+    r'|<app-root[^>]*>\s*</app-root>',
+    re.IGNORECASE
+)
+_NEEDS_JS = re.compile(
+    r'(?:enable|turn on|requires?|need to enable)\s+javascript|javascript\s+(?:is\s+)?(?:required|disabled)',
+    re.IGNORECASE
+)
+# Interstitials of common bot protections
+_CHALLENGE = re.compile(
+    r'cf-browser-verification|challenge-platform|cf_chl_|<title>\s*just a moment|px-captcha|_incapsula_resource'
+    r'|captcha-delivery\.com|g-recaptcha|hcaptcha\.com|<title>\s*access denied|<title>\s*attention required',
+    re.IGNORECASE
+)
+_META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?\s*([\w.:-]+)', re.IGNORECASE)
+
+_NON_CONTENT = etree.XPath(".//*[self::script or self::style or self::noscript or self::template or self::svg]")
+_NOSCRIPT = etree.XPath(".//noscript")
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    The shared HTTP session: keep-alive connections pooled per host, and
+    gzip/deflate (plus brotli/zstd when installed) negotiated by urllib3.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=FETCH_HTTP_POOL_HOSTS, pool_maxsize=FETCH_HTTP_POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({
+                'User-Agent': FETCH_USER_AGENT,
+                'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'en-US,en;q=0.9',
+            })
+            _session = session
+        return _session
+
+
+def decode_body(response):
+    """
+    Text of a response: the charset from the Content-Type header, else a
+    <meta charset> in the first bytes, else a guess from the bytes themselves.
+    """
+    content = response.content
+    encoding = None
+    if 'charset' in response.headers.get('Content-Type', '').lower():
+        encoding = response.encoding
+    if not encoding:
+        match = _META_CHARSET.search(content[:4096])
+        if match:
+            encoding = match.group(1).decode('ascii', errors='ignore')
+    if not encoding:
+        encoding = response.apparent_encoding or 'utf-8'
+    try:
+        return content.decode(encoding, errors='replace')
+    except LookupError:
+        return content.decode('utf-8', errors='replace')
+
+
+def assess(html, min_text_chars=FETCH_MIN_TEXT_CHARS):
+    """
+    Decide whether server-rendered HTML already holds the page's content.
+    Returns (sufficient, reason); the reason says why the browser is needed.
+    """
+    if _CHALLENGE.search(html):
+        return False, 'challenge'
+    try:
+        document = lxml_html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return False, 'unparseable'
+    body = document.find('body')
+    if body is None:
+        return False, 'no_body'
+
+    noscript = " ".join(element.text_content() for element in _NOSCRIPT(body))
+    for element in _NON_CONTENT(body):
+        element.drop_tree()
+    text_chars = len(" ".join(body.text_content().split()))
+
+    if text_chars < min_text_chars:
+        if _SPA_SHELL.search(html):
+            return False, 'spa_shell'
+        if _NEEDS_JS.search(noscript):
+            return False, 'noscript'
+        return False, 'thin'
+    return True, 'ok'
+
+
+def fetch_http(website, session=None, timeout=FETCH_HTTP_TIMEOUT, on_event=None):
+    """
+    Fetch `website` with a plain HTTP request.
+
+    Returns (html, reason): html is None when the response can't be used as
+    is and the page should be loaded in a browser instead, with the reason.
+    """
+    session = session or get_session()
+    started = time.monotonic()
+    with metrics.span('http_fetch', url=website) as http_span:
+        emit(on_event, 'fetch', 'requesting', url=website)
+        try:
+            response = session.get(website, timeout=timeout, allow_redirects=True)
+        except requests.RequestException as e:
+            print(f"HTTP fetch failed: {str(e)}")
+            http_span.attrs['reason'] = 'network'
+            return None, 'network'
+
+        http_span.attrs['status'] = response.status_code
+        content_type = response.headers.get('Content-Type', '')
+        if response.status_code >= 400:
+            # Bot walls answer 403/429/503; the browser path also keeps error pages as before
+            reason = f"status_{response.status_code}"
+        elif content_type and 'html' not in content_type.lower():
+            reason = 'not_html'
+        else:
+            html = decode_body(response)
+            sufficient, reason = assess(html)
+            if sufficient:
+                http_span.attrs['bytes'] = len(html)
+                metrics.count('pages_fetched', tier='http')
+                metrics.count('bytes_fetched', len(html))
+                emit(on_event, 'fetch', 'finished', url=website, bytes=len(html), tier='http',
+                     elapsed=time.monotonic() - started)
+                return html, reason
+        http_span.attrs['reason'] = reason
+        return None, reason
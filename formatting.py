@@ -0,0 +1,129 @@
+import csv
+import io
+import re
+
+import pandas as pd
+
+
+def rows_to_text(columns, rows):
+    """One " | "-separated line per row, the plain-text form of tabular results"""
+    return "\n".join(
+        " | ".join("" if row.get(column) is None else str(row.get(column)) for column in columns)
+        for row in rows
+    )
+
+
+# Tried in order; the first one present on every sampled line wins
+SEPARATORS = [' - ', ' | ', '\t', ':', ' , ', ', ']
+# Lines inspected to choose a separator
+SEPARATOR_SAMPLE_LINES = 5
+
+# Headers guessed from the number of fields in the first row
+_HEADERS_BY_WIDTH = {
+    2: ['Item', 'Value'],
+    3: ['Name', 'Price', 'Rating'],
+    4: ['Title', 'Price', 'Rating', 'Status'],
+}
+
+# Field delimiter the chosen separator is rewritten to, so pandas' C parser can split
+_FIELD = '\x1f'
+_LINE_EDGES = re.compile(r'[ \t]*\n[ \t]*')
+_SAMPLE_LINE = re.compile(r'[^\n]*\S[^\n]*')
+_FIELD_EDGES = re.compile(r'[ \t]*' + _FIELD + r'[ \t]*')
+_CURRENCY_SYMBOLS = '$£€¥₹'
+
+# Common in e-commerce: "Product name - $12.99"; never spans lines
+PRICE_PATTERN = re.compile(r'([^$£€¥₹\s](?:[^$£€¥₹\n]*[^$£€¥₹\s-])?)[ \t\-]+[$£€¥₹](\d+\.?\d*)')
+# One pass finds both; an email's digits are never also reported as a phone
+CONTACT_PATTERN = re.compile(
+    r'([^@\s]+@[^@\s]+\.[^@\s]+)'
+    r'|(\+?\d{1,3}[-. \t]?\(?\d{1,4}\)?[-. \t]?\d{1,4}[-. \t]?\d{1,9})'
+)
+
+
+def _headers_for(width):
+    return _HEADERS_BY_WIDTH.get(width) or [f'Column {j+1}' for j in range(width)]
+
+
+def _sample_lines(text, count=SEPARATOR_SAMPLE_LINES):
+    """First `count` non-blank lines, stripped, without splitting the whole text"""
+    sample = []
+    for match in _SAMPLE_LINE.finditer(text):
+        sample.append(match.group().strip())
+        if len(sample) == count:
+            break
+    return sample
+
+
+def _split_table(text, separator):
+    """
+    Rows of `text` split on `separator`, keeping those as wide as the first
+    row. The separator is rewritten to a control character, whitespace
+    around fields trimmed in one regex pass, rows of another width dropped
+    by counting separators, and the rest parsed by pandas' C reader.
+    """
+    if _FIELD in text:
+        return None
+    normalized = text.replace(separator, _FIELD)
+    # Substring checks are far cheaper than the substitutions, which most model output doesn't need
+    if any(pad in normalized for pad in (' \n', '\t\n', '\n ', '\n\t')):
+        normalized = _LINE_EDGES.sub('\n', normalized)
+    if any(pad in normalized for pad in (' ' + _FIELD, '\t' + _FIELD, _FIELD + ' ', _FIELD + '\t')):
+        normalized = _FIELD_EDGES.sub(_FIELD, normalized)
+    # The reader pads short rows with '' (not NaN, since na_values is empty),
+    # so rows narrower or wider than the first are dropped before parsing
+    normalized = normalized.strip()
+    lines = normalized.split('\n')
+    width = lines[0].count(_FIELD)
+    rows = [line for line in lines if line.count(_FIELD) == width]
+    if len(rows) < 2:
+        return None
+    if len(rows) != len(lines):
+        normalized = '\n'.join(rows)
+    try:
+        df = pd.read_csv(
+            io.StringIO(normalized), sep=_FIELD, header=None, dtype=str, engine='c',
+            quoting=csv.QUOTE_NONE, keep_default_na=False, na_filter=True, na_values=[],
+            skip_blank_lines=True, on_bad_lines='skip'
+        )
+    except (pd.errors.ParserError, pd.errors.EmptyDataError):
+        return None
+
+    if len(df) < 2:
+        return None
+    df.columns = _headers_for(df.shape[1])
+    return df
+
+
+def format_results_as_table(text):
+    """Convert structured text data into a pandas DataFrame if possible"""
+    sample = _sample_lines(text)
+    if not sample:
+        return None, text
+
+    # Choose separators from a small sample, then split every line in one pass
+    for separator in SEPARATORS:
+        if all(separator in line for line in sample):
+            df = _split_table(text, separator)
+            if df is not None:
+                return df, text
+
+    # Try to detect price patterns (common in e-commerce)
+    matches = PRICE_PATTERN.findall(text) if any(symbol in text for symbol in _CURRENCY_SYMBOLS) else []
+    if len(matches) >= 3:
+        df = pd.DataFrame(matches, columns=['Product', 'Price'])
+        return df, text
+
+    # Try to detect email/contact patterns
+    matches = CONTACT_PATTERN.findall(text)
+    if matches:
+        found = pd.DataFrame(matches, columns=['Email', 'Phone'])
+        emails = found['Email'][found['Email'] != '']
+        phones = found['Phone'][found['Phone'] != '']
+        df = pd.DataFrame({
+            'Type': ['Email'] * len(emails) + ['Phone'] * len(phones),
+            'Contact': pd.concat([emails, phones], ignore_index=True),
+        })
+        return df, text
+
+    return None, text
@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+
+from cache import CACHE_DIR, SQLiteCache
+
+load_dotenv()
+
+HOST_PROFILES_ENABLED = os.getenv('HOST_PROFILES', '1') != '0'
+# Sites change; a profile not updated for this long starts over
+HOST_PROFILE_TTL = int(os.getenv('HOST_PROFILE_TTL', str(30 * 24 * 3600)))
+# CAPTCHA detection wait (ms) on hosts with no history, and once a host has passed one clean check
+CAPTCHA_DETECT_TIMEOUT_MS = int(os.getenv('CAPTCHA_DETECT_TIMEOUT_MS', '10000'))
+CAPTCHA_SHORT_TIMEOUT_MS = int(os.getenv('CAPTCHA_SHORT_TIMEOUT_MS', '2000'))
+# Clean checks in a row after which the CAPTCHA wait is skipped for a host
+CAPTCHA_SKIP_AFTER = int(os.getenv('CAPTCHA_SKIP_AFTER', '3'))
+# HTTP responses in a row that needed the browser (BROWSER_REASONS) after which a host goes straight to it
+HTTP_SKIP_AFTER = int(os.getenv('HTTP_SKIP_AFTER', '2'))
+# Every this many fetches a skipped step is tried again, in case the site changed
+HOST_REPROBE_EVERY = int(os.getenv('HOST_REPROBE_EVERY', '20'))
+
+# Captcha.waitForSolve statuses that mean no CAPTCHA was on the page, and
+# the one recorded when the check itself failed and showed nothing either way
+_CAPTCHA_CLEAN = ('not_detected',)
+_CAPTCHA_INCONCLUSIVE = ('error',)
+# Plain HTTP outcomes that mean the page needs the browser; dead links,
+# network errors and non-HTML responses say nothing about the host
+BROWSER_REASONS = ('spa_shell', 'noscript', 'thin', 'challenge', 'status_403', 'status_429', 'status_503')
+
+
+@dataclass
+class HostProfile:
+    """What earlier fetches learned about one host."""
+    host: str
+    fetches: int = 0
+    last_probe: int = 0
+    http_ok: int = 0
+    http_failed: int = 0
+    http_streak: int = 0
+    http_reason: str = ""
+    browser_ok: int = 0
+    browser_failed: int = 0
+    captcha_checks: int = 0
+    captchas_seen: int = 0
+    captcha_clean_streak: int = 0
+    captcha_solver: bool = True
+    updated_at: float = 0.0
+
+    @property
+    def needs_browser(self):
+        """Plain HTTP keeps failing here (JavaScript app, bot wall, ...)."""
+        return self.http_streak >= HTTP_SKIP_AFTER
+
+    def captcha_timeout(self, probe=False):
+        """
+        Milliseconds to wait for a CAPTCHA to be detected: the full wait on
+        hosts that showed one (or are new), a short one after a clean check,
+        and 0 (skip) after CAPTCHA_SKIP_AFTER clean checks in a row or when
+        the browser endpoint has no solver.
+        """
+        if probe:
+            return CAPTCHA_DETECT_TIMEOUT_MS
+        if not self.captcha_solver or self.captcha_clean_streak >= CAPTCHA_SKIP_AFTER:
+            return 0
+        if self.captcha_clean_streak:
+            return CAPTCHA_SHORT_TIMEOUT_MS
+        return CAPTCHA_DETECT_TIMEOUT_MS
+
+
+def host_of(url):
+    return (urlsplit(url).hostname or "").lower()
+
+
+class HostProfiles:
+    """
+    Per-host fetch profiles kept in memory and persisted to `store`, so
+    what one run learns (this host never shows a CAPTCHA, that one needs
+    JavaScript) saves time on the next.
+    """
+
+    def __init__(self, store=None, ttl=HOST_PROFILE_TTL):
+        self.store = store
+        self.ttl = ttl
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+    def _load(self, host):
+        cached = self.store.get(host) if self.store else None
+        if cached is None:
+            return HostProfile(host)
+        data = json.loads(cached.decode('utf-8'))
+        known = {field.name for field in fields(HostProfile)}
+        return HostProfile(**{key: value for key, value in data.items() if key in known})
+
+    def get(self, host):
+        with self._lock:
+            profile = self._profiles.get(host)
+            if profile is None:
+                profile = self._profiles[host] = self._load(host)
+            return profile
+
+    def _update(self, host, change):
+        with self._lock:
+            profile = self._profiles.get(host) or self._load(host)
+            change(profile)
+            profile.updated_at = time.time()
+            self._profiles[host] = profile
+            if self.store:
+                self.store.set(host, json.dumps(asdict(profile)).encode('utf-8'), ttl=self.ttl)
+            return profile
+
+    def plan(self, host):
+        """
+        How to fetch the next page from `host`: (try_http, captcha_timeout_ms).
+        Every HOST_REPROBE_EVERY fetches the steps the profile lets us skip
+        are run again, in case the site changed.
+        """
+        decision = {}
+
+        def change(profile):
+            profile.fetches += 1
+            probe = profile.fetches - profile.last_probe > HOST_REPROBE_EVERY
+            if probe:
+                profile.last_probe = profile.fetches
+            decision['http'] = probe or not profile.needs_browser
+            decision['captcha_timeout'] = profile.captcha_timeout(probe)
+
+        self._update(host, change)
+        return decision['http'], decision['captcha_timeout']
+
+    def record_http(self, host, ok, reason=""):
+        """
+        A plain HTTP attempt finished; `ok` means its HTML was used. Only
+        failures in BROWSER_REASONS count towards skipping HTTP for the host.
+        """
+        def change(profile):
+            profile.http_reason = reason
+            if ok:
+                profile.http_ok += 1
+                profile.http_streak = 0
+            else:
+                profile.http_failed += 1
+                if reason in BROWSER_REASONS:
+                    profile.http_streak += 1
+        return self._update(host, change)
+
+    def record_browser(self, host, ok, captcha_status=None):
+        """
+        A browser fetch finished, with the CAPTCHA check's status (None if
+        it was skipped, 'error' if the check failed without an answer).
+        """
+        def change(profile):
+            if ok:
+                profile.browser_ok += 1
+            else:
+                profile.browser_failed += 1
+            if captcha_status is None or captcha_status in _CAPTCHA_INCONCLUSIVE:
+                return
+            profile.captcha_checks += 1
+            profile.captcha_solver = captcha_status != 'unavailable'
+            if captcha_status in _CAPTCHA_CLEAN:
+                profile.captcha_clean_streak += 1
+            elif profile.captcha_solver:
+                profile.captchas_seen += 1
+                profile.captcha_clean_streak = 0
+        return self._update(host, change)
+
+host_profiles = HostProfiles(
+    store=SQLiteCache(os.path.join(CACHE_DIR, 'hosts.sqlite3'), default_ttl=HOST_PROFILE_TTL)
+) if HOST_PROFILES_ENABLED else None
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Fetches and parses run at once across all sessions
+DATAHAWK_JOB_WORKERS = int(os.getenv('DATAHAWK_JOB_WORKERS', '4'))
+# Finished jobs are forgotten this many seconds after they end
+DATAHAWK_JOB_TTL = int(os.getenv('DATAHAWK_JOB_TTL', '3600'))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once it has been asked to stop."""
+
+
+class Job:
+    """
+    One unit of background work. The work function updates `progress` and
+    `message` (and `partial` for results that arrive piece by piece) while
+    it runs; `result` or `error` is set when it ends.
+    """
+
+    def __init__(self, kind, meta=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.meta = meta or {}
+        self.status = QUEUED
+        self.progress = 0
+        self.message = ""
+        self.partial = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def report(self, progress=None, message=None):
+        """Update progress (0-100) and the status line shown while the job runs."""
+        if progress is not None:
+            self.progress = max(0, min(100, int(progress)))
+        if message is not None:
+            self.message = message
+
+    def check_cancelled(self):
+        """Stop the job here if cancellation was requested."""
+        if self._cancel.is_set():
+            raise JobCancelled(f"{self.kind} job {self.id} was cancelled")
+
+
+class JobManager:
+    """
+    Shared worker pool for long fetches and parses, so they keep running
+    (and their results stay available) while the UI reruns.
+    """
+
+    def __init__(self, max_workers=DATAHAWK_JOB_WORKERS, ttl=DATAHAWK_JOB_TTL):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='datahawk-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args, meta=None, **kwargs):
+        """
+        Run `fn(job, *args, **kwargs)` in the background and return the Job.
+        `fn` should call job.report() as it goes and job.check_cancelled()
+        wherever it can stop early; its return value becomes job.result.
+        """
+        self.prune()
+        job = Job(kind, meta)
+        with self._lock:
+            self._jobs[job.id] = job
+        job._future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_requested:
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            self._finish(job, CANCELLED if job.cancel_requested else DONE)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            job.error = str(e)
+            print(f"{job.kind} job {job.id} failed: {job.error}")
+            self._finish(job, FAILED)
+
+    def _finish(self, job, status):
+        # Pollers treat the status as final, so everything else is set first
+        job.finished_at = time.time()
+        job.status = status
+
+    def get(self, job_id):
+        if not job_id:
+            return None
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Ask a job to stop. A queued job never starts; a running one stops at
+        its next cancellation check and its result is discarded.
+        """
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job._cancel.set()
+        job.report(message="⏹️ Cancelling...")
+        if job._future is not None and job._future.cancel():
+            self._finish(job, CANCELLED)
+        return True
+
+    def prune(self):
+        """Forget jobs that finished more than `ttl` seconds ago."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items()
+                           if job.finished and job.finished_at < cutoff]:
+                del self._jobs[job_id]
+
+    def active(self):
+        with self._lock:
+            return [job for job in self._jobs.values() if not job.finished]
+
+
+# One pool for every session in the process
+jobs = JobManager()
@@ -1,25 +1,45 @@
 import streamlit as st
-from scrape import (
-    scrape_website,
-    split_dom_content,
-    extract_body_content,
-    clean_body_content
-)
-from parse import parse_with_gemini
-import pandas as pd
+from datahawk import ExtractionResult, Pipeline
+import metrics
+from scheduler import scheduler as gemini_scheduler
+from jobs import jobs, CANCELLED as JOB_CANCELLED, DONE as JOB_DONE, FAILED as JOB_FAILED
 import re
 import time
 import base64
 import os
 
-def get_logo_base64():
-    """Convert logo.png to base64 string for HTML embedding"""
-    try:
-        logo_path = os.path.join(os.path.dirname(__file__), "logo.png")
-        with open(logo_path, "rb") as f:
-            return base64.b64encode(f.read()).decode()
-    except FileNotFoundError:
+# Streamlit reruns this script on every interaction; time each rerun
+rerun_started = time.perf_counter()
+
+# Reruns without a fetch or parse slower than this are logged
+RERUN_TARGET_MS = int(os.getenv('DATAHAWK_RERUN_TARGET_MS', '50'))
+# How often the page checks on a running fetch or parse
+JOB_POLL_SECONDS = float(os.getenv('DATAHAWK_JOB_POLL_SECONDS', '1'))
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+# Prometheus endpoint when DATAHAWK_METRICS_PORT is set; started once per process
+metrics.start_server()
+
+@st.cache_resource
+def load_css():
+    """Stylesheet from static/style.css, read once per process"""
+    with open(os.path.join(STATIC_DIR, "style.css"), "r", encoding="utf-8") as f:
+        return f.read()
+
+@st.cache_resource
+def get_logo_src():
+    """
+    Image source for the logo: a URL the browser caches when Streamlit static
+    serving is on (see .streamlit/config.toml), otherwise a data URI built once
+    """
+    logo_path = os.path.join(STATIC_DIR, "logo.png")
+    if not os.path.exists(logo_path):
         return None
+    if st.get_option("server.enableStaticServing"):
+        return "app/static/logo.png"
+    with open(logo_path, "rb") as f:
+        return "data:image/png;base64," + base64.b64encode(f.read()).decode()
 
 # Page configuration
 st.set_page_config(
@@ -29,257 +49,16 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for beautiful dark theme styling
-st.markdown("""
-<style>
-    /* Import Google Fonts */
-    @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700&display=swap');
-    
-    /* Global Dark Theme Styles */
-    .main {
-        padding-top: 2rem;
-        background-color: #1a1a1a;
-    }
-    
-    /* Custom font */
-    html, body, [class*="css"] {
-        font-family: 'Poppins', sans-serif;
-        background-color: #1a1a1a !important;
-        color: #e0e0e0 !important;
-    }
-    
-    /* Header styling - Dark theme */
-    .main-header {
-        background: linear-gradient(135deg, #2d1b69 0%, #11998e 100%);
-        padding: 2rem;
-        border-radius: 15px;
-        margin-bottom: 2rem;
-        text-align: center;
-        box-shadow: 0 10px 30px rgba(0,0,0,0.4);
-        border: 1px solid #333;
-    }
-    
-    .main-title {
-        color: #ffffff;
-        font-size: 3rem;
-        font-weight: 700;
-        margin-bottom: 0.5rem;
-        text-shadow: 2px 2px 4px rgba(0,0,0,0.5);
-    }
-    
-    .main-subtitle {
-        color: rgba(255,255,255,0.9);
-        font-size: 1.2rem;
-        font-weight: 300;
-    }
-    
-    /* Card styling - Dark theme */
-    .custom-card {
-        background: #2a2a2a;
-        padding: 2rem;
-        border-radius: 15px;
-        box-shadow: 0 5px 20px rgba(0,0,0,0.3);
-        border: 1px solid #404040;
-        margin-bottom: 2rem;
-    }
-    
-    /* Button styling - Dark theme */
-    .stButton > button {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        border: none;
-        border-radius: 10px;
-        padding: 0.75rem 2rem;
-        font-weight: 600;
-        transition: all 0.3s ease;
-        box-shadow: 0 4px 15px rgba(102, 126, 234, 0.4);
-    }
-    
-    .stButton > button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 6px 20px rgba(102, 126, 234, 0.6);
-        background: linear-gradient(135deg, #7c8cf0 0%, #8a5fb8 100%);
-    }
-    
-    /* Input styling - Dark theme */
-    .stTextInput > div > div > input {
-        background-color: #333333 !important;
-        border-radius: 10px;
-        border: 2px solid #555555;
-        padding: 0.75rem;
-        font-size: 1rem;
-        color: #e0e0e0 !important;
-        transition: border-color 0.3s ease;
-    }
-    
-    .stTextInput > div > div > input:focus {
-        border-color: #667eea;
-        box-shadow: 0 0 0 0.2rem rgba(102, 126, 234, 0.25);
-        background-color: #3a3a3a !important;
-    }
-    
-    /* Text area styling - Dark theme */
-    .stTextArea > div > div > textarea {
-        background-color: #333333 !important;
-        border-radius: 10px;
-        border: 2px solid #555555;
-        color: #e0e0e0 !important;
-        transition: border-color 0.3s ease;
-    }
-    
-    .stTextArea > div > div > textarea:focus {
-        border-color: #667eea;
-        box-shadow: 0 0 0 0.2rem rgba(102, 126, 234, 0.25);
-        background-color: #3a3a3a !important;
-    }
-    
-    /* Success/Error styling - Dark theme */
-    .stSuccess {
-        background: linear-gradient(135deg, #1e3a8a 0%, #1e40af 100%);
-        border-radius: 10px;
-        padding: 1rem;
-        border: 1px solid #3b82f6;
-        color: #e0e0e0;
-    }
-    
-    .stError {
-        background: linear-gradient(135deg, #7f1d1d 0%, #991b1b 100%);
-        border-radius: 10px;
-        padding: 1rem;
-        border: 1px solid #ef4444;
-        color: #e0e0e0;
-    }
-    
-    /* Sidebar styling - Dark theme */
-    .css-1d391kg {
-        background: linear-gradient(180deg, #2a2a2a 0%, #1f1f1f 100%);
-    }
-    
-    /* Progress bar styling - Dark theme */
-    .stProgress > div > div > div {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        border-radius: 10px;
-    }
-    
-    /* Expandable styling - Dark theme */
-    .streamlit-expanderHeader {
-        background: #333333;
-        border-radius: 10px;
-        border: 1px solid #555555;
-        color: #e0e0e0;
-    }
-    
-    /* Metrics styling - Dark theme */
-    .metric-card {
-        background: linear-gradient(135deg, #1f2937 0%, #374151 100%);
-        padding: 1.5rem;
-        border-radius: 15px;
-        text-align: center;
-        margin: 1rem 0;
-        border: 1px solid #4b5563;
-        box-shadow: 0 4px 12px rgba(0,0,0,0.3);
-    }
-    
-    /* Animation keyframes */
-    @keyframes fadeIn {
-        from { opacity: 0; transform: translateY(20px); }
-        to { opacity: 1; transform: translateY(0); }
-    }
-    
-    .fade-in {
-        animation: fadeIn 0.5s ease-out;
-    }
-    
-    /* Loading animation - Dark theme */
-    .loading-container {
-        display: flex;
-        justify-content: center;
-        align-items: center;
-        padding: 2rem;
-    }
-    
-    .loading-spinner {
-        border: 4px solid #444444;
-        border-top: 4px solid #667eea;
-        border-radius: 50%;
-        width: 40px;
-        height: 40px;
-        animation: spin 1s linear infinite;
-    }
-    
-    @keyframes spin {
-        0% { transform: rotate(0deg); }
-        100% { transform: rotate(360deg); }
-    }
-    
-    /* Feature box styling - Dark theme */
-    .feature-box {
-        background: #2a2a2a;
-        padding: 1.5rem;
-        border-radius: 12px;
-        border-left: 4px solid #667eea;
-        box-shadow: 0 2px 10px rgba(0,0,0,0.3);
-        margin: 1rem 0;
-        border: 1px solid #404040;
-    }
-    
-    /* Status indicators */
-    .status-indicator {
-        display: inline-block;
-        width: 10px;
-        height: 10px;
-        border-radius: 50%;
-        margin-right: 8px;
-    }
-    
-    .status-success { background: #10b981; }
-    .status-warning { background: #f59e0b; }
-    .status-error { background: #ef4444; }
-    .status-info { background: #3b82f6; }
-    
-    /* Dark theme text colors */
-    h1, h2, h3, h4, h5, h6 {
-        color: #e0e0e0 !important;
-    }
-    
-    p, span, div {
-        color: #b0b0b0 !important;
-    }
-    
-    /* Metric styling dark theme */
-    .css-1r6slb0 {
-        background: #2a2a2a;
-        border: 1px solid #404040;
-        border-radius: 10px;
-    }
-    
-    /* Custom scrollbar - Dark theme */
-    ::-webkit-scrollbar {
-        width: 8px;
-    }
-    
-    ::-webkit-scrollbar-track {
-        background: #1a1a1a;
-    }
-    
-    ::-webkit-scrollbar-thumb {
-        background: #555555;
-        border-radius: 4px;
-    }
-    
-    ::-webkit-scrollbar-thumb:hover {
-        background: #667eea;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Dark theme styles, read once per process
+st.markdown(f"<style>{load_css()}</style>", unsafe_allow_html=True)
 
 
 # Beautiful Dark Theme Header with Logo
-logo_base64 = get_logo_base64()
-if logo_base64:
+logo_src = get_logo_src()
+if logo_src:
     st.markdown(f"""
     <div class="main-header fade-in">
-        <img src="data:image/png;base64,{logo_base64}" style="height: 180px; margin-bottom: 0px;" alt="DataHawk Logo"/>
+        <img src="{logo_src}" style="height: 180px; margin-bottom: 0px;" alt="DataHawk Logo"/>
         <p class="main-subtitle">AI-Powered Web Scraping Revolution-Janith Prabash</p>
     </div>
     """, unsafe_allow_html=True)
@@ -347,6 +126,8 @@ with col2:
     # Fetch button with better styling
     fetch_button = st.button("🚀 Fetch Data", type="primary", use_container_width=True)
 
+refresh_page = st.checkbox("🔄 Refetch even if this page is cached", value=False)
+
 # URL validation function
 def is_valid_url(url):
     """Validate URL format"""
@@ -359,6 +140,120 @@ def is_valid_url(url):
         r'(?:/?|[/?]\S+)$', re.IGNORECASE)
     return pattern.match(url) is not None
 
+def render_run_breakdown(run_metrics, title):
+    """Where one run's time went, stage by stage, plus its counters"""
+    if not run_metrics.get('stages'):
+        return
+    with st.expander(title, expanded=False):
+        stages = [
+            {'Stage': stage, 'Calls': entry['count'], 'Seconds': round(entry['seconds'], 3), 'Errors': entry['errors']}
+            for stage, entry in run_metrics['stages'].items()
+        ]
+        st.dataframe(stages, use_container_width=True, hide_index=True)
+        counters = run_metrics.get('counters', {})
+        if counters:
+            st.markdown(" · ".join(f"**{name}** {value:,}" for name, value in sorted(counters.items())))
+
+def describe_fetch_event(event):
+    """Progress percentage and status line for a fetch event, or None to keep the current one"""
+    if event.kind == 'started' and event.stage == 'fetch':
+        return 10, f"🌐 Connecting to {event.data['url']}..."
+    if event.kind == 'requesting':
+        return 20, "⚡ Requesting page over HTTP..."
+    if event.kind == 'escalated':
+        return 25, f"🧭 Page needs a browser ({event.data['reason'].replace('_', ' ')}), switching..."
+    if event.kind == 'navigating':
+        return 30, "📄 Loading page in remote browser..."
+    if event.kind == 'ready' and event.stage == 'fetch':
+        return 45, "📄 Page loaded" + ("" if event.data['met'] else " (timed out, using what arrived)")
+    if event.stage == 'captcha' and event.kind == 'started':
+        return 50, "🛡️ Checking for CAPTCHA..."
+    if event.stage == 'captcha' and event.kind == 'skipped':
+        return 50, "🛡️ No CAPTCHA expected on this site, reading page..."
+    if event.kind in ('finished', 'cache_hit', 'coalesced') and event.stage == 'fetch':
+        source = {'cache_hit': "cache", 'coalesced': "a fetch already in progress"}.get(event.kind, "website")
+        return 80, f"✨ Received {event.data['bytes']:,} bytes from {source}, cleaning..."
+    if event.stage == 'clean' and event.kind == 'finished':
+        return 90, "📦 Splitting the page into chunks..."
+    return None
+
+def describe_parse_event(event):
+    """Progress percentage and status line for a parse event, or None to keep the current one"""
+    if event.kind == 'chunk_done':
+        chunk_note = " (cached)" if event.data['cached'] else ""
+        return (event.data['completed'] / event.data['total'] * 100,
+                f"Processed chunk {event.data['completed']} of {event.data['total']}{chunk_note}")
+    if event.kind == 'retry':
+        return None, (f"⏳ Chunk {event.data['index']} was rate limited, retrying in "
+                      f"{event.data['delay']:.0f}s (attempt {event.data['attempt']})...")
+    if event.kind == 'fast_path':
+        return 100, f"⚡ Answered by the {event.data['rule']} rule, no AI call needed"
+    return None
+
+def run_fetch_job(job, url, refresh):
+    """Background job: fetch and clean a page, then chunk and index it for parsing"""
+    def on_event(event):
+        update = describe_fetch_event(event)
+        if update:
+            job.report(*update)
+
+    job.report(5, f"🌐 Starting fetch of {url}...")
+    fetch_pipeline = Pipeline(refresh=refresh)
+    fetch_result = fetch_pipeline.fetch(url, on_event=on_event)
+    job.check_cancelled()
+    if fetch_result.errors:
+        return {'fetch_result': fetch_result}
+    chunk_plan = fetch_pipeline.plan(fetch_result.content)
+    return {
+        'fetch_result': fetch_result,
+        'chunk_plan': chunk_plan,
+        'relevance_index': fetch_pipeline.index(chunk_plan),
+    }
+
+def run_parse_job(job, extraction, description, structured, stream, **parse_options):
+    """
+    Background job: parse the page into `extraction`, keeping the text of
+    each chunk (or its streamed tokens so far) in job.partial for live display
+    """
+    def on_event(event):
+        update = describe_parse_event(event)
+        if update:
+            job.report(*update)
+
+    job.report(0, "🤖 AI is parsing your data...")
+    items = Pipeline(structured=structured).iter_parse(
+        extraction.content, description, result=extraction, stream=stream, on_event=on_event, **parse_options
+    )
+    try:
+        for item in items:
+            # Closing the iterator below cancels the chunks that haven't started
+            job.check_cancelled()
+            if 'delta' in item:
+                job.partial[item['index']] = job.partial.get(item['index'], "") + item['delta']
+            else:
+                job.partial[item['index']] = item['text']
+    finally:
+        items.close()
+    return extraction
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def render_job_progress(job_id, show_partial=False):
+    """Progress of a background job, refreshed on its own until the job ends"""
+    job = jobs.get(job_id)
+    if job is None or job.finished:
+        # Rerun the whole page so it can show the outcome
+        st.rerun()
+    st.progress(job.progress)
+    st.text(f"{job.message or 'Queued...'} ({job.elapsed:.0f}s)")
+    if show_partial:
+        partial = dict(job.partial)
+        live = "\n".join(partial[index].strip() for index in sorted(partial) if partial[index].strip())
+        if live:
+            st.text(live)
+    if st.button("⏹️ Cancel", key=f"cancel_{job_id}", disabled=job.cancel_requested):
+        jobs.cancel(job_id)
+        st.rerun()
+
 # Enhanced fetch data logic
 if fetch_button:
     if not url:
@@ -393,111 +288,113 @@ if fetch_button:
                 </div>
                 """, unsafe_allow_html=True)
             
-            # Beautiful loading animation - Dark theme
-            with st.container():
-                st.markdown("""
-                <div style="text-align: center; padding: 2rem; background: #2a2a2a; border-radius: 15px; border: 1px solid #404040;">
-                    <div class="loading-spinner"></div>
-                    <h4 style="margin-top: 1rem; color: #667eea;">🚀 Initializing AI Scraper...</h4>
-                    <p style="color: #b0b0b0;">Connecting to website and extracting content</p>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                # Progress simulation
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                for i in range(101):
-                    progress_bar.progress(i)
-                    if i < 30:
-                        status_text.text(f"🔍 Analyzing website structure... {i}%")
-                    elif i < 60:
-                        status_text.text(f"🌐 Connecting to {url}... {i}%")
-                    elif i < 90:
-                        status_text.text(f"📄 Extracting content... {i}%")
-                    else:
-                        status_text.text(f"✨ Finalizing data... {i}%")
-                    time.sleep(0.05)
-                
-                # Actual scraping
-                result = scrape_website(url)
-                progress_bar.empty()
-                status_text.empty()
-                
-                if result.startswith("Error:"):
-                    st.markdown(f"""
-                    <div style="background: linear-gradient(135deg, #7f1d1d 0%, #991b1b 100%); 
-                                padding: 1.5rem; border-radius: 15px; text-align: center; border: 1px solid #ef4444;">
-                        <h3 style="color: #fca5a5; margin: 0;">❌ Scraping Failed</h3>
-                        <p style="color: #fca5a5; margin: 0.5rem 0 0 0;">{result}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    body_content = extract_body_content(result)
-                    
-                    if body_content.startswith("Error:"):
-                        st.markdown(f"""
-                        <div style="background: linear-gradient(135deg, #7f1d1d 0%, #991b1b 100%); 
-                                    padding: 1.5rem; border-radius: 15px; text-align: center; border: 1px solid #ef4444;">
-                            <h3 style="color: #fca5a5; margin: 0;">❌ Content Extraction Failed</h3>
-                            <p style="color: #fca5a5; margin: 0.5rem 0 0 0;">{body_content}</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    else:
-                        cleaned_content = clean_body_content(body_content)
-                        
-                        if cleaned_content.startswith("Error:"):
-                            st.markdown(f"""
-                            <div style="background: linear-gradient(135deg, #7f1d1d 0%, #991b1b 100%); 
-                                        padding: 1.5rem; border-radius: 15px; text-align: center; border: 1px solid #ef4444;">
-                                <h3 style="color: #fca5a5; margin: 0;">❌ Content Cleaning Failed</h3>
-                                <p style="color: #fca5a5; margin: 0.5rem 0 0 0;">{cleaned_content}</p>
-                            </div>
-                            """, unsafe_allow_html=True)
-                        else:
-                            st.session_state.dom_content = cleaned_content
-                            
-                            # Success animation - Dark theme
-                            st.markdown(f"""
-                            <div style="background: linear-gradient(135deg, #1e3a8a 0%, #1e40af 100%); 
-                                        padding: 2rem; border-radius: 15px; text-align: center; margin: 2rem 0; border: 1px solid #3b82f6;">
-                                <h2 style="color: white; margin: 0; text-shadow: 2px 2px 4px rgba(0,0,0,0.5);">
-                                    🎉 Data Successfully Extracted!
-                                </h2>
-                                <p style="color: rgba(255,255,255,0.9); margin: 0.5rem 0 0 0; font-size: 1.1rem;">
-                                    Ready for AI-powered parsing from <strong style="color:#93c5fd;">{url}</strong>
-                                </p>
-                            </div>
-                            """, unsafe_allow_html=True)
-
-                            # Content preview with beautiful dark styling
-                            with st.expander("📄 View Extracted Content", expanded=False):
-                                st.markdown("""
-                                <div style="background: #333333; padding: 1rem; border-radius: 10px; 
-                                            border-left: 4px solid #667eea; border: 1px solid #555555;">
-                                    <h6 style="color: #667eea; margin: 0 0 1rem 0;">📊 Content Preview</h6>
-                                </div>
-                                """, unsafe_allow_html=True)
-                                st.text_area(
-                                    "Extracted Content", 
-                                    cleaned_content[:2000] + "..." if len(cleaned_content) > 2000 else cleaned_content, 
-                                    height=300,
-                                    disabled=True
-                                )
-                                
-                                # Content statistics - Dark theme
-                                col1, col2, col3 = st.columns(3)
-                                with col1:
-                                    st.metric("📝 Total Characters", f"{len(cleaned_content):,}")
-                                with col2:
-                                    st.metric("📄 Word Count", f"{len(cleaned_content.split()):,}")
-                                with col3:
-                                    st.metric("📋 Lines", f"{len(cleaned_content.splitlines()):,}")
+            # Runs in the background so widget clicks no longer abort it
+            for key in ('fetch_result', 'fetch_error', 'fetch_applied'):
+                st.session_state.pop(key, None)
+            st.session_state.fetch_job = jobs.submit('fetch', run_fetch_job, url, refresh_page).id
+
+# Fetch progress while the job runs; its outcome is kept until the next fetch
+fetch_job = jobs.get(st.session_state.get('fetch_job'))
+if fetch_job is not None and not fetch_job.finished:
+    st.markdown("""
+    <div style="text-align: center; padding: 2rem; background: #2a2a2a; border-radius: 15px; border: 1px solid #404040;">
+        <div class="loading-spinner"></div>
+        <h4 style="margin-top: 1rem; color: #667eea;">🚀 Initializing AI Scraper...</h4>
+        <p style="color: #b0b0b0;">Connecting to website and extracting content</p>
+    </div>
+    """, unsafe_allow_html=True)
+    render_job_progress(fetch_job.id)
+elif fetch_job is not None and st.session_state.get('fetch_applied') != fetch_job.id:
+    st.session_state.fetch_applied = fetch_job.id
+    if fetch_job.status == JOB_DONE:
+        fetch_outcome = fetch_job.result
+        st.session_state.fetch_result = fetch_outcome['fetch_result']
+        if not fetch_outcome['fetch_result'].errors:
+            st.session_state.dom_content = fetch_outcome['fetch_result'].content
+            # Raw markup lets rule-based extractors answer without the AI
+            st.session_state.raw_html = fetch_outcome['fetch_result'].html
+            st.session_state.page_url = fetch_outcome['fetch_result'].url
+            # Chunked and indexed once so every parse can skip irrelevant chunks
+            st.session_state.chunk_plan = fetch_outcome['chunk_plan']
+            st.session_state.relevance_index = fetch_outcome['relevance_index']
+    elif fetch_job.status == JOB_CANCELLED:
+        st.session_state.fetch_error = "The fetch was cancelled."
+    else:
+        st.session_state.fetch_error = fetch_job.error
+
+if st.session_state.get('fetch_error'):
+    st.markdown(f"""
+    <div style="background: linear-gradient(135deg, #7f1d1d 0%, #991b1b 100%); 
+                padding: 1.5rem; border-radius: 15px; text-align: center; border: 1px solid #ef4444;">
+        <h3 style="color: #fca5a5; margin: 0;">❌ Scraping Failed</h3>
+        <p style="color: #fca5a5; margin: 0.5rem 0 0 0;">{st.session_state.fetch_error}</p>
+    </div>
+    """, unsafe_allow_html=True)
+elif 'fetch_result' in st.session_state:
+    fetch_result = st.session_state.fetch_result
+    if fetch_result.errors:
+        fetch_error = fetch_result.errors[0]
+        failure_title = "Scraping Failed" if fetch_error.stage == 'fetch' else "Content Cleaning Failed"
+        st.markdown(f"""
+        <div style="background: linear-gradient(135deg, #7f1d1d 0%, #991b1b 100%); 
+                    padding: 1.5rem; border-radius: 15px; text-align: center; border: 1px solid #ef4444;">
+            <h3 style="color: #fca5a5; margin: 0;">❌ {failure_title}</h3>
+            <p style="color: #fca5a5; margin: 0.5rem 0 0 0;">{fetch_error.message}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        cleaned_content = fetch_result.content
+        # Success animation - Dark theme
+        st.markdown(f"""
+        <div style="background: linear-gradient(135deg, #1e3a8a 0%, #1e40af 100%); 
+                    padding: 2rem; border-radius: 15px; text-align: center; margin: 2rem 0; border: 1px solid #3b82f6;">
+            <h2 style="color: white; margin: 0; text-shadow: 2px 2px 4px rgba(0,0,0,0.5);">
+                🎉 Data Successfully Extracted!
+            </h2>
+            <p style="color: rgba(255,255,255,0.9); margin: 0.5rem 0 0 0; font-size: 1.1rem;">
+                Ready for AI-powered parsing from <strong style="color:#93c5fd;">{fetch_result.url}</strong>
+            </p>
+        </div>
+        """, unsafe_allow_html=True)
+
+        # Content preview with beautiful dark styling
+        with st.expander("📄 View Extracted Content", expanded=False):
+            st.markdown("""
+            <div style="background: #333333; padding: 1rem; border-radius: 10px; 
+                        border-left: 4px solid #667eea; border: 1px solid #555555;">
+                <h6 style="color: #667eea; margin: 0 0 1rem 0;">📊 Content Preview</h6>
+            </div>
+            """, unsafe_allow_html=True)
+            st.text_area(
+                "Extracted Content", 
+                cleaned_content[:2000] + "..." if len(cleaned_content) > 2000 else cleaned_content, 
+                height=300,
+                disabled=True
+            )
+
+            # Content statistics - Dark theme
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("📝 Total Characters", f"{len(cleaned_content):,}")
+            with col2:
+                st.metric("📄 Word Count", f"{len(cleaned_content.split()):,}")
+            with col3:
+                st.metric("📋 Lines", f"{len(cleaned_content.splitlines()):,}")
+
+            if fetch_result.dedup.get('lines_removed'):
+                st.markdown(
+                    f'<p style="color:#b0b0b0;">🧹 Removed {fetch_result.dedup["lines_removed"]:,} '
+                    f'duplicate or boilerplate lines (~{fetch_result.dedup["tokens_removed"]:,} tokens)</p>',
+                    unsafe_allow_html=True
+                )
+
+            render_run_breakdown(fetch_result.metrics, "⏱️ Fetch breakdown")
 
 st.markdown('</div>', unsafe_allow_html=True)  # Close custom-card
 
 
 # AI Parsing Section with Beautiful Design
+parse_button = False
 if "dom_content" in st.session_state:
     st.markdown("---")
     
@@ -561,6 +458,8 @@ if "dom_content" in st.session_state:
     
     with col2:
         if st.button("🗑️ Clear All Data", use_container_width=True):
+            for job_key in ('fetch_job', 'parse_job'):
+                jobs.cancel(st.session_state.get(job_key))
             for key in list(st.session_state.keys()):
                 del st.session_state[key]
             st.rerun()
@@ -568,6 +467,16 @@ if "dom_content" in st.session_state:
     with col3:
         st.markdown("<br>", unsafe_allow_html=True)  # Spacing
 
+    stream_tokens = st.checkbox("⚡ Stream text while each chunk is generated", value=False)
+    parse_all_chunks = st.checkbox("📚 Parse every chunk (skip the relevance filter)", value=False)
+    structured_output = st.checkbox("🧩 Structured output (JSON rows with fixed columns)", value=False)
+    schema_columns = ""
+    if structured_output:
+        schema_columns = st.text_input(
+            "Columns",
+            placeholder="e.g. Name, Price, Rating (leave blank to infer from the description)"
+        )
+
     # Enhanced parsing logic
     if parse_button:
         if not parse_description.strip():
@@ -580,383 +489,296 @@ if "dom_content" in st.session_state:
             </div>
             """, unsafe_allow_html=True)
         else:
-            # Beautiful AI processing animation - Dark theme
+            # Plan the chunks up front so the number of AI calls is known
+            pipeline = Pipeline(structured=structured_output)
+            chunk_plan = st.session_state.get('chunk_plan') or pipeline.plan(st.session_state.dom_content)
+            relevance_index = st.session_state.get('relevance_index') or pipeline.index(chunk_plan)
+            if parse_all_chunks or chunk_plan['count'] < 2:
+                relevant_chunks = chunk_plan['count']
+            else:
+                relevant_chunks = len(relevance_index.select(parse_description, min_ratio=pipeline.min_relevance))
+            quota = gemini_scheduler.remaining()
+            quota_note = ""
+            if quota['daily_tokens_remaining'] is not None:
+                quota_note = (f' · 🎟️ {quota["daily_tokens_remaining"]:,} of {quota["daily_tokens_limit"]:,} '
+                              f'Gemini tokens left today')
+            parse_note = (f'📦 {relevant_chunks} of {chunk_plan["count"]} chunk(s) relevant, '
+                          f'~{chunk_plan["total_tokens"]:,} tokens on the page{quota_note}')
+            
+            # Runs in the background; results stay in the job until the next parse
+            extraction = ExtractionResult(
+                url=st.session_state.get('page_url', ""), content=st.session_state.dom_content
+            )
+            st.session_state.parse_job = jobs.submit(
+                'parse', run_parse_job, extraction, parse_description,
+                structured=structured_output,
+                stream=stream_tokens,
+                chunk_plan=chunk_plan,
+                index=relevance_index,
+                parse_all=parse_all_chunks,
+                html=st.session_state.get('raw_html'),
+                columns=schema_columns.strip() or None,
+                meta={'note': parse_note}
+            ).id
+    
+    parse_job = jobs.get(st.session_state.get('parse_job'))
+    if parse_job is not None and not parse_job.finished:
+        st.markdown("""
+        <div style="background: linear-gradient(135deg, #374151 0%, #4b5563 100%); 
+                    padding: 2rem; border-radius: 15px; text-align: center; margin: 2rem 0; border: 1px solid #6b7280;">
+            <h3 style="margin: 0; color: #e0e0e0;">🤖 AI Brain is Working...</h3>
+            <p style="margin: 0.5rem 0 0 0; color: #d1d5db;">Analyzing content and extracting your requested data</p>
+        </div>
+        """, unsafe_allow_html=True)
+        st.markdown(f'<p style="color:#b0b0b0; text-align:center;">{parse_job.meta["note"]}</p>',
+                    unsafe_allow_html=True)
+        # Rows appear as soon as each chunk (or token) arrives
+        render_job_progress(parse_job.id, show_partial=True)
+    elif parse_job is not None and parse_job.status == JOB_FAILED:
+        st.markdown(f"""
+        <div style="background: linear-gradient(135deg, #7f1d1d 0%, #991b1b 100%); 
+                    padding: 2rem; border-radius: 15px; text-align: center; border: 1px solid #ef4444;">
+            <h3 style="color: #fca5a5; margin: 0;">❌ Processing Error</h3>
+            <p style="color: #fca5a5; margin: 0.5rem 0 0 0;">{parse_job.error}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    elif parse_job is not None and parse_job.status == JOB_CANCELLED:
+        st.markdown("""
+        <div style="background: linear-gradient(135deg, #92400e 0%, #b45309 100%); 
+                    padding: 1rem; border-radius: 10px; text-align: center; border: 1px solid #f59e0b;">
+            <span class="status-indicator status-warning"></span>
+            <strong style="color:#fde68a;">Parsing was cancelled</strong>
+        </div>
+        """, unsafe_allow_html=True)
+    elif parse_job is not None and parse_job.status == JOB_DONE:
+        extraction = parse_job.result
+        result = extraction.text
+        failed_chunks = extraction.errors
+
+        if failed_chunks:
+            st.markdown(f"""
+            <div style="background: linear-gradient(135deg, #92400e 0%, #b45309 100%); 
+                        padding: 1rem; border-radius: 10px; text-align: center; border: 1px solid #f59e0b;">
+                <span class="status-indicator status-warning"></span>
+                <strong style="color:#fde68a;">{len(failed_chunks)} of {extraction.chunks} chunks could not be parsed</strong>
+                <p style="margin: 0.5rem 0 0 0; color:#fde68a;">{failed_chunks[0].message}</p>
+            </div>
+            """, unsafe_allow_html=True)
+
+        # Beautiful results display - Dark theme
+        if result.strip():
             st.markdown("""
-            <div style="background: linear-gradient(135deg, #374151 0%, #4b5563 100%); 
-                        padding: 2rem; border-radius: 15px; text-align: center; margin: 2rem 0; border: 1px solid #6b7280;">
-                <h3 style="margin: 0; color: #e0e0e0;">🤖 AI Brain is Working...</h3>
-                <p style="margin: 0.5rem 0 0 0; color: #d1d5db;">Analyzing content and extracting your requested data</p>
+            <div style="background: linear-gradient(135deg, #1e3a8a 0%, #1e40af 100%); 
+                        padding: 2rem; border-radius: 15px; text-align: center; margin: 2rem 0; border: 1px solid #3b82f6;">
+                <h2 style="color: white; margin: 0; text-shadow: 2px 2px 4px rgba(0,0,0,0.5);">
+                    🎉 Data Extraction Successful!
+                </h2>
+                <p style="color: rgba(255,255,255,0.9); margin: 0.5rem 0 0 0; font-size: 1.1rem;">
+                    AI has successfully extracted your requested information
+                </p>
             </div>
             """, unsafe_allow_html=True)
-            
-            # Processing with progress
-            dom_chunks = split_dom_content(st.session_state.dom_content)
-            
-            progress_container = st.container()
-            with progress_container:
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                chunk_progress = st.empty()
-                
-                try:
-                    # Simulate AI processing stages
-                    stages = [
-                        "🔍 Analyzing content structure...",
-                        "🧠 Initializing AI models...", 
-                        "📖 Processing text chunks...",
-                        "🎯 Extracting relevant data...",
-                        "✨ Finalizing results..."
-                    ]
-                    
-                    for i, stage in enumerate(stages):
-                        progress = int((i + 1) / len(stages) * 30)  # First 30% for setup
-                        progress_bar.progress(progress)
-                        status_text.text(stage)
-                        time.sleep(0.5)
-                    
-                    # Actual AI processing with chunk progress
-                    status_text.text("🤖 AI is parsing your data...")
-                    
-                    # Custom parsing function with progress tracking
-                    parsed_results = []
-                    for i, chunk in enumerate(dom_chunks):
-                        chunk_progress.text(f"Processing chunk {i+1} of {len(dom_chunks)}")
-                        
-                        # Update progress (30% + 60% for processing)
-                        progress_val = 30 + int((i + 1) / len(dom_chunks) * 60)
-                        progress_bar.progress(progress_val)
-                        
-                        # Call Gemini API
-                        from parse import parse_with_gemini
-                        template = (
-                            "You are tasked with extracting specific information from the following text content: {dom_content}. "
-                            "Please follow these instructions carefully: \n\n"
-                            "1. **Extract Information:** Only extract the information that directly matches the provided description: {parse_description}. "
-                            "2. **No Extra Content:** Do not include any additional text, comments, or explanations in your response. "
-                            "3. **Empty Response:** If no information matches the description, return an empty string ('')."
-                            "4. **Direct Data Only:** Your output should contain only the data that is explicitly requested, with no other text."
-                        )
-                        
-                        import google.generativeai as genai
-                        import os
-                        from dotenv import load_dotenv
-                        
-                        load_dotenv()
-                        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-                        model = genai.GenerativeModel('gemini-1.5-flash')
-                        
-                        prompt = template.format(dom_content=chunk, parse_description=parse_description)
-                        response = model.generate_content(prompt)
-                        parsed_results.append(response.text)
-                        
-                        time.sleep(0.2)  # Small delay for visual effect
-                    
-                    # Finalization
-                    progress_bar.progress(100)
-                    status_text.text("✅ Processing completed!")
-                    chunk_progress.empty()
-                    
-                    time.sleep(1)
-                    progress_bar.empty()
-                    status_text.empty()
-                    
-                    result = "\n".join(parsed_results)
-                    
-                    # Process and format results for better display
-                    def format_results_as_table(text):
-                        """Convert structured text data into a pandas DataFrame if possible"""
-                        import pandas as pd
-                        import re
-                        
-                        lines = [line.strip() for line in text.split('\n') if line.strip()]
-                        if not lines:
-                            return None, text
-                        
-                        # Try to detect common separators and patterns
-                        separators = [' - ', ' | ', '\t', ':', ' , ', ', ']
-                        table_data = []
-                        headers = []
-                        
-                        # Check if data looks like structured rows
-                        for separator in separators:
-                            if all(separator in line for line in lines[:min(5, len(lines))]):
-                                # Found consistent separator
-                                for i, line in enumerate(lines):
-                                    parts = [part.strip() for part in line.split(separator)]
-                                    if i == 0:
-                                        # Use first row structure to determine headers
-                                        if len(parts) == 2:
-                                            headers = ['Item', 'Value']
-                                        elif len(parts) == 3:
-                                            headers = ['Name', 'Price', 'Rating']
-                                        elif len(parts) == 4:
-                                            headers = ['Title', 'Price', 'Rating', 'Status']
-                                        else:
-                                            headers = [f'Column {j+1}' for j in range(len(parts))]
-                                    
-                                    if len(parts) == len(headers):
-                                        table_data.append(parts)
-                                
-                                if len(table_data) > 1:
-                                    try:
-                                        df = pd.DataFrame(table_data, columns=headers)
-                                        return df, text
-                                    except:
-                                        continue
-                        
-                        # Try to detect price patterns (common in e-commerce)
-                        price_pattern = r'([^$£€¥₹]+)[\s\-]+[\$£€¥₹]?(\d+\.?\d*)'
-                        matches = re.findall(price_pattern, text)
-                        if len(matches) >= 3:
-                            df = pd.DataFrame(matches, columns=['Product', 'Price'])
-                            return df, text
-                        
-                        # Try to detect email/contact patterns
-                        email_pattern = r'([^@\s]+@[^@\s]+\.[^@\s]+)'
-                        phone_pattern = r'(\+?\d{1,3}[-.\s]?\(?\d{1,4}\)?[-.\s]?\d{1,4}[-.\s]?\d{1,9})'
-                        
-                        emails = re.findall(email_pattern, text)
-                        phones = re.findall(phone_pattern, text)
-                        
-                        if emails or phones:
-                            contact_data = []
-                            for email in emails:
-                                contact_data.append(['Email', email])
-                            for phone in phones:
-                                contact_data.append(['Phone', phone])
-                            
-                            if contact_data:
-                                df = pd.DataFrame(contact_data, columns=['Type', 'Contact'])
-                                return df, text
-                        
-                        return None, text
-                    
-                    # Beautiful results display - Dark theme
-                    if result.strip():
-                        st.markdown("""
-                        <div style="background: linear-gradient(135deg, #1e3a8a 0%, #1e40af 100%); 
-                                    padding: 2rem; border-radius: 15px; text-align: center; margin: 2rem 0; border: 1px solid #3b82f6;">
-                            <h2 style="color: white; margin: 0; text-shadow: 2px 2px 4px rgba(0,0,0,0.5);">
-                                🎉 Data Extraction Successful!
-                            </h2>
-                            <p style="color: rgba(255,255,255,0.9); margin: 0.5rem 0 0 0; font-size: 1.1rem;">
-                                AI has successfully extracted your requested information
-                            </p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                        # Results container - Dark theme
-                        st.markdown('<div class="custom-card">', unsafe_allow_html=True)
-                        st.markdown('<h3 style="color:#e0e0e0;">📊 Extracted Data</h3>', unsafe_allow_html=True)
-                        
-                        # Try to format as table
-                        df, raw_text = format_results_as_table(result)
-                        
-                        # Display format selector
-                        col1, col2 = st.columns([3, 1])
-                        with col1:
-                            st.markdown('<h4 style="color:#e0e0e0;">📋 Results Display</h4>', unsafe_allow_html=True)
-                        with col2:
-                            if df is not None:
-                                display_format = st.selectbox(
-                                    "Format:",
-                                    ["📊 Table View", "📝 Raw Text"],
-                                    label_visibility="collapsed"
-                                )
-                            else:
-                                display_format = "📝 Raw Text"
-                        
-                        # Display results based on selected format
-                        if df is not None and display_format == "📊 Table View":
-                            st.markdown("""
-                            <div style="background: #333333; padding: 1rem; border-radius: 10px; 
-                                        border-left: 4px solid #667eea; border: 1px solid #555555; margin: 1rem 0;">
-                                <h6 style="color: #667eea; margin: 0 0 1rem 0;">📊 Structured Data Table</h6>
-                            </div>
-                            """, unsafe_allow_html=True)
-                            
-                            # Custom styled dataframe
-                            st.dataframe(
-                                df,
-                                use_container_width=True,
-                                hide_index=True,
-                                column_config={
-                                    col: st.column_config.TextColumn(
-                                        width="medium",
-                                        help=f"Data from {col} column"
-                                    ) for col in df.columns
-                                }
-                            )
-                            
-                            # Table statistics
-                            col1, col2, col3 = st.columns(3)
-                            with col1:
-                                st.metric("📊 Rows", len(df))
-                            with col2:
-                                st.metric("📋 Columns", len(df.columns))
-                            with col3:
-                                st.metric("📈 Data Points", len(df) * len(df.columns))
-                        
-                        else:
-                            # Raw text display with better formatting
-                            st.markdown("""
-                            <div style="background: #333333; padding: 1rem; border-radius: 10px; 
-                                        border-left: 4px solid #667eea; border: 1px solid #555555; margin: 1rem 0;">
-                                <h6 style="color: #667eea; margin: 0 0 1rem 0;">📝 Raw Text Data</h6>
-                            </div>
-                            """, unsafe_allow_html=True)
-                            
-                            # Results text area with custom styling
-                            st.text_area(
-                                "Your extracted data:",
-                                result,
-                                height=300,
-                                disabled=True,
-                                label_visibility="collapsed"
-                            )
-                        
-                        # Action buttons for results
-                        st.markdown('<h4 style="color:#e0e0e0;">💾 Download Options</h4>', unsafe_allow_html=True)
-                        col1, col2, col3 = st.columns([2, 2, 2])
-                        
-                        with col1:
-                            st.download_button(
-                                label="💾 Download TXT",
-                                data=result,
-                                file_name=f"datahawk_results_{int(time.time())}.txt",
-                                mime="text/plain",
-                                use_container_width=True
-                            )
-                        
-                        with col2:
-                            if df is not None:
-                                # Convert DataFrame to CSV
-                                csv_data = df.to_csv(index=False)
-                                st.download_button(
-                                    label="📊 Download CSV",
-                                    data=csv_data,
-                                    file_name=f"datahawk_table_{int(time.time())}.csv",
-                                    mime="text/csv",
-                                    use_container_width=True
-                                )
-                            else:
-                                # Fallback CSV with basic formatting
-                                csv_data = result.replace('\n', '\n')
-                                st.download_button(
-                                    label="📊 Download CSV",
-                                    data=csv_data,
-                                    file_name=f"datahawk_results_{int(time.time())}.csv",
-                                    mime="text/csv",
-                                    use_container_width=True
-                                )
-                        
-                        with col3:
-                            if df is not None:
-                                # Convert DataFrame to JSON
-                                json_data = df.to_json(orient='records', indent=2)
-                                st.download_button(
-                                    label="🗂️ Download JSON",
-                                    data=json_data,
-                                    file_name=f"datahawk_data_{int(time.time())}.json",
-                                    mime="application/json",
-                                    use_container_width=True
-                                )
-                            else:
-                                st.markdown("""
-                                <div style="padding: 0.5rem; text-align: center; color: #6b7280; font-size: 0.9rem;">
-                                    JSON format available for structured data
-                                </div>
-                                """, unsafe_allow_html=True)
-                        
-                        # Results statistics - Dark theme
-                        st.markdown('<h4 style="color:#e0e0e0;">📈 Extraction Statistics</h4>', unsafe_allow_html=True)
-                        col1, col2, col3, col4 = st.columns(4)
-                        
-                        with col1:
-                            st.metric("📝 Characters", len(result))
-                        with col2:
-                            st.metric("📄 Lines", len(result.splitlines()))
-                        with col3:
-                            if df is not None:
-                                st.metric("� Table Rows", len(df))
-                            else:
-                                st.metric("�🔍 Chunks Processed", len(dom_chunks))
-                        with col4:
-                            st.metric("⚡ Words Found", len(result.split()))
-                        
-                        # Additional formatting tips if table view is available
-                        if df is not None:
-                            with st.expander("💡 Table Formatting Tips"):
-                                st.markdown("""
-                                **✅ Your data was automatically formatted into a table because:**
-                                - Consistent separators were detected (-, |, :, etc.)
-                                - Structured patterns were found (prices, contacts, etc.)
-                                - Data appears to have multiple columns
-                                
-                                **📊 Available formats:**
-                                - **Table View**: Clean, sortable columns
-                                - **Raw Text**: Original extracted format
-                                - **CSV Download**: Spreadsheet compatible
-                                - **JSON Download**: API/database ready
-                                """)
-                        else:
-                            with st.expander("💡 Want table formatting?"):
-                                st.markdown("""
-                                **To get automatic table formatting, try prompts like:**
-                                - "Extract book titles and prices separated by hyphen"
-                                - "Get product name | price | rating format"
-                                - "List items in: Title - Price - Stock format"
-                                - "Find all contacts with name: email format"
-                                
-                                **The AI will try to structure your data for better table display!**
-                                """)
-                        
-                        st.markdown('</div>', unsafe_allow_html=True)
-                        
-                    else:
-                        st.markdown("""
-                        <div style="background: linear-gradient(135deg, #92400e 0%, #b45309 100%); 
-                                    padding: 2rem; border-radius: 15px; text-align: center; border: 1px solid #f59e0b;">
-                            <h3 style="color: #fde68a; margin: 0;">🤔 No Matching Data Found</h3>
-                            <p style="color: #fde68a; margin: 0.5rem 0 0 0;">
-                                Try a different description or check if the website contains the data you're looking for
-                            </p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                        # Suggestions for better results
-                        with st.expander("💡 Tips for better results"):
-                            st.markdown("""
-                            - **Be more specific**: Instead of "get data", try "extract product names and prices"
-                            - **Use examples**: "Find emails like example@domain.com"
-                            - **Mention format**: "Get phone numbers in format (xxx) xxx-xxxx"
-                            - **Check the content**: Make sure the website actually contains what you're looking for
-                            """)
-                        
-                except Exception as e:
-                    progress_bar.empty()
-                    status_text.empty()
-                    chunk_progress.empty()
-                    
-                    st.markdown(f"""
-                    <div style="background: linear-gradient(135deg, #7f1d1d 0%, #991b1b 100%); 
-                                padding: 2rem; border-radius: 15px; text-align: center; border: 1px solid #ef4444;">
-                        <h3 style="color: #fca5a5; margin: 0;">❌ Processing Error</h3>
-                        <p style="color: #fca5a5; margin: 0.5rem 0 0 0;">{str(e)}</p>
+
+            # Results container - Dark theme
+            st.markdown('<div class="custom-card">', unsafe_allow_html=True)
+            st.markdown('<h3 style="color:#e0e0e0;">📊 Extracted Data</h3>', unsafe_allow_html=True)
+
+            # Table view when the results were tabular
+            df = extraction.to_dataframe()
+
+            # Display format selector
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.markdown('<h4 style="color:#e0e0e0;">📋 Results Display</h4>', unsafe_allow_html=True)
+            with col2:
+                if df is not None:
+                    display_format = st.selectbox(
+                        "Format:",
+                        ["📊 Table View", "📝 Raw Text"],
+                        label_visibility="collapsed"
+                    )
+                else:
+                    display_format = "📝 Raw Text"
+
+            # Display results based on selected format
+            if df is not None and display_format == "📊 Table View":
+                st.markdown("""
+                <div style="background: #333333; padding: 1rem; border-radius: 10px; 
+                            border-left: 4px solid #667eea; border: 1px solid #555555; margin: 1rem 0;">
+                    <h6 style="color: #667eea; margin: 0 0 1rem 0;">📊 Structured Data Table</h6>
+                </div>
+                """, unsafe_allow_html=True)
+
+                # Custom styled dataframe
+                st.dataframe(
+                    df,
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        col: st.column_config.TextColumn(
+                            width="medium",
+                            help=f"Data from {col} column"
+                        ) for col in df.columns
+                    }
+                )
+
+                # Table statistics
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("📊 Rows", len(df))
+                with col2:
+                    st.metric("📋 Columns", len(df.columns))
+                with col3:
+                    st.metric("📈 Data Points", len(df) * len(df.columns))
+
+            else:
+                # Raw text display with better formatting
+                st.markdown("""
+                <div style="background: #333333; padding: 1rem; border-radius: 10px; 
+                            border-left: 4px solid #667eea; border: 1px solid #555555; margin: 1rem 0;">
+                    <h6 style="color: #667eea; margin: 0 0 1rem 0;">📝 Raw Text Data</h6>
+                </div>
+                """, unsafe_allow_html=True)
+
+                # Results text area with custom styling
+                st.text_area(
+                    "Your extracted data:",
+                    result,
+                    height=300,
+                    disabled=True,
+                    label_visibility="collapsed"
+                )
+
+            # Action buttons for results
+            st.markdown('<h4 style="color:#e0e0e0;">💾 Download Options</h4>', unsafe_allow_html=True)
+            col1, col2, col3 = st.columns([2, 2, 2])
+
+            with col1:
+                st.download_button(
+                    label="💾 Download TXT",
+                    data=result,
+                    file_name=f"datahawk_results_{int(time.time())}.txt",
+                    mime="text/plain",
+                    use_container_width=True
+                )
+
+            with col2:
+                if df is not None:
+                    # Convert DataFrame to CSV
+                    csv_data = df.to_csv(index=False)
+                    st.download_button(
+                        label="📊 Download CSV",
+                        data=csv_data,
+                        file_name=f"datahawk_table_{int(time.time())}.csv",
+                        mime="text/csv",
+                        use_container_width=True
+                    )
+                else:
+                    # Fallback CSV with basic formatting
+                    csv_data = result.replace('\n', '\n')
+                    st.download_button(
+                        label="📊 Download CSV",
+                        data=csv_data,
+                        file_name=f"datahawk_results_{int(time.time())}.csv",
+                        mime="text/csv",
+                        use_container_width=True
+                    )
+
+            with col3:
+                if df is not None:
+                    # Convert DataFrame to JSON
+                    json_data = df.to_json(orient='records', indent=2)
+                    st.download_button(
+                        label="🗂️ Download JSON",
+                        data=json_data,
+                        file_name=f"datahawk_data_{int(time.time())}.json",
+                        mime="application/json",
+                        use_container_width=True
+                    )
+                else:
+                    st.markdown("""
+                    <div style="padding: 0.5rem; text-align: center; color: #6b7280; font-size: 0.9rem;">
+                        JSON format available for structured data
                     </div>
                     """, unsafe_allow_html=True)
-    
+
+            # Results statistics - Dark theme
+            st.markdown('<h4 style="color:#e0e0e0;">📈 Extraction Statistics</h4>', unsafe_allow_html=True)
+            col1, col2, col3, col4 = st.columns(4)
+
+            with col1:
+                st.metric("📝 Characters", len(result))
+            with col2:
+                st.metric("📄 Lines", len(result.splitlines()))
+            with col3:
+                if df is not None:
+                    st.metric("� Table Rows", len(df))
+                else:
+                    st.metric("�🔍 Chunks Processed", extraction.chunks)
+            with col4:
+                st.metric("⚡ Words Found", len(result.split()))
+
+            render_run_breakdown(extraction.metrics, "⏱️ Parse breakdown (time, tokens, cache hits)")
+
+            # Additional formatting tips if table view is available
+            if df is not None:
+                with st.expander("💡 Table Formatting Tips"):
+                    st.markdown("""
+                    **✅ Your data was automatically formatted into a table because:**
+                    - Consistent separators were detected (-, |, :, etc.)
+                    - Structured patterns were found (prices, contacts, etc.)
+                    - Data appears to have multiple columns
+
+                    **📊 Available formats:**
+                    - **Table View**: Clean, sortable columns
+                    - **Raw Text**: Original extracted format
+                    - **CSV Download**: Spreadsheet compatible
+                    - **JSON Download**: API/database ready
+                    """)
+            else:
+                with st.expander("💡 Want table formatting?"):
+                    st.markdown("""
+                    **To get automatic table formatting, try prompts like:**
+                    - "Extract book titles and prices separated by hyphen"
+                    - "Get product name | price | rating format"
+                    - "List items in: Title - Price - Stock format"
+                    - "Find all contacts with name: email format"
+
+                    **The AI will try to structure your data for better table display!**
+                    """)
+
+            st.markdown('</div>', unsafe_allow_html=True)
+
+        else:
+            st.markdown("""
+            <div style="background: linear-gradient(135deg, #92400e 0%, #b45309 100%); 
+                        padding: 2rem; border-radius: 15px; text-align: center; border: 1px solid #f59e0b;">
+                <h3 style="color: #fde68a; margin: 0;">🤔 No Matching Data Found</h3>
+                <p style="color: #fde68a; margin: 0.5rem 0 0 0;">
+                    Try a different description or check if the website contains the data you're looking for
+                </p>
+            </div>
+            """, unsafe_allow_html=True)
+
+            # Suggestions for better results
+            with st.expander("💡 Tips for better results"):
+                st.markdown("""
+                - **Be more specific**: Instead of "get data", try "extract product names and prices"
+                - **Use examples**: "Find emails like example@domain.com"
+                - **Mention format**: "Get phone numbers in format (xxx) xxx-xxxx"
+                - **Check the content**: Make sure the website actually contains what you're looking for
+                """)
+
     st.markdown('</div>', unsafe_allow_html=True)  # Close parsing card
 
 # Enhanced Sidebar with Beautiful Dark Design
 with st.sidebar:
     # Sidebar Header with Logo - Dark theme
-    if logo_base64:
+    if logo_src:
         st.markdown(f"""
         <div style="background: linear-gradient(135deg, #2d1b69 0%, #11998e 100%); 
                     padding: 2rem; border-radius: 15px; text-align: center; margin-bottom: 2rem; border: 1px solid #333;">
-            <img src="data:image/png;base64,{logo_base64}" style="height: 80px; margin-bottom: 10px;" alt="DataHawk Logo"/>
+            <img src="{logo_src}" style="height: 80px; margin-bottom: 10px;" alt="DataHawk Logo"/>
             <p style="color: rgba(255,255,255,0.9); margin: 0.5rem 0 0 0;">AI Web Scraping Tool</p>
         </div>
         """, unsafe_allow_html=True)
@@ -1028,11 +850,8 @@ with st.sidebar:
     # System Status - Dark theme
     st.markdown('<h3 style="color:#e0e0e0;">🔧 System Status</h3>', unsafe_allow_html=True)
     
-    # Check API status
+    # Check API status (.env was loaded when the parser was imported)
     try:
-        import os
-        from dotenv import load_dotenv
-        load_dotenv()
         api_key = os.getenv('GEMINI_API_KEY')
         
         if api_key and api_key != 'your_gemini_api_key_here':
@@ -1076,10 +895,10 @@ with st.sidebar:
     
     # Footer - Dark theme
     st.markdown("---")
-    if logo_base64:
+    if logo_src:
         st.markdown(f"""
         <div style="text-align: center; color: #6b7280; font-size: 0.8rem;">
-            <img src="data:image/png;base64,{logo_base64}" style="height: 30px; margin-bottom: 10px;" alt="Logo"/>
+            <img src="{logo_src}" style="height: 30px; margin-bottom: 10px;" alt="Logo"/>
             <p>Made with ❤️ using Streamlit & Google AI</p>
             <p>© 2025 Janith Prabash</p>
         </div>
@@ -1090,4 +909,11 @@ with st.sidebar:
             <p>Made with ❤️ using Streamlit & Google AI</p>
             <p>© 2025 Janith Prabash</p>
         </div>
-        """, unsafe_allow_html=True)
\ No newline at end of file
+        """, unsafe_allow_html=True)
+
+# Per-rerun latency, left out when a fetch or parse ran in this rerun
+if not (fetch_button or parse_button):
+    rerun_seconds = time.perf_counter() - rerun_started
+    metrics.observe('rerun', rerun_seconds)
+    if rerun_seconds * 1000 > RERUN_TARGET_MS:
+        print(f"Rerun took {rerun_seconds * 1000:.0f} ms, over the {RERUN_TARGET_MS} ms target")
@@ -0,0 +1,344 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# JSON lines for every span and run go here ('-' for stdout); unset disables them
+METRICS_LOG = os.getenv('DATAHAWK_METRICS_LOG')
+# Port for the Prometheus text endpoint; 0 disables it
+METRICS_PORT = int(os.getenv('DATAHAWK_METRICS_PORT', '0'))
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_COUNTER_HELP = {
+    'bytes_fetched': "Bytes of HTML fetched from websites",
+    'pages_fetched': "Pages fetched, by tier (plain http or browser)",
+    'escalations': "Plain HTTP fetches handed to the browser, by reason",
+    'profile_skips': "Fetch steps (http, captcha) skipped because of what the host's profile learned",
+    'chunks': "Chunks sent for parsing",
+    'prompt_tokens': "Prompt tokens reported by Gemini",
+    'response_tokens': "Response tokens reported by Gemini",
+    'llm_calls': "Calls made to Gemini",
+    'retries': "Retried model calls",
+    'cache_hits': "Lookups served from a cache",
+    'cache_misses': "Lookups that missed a cache",
+    'coalesced': "Requests that shared an identical in-flight fetch or model call",
+    'pages_crawled': "Pages visited by the crawler",
+    'robots_blocked': "Crawl URLs skipped because robots.txt disallows them",
+    'errors': "Stage failures",
+}
+_GAUGE_HELP = {
+    'quota_requests_available': "Model requests that can start now without waiting",
+    'quota_minute_tokens_available': "Tokens available in the per-minute bucket",
+    'quota_daily_tokens_remaining': "Tokens left in today's budget",
+}
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Registry:
+    """Process-wide counters, gauges and stage duration histograms, rendered for Prometheus."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._gauges = {}
+        self._durations = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            entry = self._durations.setdefault(stage, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry[0][i] += 1
+            entry[1] += seconds
+            entry[2] += 1
+
+    def snapshot(self):
+        """Counters and duration totals as plain data."""
+        with self._lock:
+            return {
+                'counters': [
+                    {'name': name, 'labels': dict(key), 'value': value}
+                    for (name, key), value in sorted(self._counters.items())
+                ],
+                'gauges': [
+                    {'name': name, 'labels': dict(key), 'value': value}
+                    for (name, key), value in sorted(self._gauges.items())
+                ],
+                'stages': {
+                    stage: {'count': count, 'seconds': round(total, 6)}
+                    for stage, (_, total, count) in sorted(self._durations.items())
+                },
+            }
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            by_name = {}
+            for (name, key), value in sorted(self._counters.items()):
+                by_name.setdefault(name, []).append((key, value))
+            for name, series in by_name.items():
+                metric = f"datahawk_{name}_total"
+                lines.append(f"# HELP {metric} {_COUNTER_HELP.get(name, name)}")
+                lines.append(f"# TYPE {metric} counter")
+                lines += [f"{metric}{_format_labels(key)} {value}" for key, value in series]
+
+            by_name = {}
+            for (name, key), value in sorted(self._gauges.items()):
+                by_name.setdefault(name, []).append((key, value))
+            for name, series in by_name.items():
+                metric = f"datahawk_{name}"
+                lines.append(f"# HELP {metric} {_GAUGE_HELP.get(name, name)}")
+                lines.append(f"# TYPE {metric} gauge")
+                lines += [f"{metric}{_format_labels(key)} {value}" for key, value in series]
+
+            if self._durations:
+                lines.append("# HELP datahawk_stage_seconds Time spent in each pipeline stage")
+                lines.append("# TYPE datahawk_stage_seconds histogram")
+            for stage, (counts, total, count) in sorted(self._durations.items()):
+                key = (('stage', stage),)
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"datahawk_stage_seconds_bucket{_format_labels(key, [('le', str(bound))])} {bucket_count}")
+                lines.append(f"datahawk_stage_seconds_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+                lines.append(f"datahawk_stage_seconds_sum{_format_labels(key)} {total}")
+                lines.append(f"datahawk_stage_seconds_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class Trace:
+    """
+    Spans and counters of one run (one fetch, one parse, ...), for showing
+    where that run's time and tokens went.
+    """
+
+    def __init__(self, name="run", **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.started = time.time()
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    def add(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self, into=None):
+        """
+        Per-stage {'count', 'seconds'} and counter totals, added into `into`
+        when given so several runs (fetch, then parse) can share one breakdown.
+        """
+        summary = into if into is not None else {}
+        stages = summary.setdefault('stages', {})
+        counters = summary.setdefault('counters', {})
+        with self._lock:
+            for span in self.spans:
+                entry = stages.setdefault(span['name'], {'count': 0, 'seconds': 0.0, 'errors': 0})
+                entry['count'] += 1
+                entry['seconds'] = round(entry['seconds'] + span['duration'], 6)
+                entry['errors'] += bool(span.get('error'))
+            for name, value in self.counters.items():
+                counters[name] = counters.get(name, 0) + value
+        return summary
+
+
+_current_trace = ContextVar('datahawk_trace', default=None)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def activate(trace):
+    """Make `trace` receive the spans and counts recorded on this thread."""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+class Span:
+    """Timing of one stage; `attrs` may be filled in while it runs."""
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.error = None
+        self.duration = 0.0
+
+
+@contextmanager
+def span(name, trace=None, **attrs):
+    """
+    Time a stage. The duration goes to the `datahawk_stage_seconds`
+    histogram, to `trace` (or the active trace) and to the JSON log.
+    An exception is recorded as the span's error and re-raised.
+    """
+    trace = trace or current_trace()
+    current = Span(name, dict(attrs))
+    started_at = time.time()
+    started = time.perf_counter()
+    try:
+        yield current
+    except Exception as e:
+        current.error = str(e)
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        registry.observe(name, current.duration)
+        if current.error:
+            count('errors', trace=trace, stage=name)
+        record = {'name': name, 'start': started_at, 'duration': current.duration,
+                  'attrs': current.attrs, 'error': current.error}
+        if trace is not None:
+            trace.add_span(record)
+        log({'type': 'span', 'run': trace.name if trace else None, **record})
+
+
+def fail(current, message):
+    """Mark a span failed without raising, for stages that return error strings."""
+    current.error = message
+
+
+def observe(name, seconds, **attrs):
+    """Record the duration of something timed outside a span, such as a UI rerun."""
+    registry.observe(name, seconds)
+    log({'type': 'span', 'run': None, 'name': name, 'start': time.time() - seconds,
+         'duration': seconds, 'attrs': attrs, 'error': None})
+
+
+def gauge(name, value, **labels):
+    """Set a process-wide gauge such as remaining quota."""
+    registry.set(name, value, **labels)
+
+
+def count(name, value=1, trace=None, **labels):
+    """Add to a counter, process-wide and on `trace` (or the active trace)."""
+    registry.inc(name, value, **labels)
+    trace = trace or current_trace()
+    if trace is not None:
+        # "cache_hits:page" keeps labelled series apart in the run breakdown
+        trace.add(":".join([name] + [str(labels[key]) for key in sorted(labels)]), value)
+
+
+@contextmanager
+def run(name, trace=None, **attrs):
+    """
+    Collect everything recorded inside the block into a Trace (a new one
+    unless `trace` is given) and log the run summary when it ends.
+    """
+    trace = trace or Trace(name, **attrs)
+    with activate(trace):
+        yield trace
+    finish(trace)
+
+
+def finish(trace):
+    """Log the summary of a finished run."""
+    log({'type': 'run', 'run': trace.name, 'attrs': trace.attrs, 'start': trace.started,
+         'duration': time.time() - trace.started, **trace.summary()})
+
+
+_log_lock = threading.Lock()
+
+
+def log(record):
+    """Write one JSON line to DATAHAWK_METRICS_LOG, if configured."""
+    if not METRICS_LOG:
+        return
+    line = json.dumps(record, default=str)
+    with _log_lock:
+        if METRICS_LOG == '-':
+            print(line, file=sys.stdout, flush=True)
+            return
+        try:
+            with open(METRICS_LOG, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+        except OSError as e:
+            print(f"Could not write metrics log: {str(e)}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] == '/metrics':
+            body, content_type = registry.render_prometheus(), 'text/plain; version=0.0.4'
+        elif self.path.split('?')[0] == '/metrics.json':
+            body, content_type = json.dumps(registry.snapshot()), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_server(port=None):
+    """
+    Serve /metrics (Prometheus text) and /metrics.json on `port`
+    (DATAHAWK_METRICS_PORT by default). Does nothing when the port is 0 or
+    the server is already running; returns the server or None.
+    """
+    global _server
+    port = METRICS_PORT if port is None else port
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(('0.0.0.0', port), _MetricsHandler)
+            except OSError as e:
+                print(f"Metrics endpoint could not start on port {port}: {str(e)}")
+                return None
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+            print(f"Metrics available at http://localhost:{port}/metrics")
+    return _server
@@ -1,6 +1,17 @@
 import google.generativeai as genai
+import hashlib
+import json
 import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from cache import CACHE_DIR, SQLiteCache
+from chunker import estimate_tokens
+from events import emit
+import metrics
+from scheduler import Scheduler, scheduler
+from schema import parse_records, response_schema
+from singleflight import Group
 
 # Load environment variables
 load_dotenv()
@@ -8,6 +19,14 @@ load_dotenv()
 # Configure Gemini API
 genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
 
+# Concurrency settings; request and token limits are enforced by scheduler.py
+GEMINI_MAX_WORKERS = int(os.getenv('GEMINI_MAX_WORKERS', '4'))
+
+# Extraction result cache settings
+GEMINI_CACHE_ENABLED = os.getenv('GEMINI_CACHE', '1') != '0'
+GEMINI_CACHE_TTL = int(os.getenv('GEMINI_CACHE_TTL', str(7 * 24 * 3600)))
+GEMINI_CACHE_MAX_MB = int(os.getenv('GEMINI_CACHE_MAX_MB', '256'))
+
 template = (
     "You are tasked with extracting specific information from the following text content: {dom_content}. "
     "Please follow these instructions carefully: \n\n"
@@ -17,28 +36,277 @@ template = (
     "4. **Direct Data Only:** Your output should contain only the data that is explicitly requested, with no other text."
 )
 
+# Used instead of `template` when the caller asks for rows matching a column schema
+json_template = (
+    "You are tasked with extracting specific information from the following text content: {dom_content}. "
+    "Please follow these instructions carefully: \n\n"
+    "1. **Extract Information:** Only extract the information that directly matches the provided description: {parse_description}. "
+    "2. **JSON Rows:** Return a JSON array with one object per matching item, using exactly these keys: {columns}. "
+    "3. **Missing Fields:** Use null for a field the item does not have. "
+    "4. **Empty Response:** If no information matches the description, return an empty array ([])."
+)
+
+# Changes whenever the prompt wording changes, so stale answers are never reused
+TEMPLATE_VERSION = hashlib.sha256(template.encode('utf-8')).hexdigest()[:12]
+JSON_TEMPLATE_VERSION = hashlib.sha256(json_template.encode('utf-8')).hexdigest()[:12]
+
 # Initialize Gemini model
-model = genai.GenerativeModel('gemini-1.5-flash')
+MODEL_NAME = 'gemini-1.5-flash'
+model = genai.GenerativeModel(MODEL_NAME)
+
+result_cache = SQLiteCache(
+    os.path.join(CACHE_DIR, 'gemini_results.sqlite3'),
+    default_ttl=GEMINI_CACHE_TTL,
+    max_bytes=GEMINI_CACHE_MAX_MB * 1024 * 1024
+) if GEMINI_CACHE_ENABLED else None
+
+
+# Answers are usually far shorter than the page they came from
+RESPONSE_TOKEN_RATIO = 0.25
+
+
+# Concurrent identical extractions share one model call
+chunk_flight = Group('chunk')
+
+
+def cache_key(chunk, parse_description, schema=None):
+    """
+    Content address of one extraction: chunk, description, prompt version,
+    model and, for JSON extractions, the column schema.
+    """
+    normalized_description = " ".join(parse_description.split())
+    parts = (TEMPLATE_VERSION, MODEL_NAME, normalized_description, chunk)
+    if schema:
+        parts = (JSON_TEMPLATE_VERSION, MODEL_NAME, normalized_description, json.dumps(schema), chunk)
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _count_tokens(response):
+    """
+    Record the prompt and response token counts Gemini reports for a call
+    and return their total, or None when the response carries no usage.
+    """
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return None
+    prompt_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+    response_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+    metrics.count('prompt_tokens', prompt_tokens)
+    metrics.count('response_tokens', response_tokens)
+    return prompt_tokens + response_tokens
+
+
+def parse_chunk(chunk, parse_description, on_delta=None, schema=None, limits=None, on_retry=None):
+    """
+    Send a single chunk to Gemini and return the extracted text.
+
+    With `on_delta`, the response is streamed and each piece of text is
+    passed to it as it arrives. With a `schema` ({column: type}), the model
+    is constrained to answer with a JSON array of rows. The call waits for
+    quota on `limits` (the shared scheduler by default), which also retries
+    rate limits and server errors, reporting each to `on_retry(attempt, delay, error)`.
+    """
+    # Create the prompt with the template
+    generation_config = None
+    if schema:
+        prompt = json_template.format(
+            dom_content=chunk,
+            parse_description=parse_description,
+            columns=", ".join(f"{name} ({kind})" for name, kind in schema.items())
+        )
+        generation_config = {
+            'response_mime_type': 'application/json',
+            'response_schema': response_schema(schema),
+        }
+    else:
+        prompt = template.format(
+            dom_content=chunk,
+            parse_description=parse_description
+        )
+
+    streamed = []
+
+    def generate():
+        metrics.count('llm_calls')
+        if on_delta is None:
+            response = model.generate_content(prompt, generation_config=generation_config)
+            return response.text, _count_tokens(response)
 
-def parse_with_gemini(dom_chunks, parse_description):
-    parsed_results = []
+        pieces = []
+        part = None
+        for part in model.generate_content(prompt, generation_config=generation_config, stream=True):
+            pieces.append(part.text)
+            streamed.append(True)
+            on_delta(part.text)
+        # Usage is reported on the final streamed part
+        return "".join(pieces), _count_tokens(part)
+
+    # Generate response using Gemini once the quota allows it
+    estimated = estimate_tokens(prompt)
+    estimated += int(estimated * RESPONSE_TOKEN_RATIO)
+    return (limits or scheduler).call(
+        generate,
+        estimated_tokens=estimated,
+        # Text already shown to the caller can't be taken back, so a broken stream isn't retried
+        retry_if=lambda error: not streamed,
+        on_retry=on_retry
+    )
+
+
+def _parse_one(index, chunk, parse_description, limits, on_delta=None, schema=None, on_retry=None):
+    key = cache_key(chunk, parse_description, schema)
+    if result_cache:
+        cached = result_cache.get(key)
+        metrics.count('cache_hits' if cached is not None else 'cache_misses', cache='result')
+        if cached is not None:
+            result = {'index': index, 'text': cached.decode('utf-8'), 'error': None, 'cached': True}
+            if schema:
+                result['rows'] = parse_records(result['text'], schema)
+            return result
+
+    try:
+        with metrics.span('llm_call', chunk=index, chars=len(chunk)) as call_span:
+            # A caller that joins an in-flight call gets the whole text at once instead of deltas
+            text, shared = chunk_flight.do(key, lambda: parse_chunk(
+                chunk, parse_description, on_delta=on_delta, schema=schema, limits=limits, on_retry=on_retry
+            ))
+            call_span.attrs['shared'] = shared
+            rows = parse_records(text, schema) if schema else None
+    except Exception as e:
+        return {'index': index, 'text': "", 'error': str(e), 'cached': False}
+
+    # Only answers that validated are worth reusing
+    if result_cache and not shared:
+        result_cache.set(key, text.encode('utf-8'))
+    result = {'index': index, 'text': text, 'error': None, 'cached': False}
+    if schema:
+        result['rows'] = rows
+    return result
+
+
+def iter_parse_chunks(dom_chunks, parse_description, max_workers=GEMINI_MAX_WORKERS,
+                      requests_per_minute=None, ordered=False, stream=False, schema=None,
+                      trace=None, on_event=None):
+    """
+    Parse chunks concurrently and yield each result as soon as it is ready.
+
+    Results are the dicts described in parse_chunks and arrive in completion
+    order unless `ordered=True`. With `stream=True`, partial text is also
+    yielded while a chunk is still being generated, as
+    {'index': chunk number, 'delta': new text}. With a `schema`, each result
+    also carries its validated 'rows'. Spans and token counts go to `trace`
+    (the caller's active trace by default). Rate-limited calls are retried
+    and reported as 'retry' events. Stopping the iteration early cancels the
+    chunks that have not started yet.
+    """
+    limits = scheduler if requests_per_minute is None else Scheduler(
+        requests_per_minute=requests_per_minute, store=scheduler.store
+    )
+    total = len(dom_chunks)
+    updates = queue.Queue()
+    # Worker threads don't inherit the caller's trace, hand it over explicitly
+    trace = trace or metrics.current_trace()
+
+    def run(index, chunk):
+        on_delta = (lambda text: updates.put({'index': index, 'delta': text})) if stream else None
+
+        def on_retry(attempt, delay, error):
+            updates.put({'index': index, 'retry': attempt, 'delay': delay, 'error': str(error)})
 
-    for i, chunk in enumerate(dom_chunks, start=1):
         try:
-            # Create the prompt with the template
-            prompt = template.format(
-                dom_content=chunk, 
-                parse_description=parse_description
-            )
-            
-            # Generate response using Gemini
-            response = model.generate_content(prompt)
-            
-            print(f"Parsed batch {i} of {len(dom_chunks)}")
-            parsed_results.append(response.text)
-            
-        except Exception as e:
-            print(f"Error parsing batch {i}: {str(e)}")
-            parsed_results.append("")
-
-    return "\n".join(parsed_results)
\ No newline at end of file
+            with metrics.activate(trace):
+                result = _parse_one(index, chunk, parse_description, limits, on_delta, schema, on_retry)
+        except BaseException as e:
+            result = {'index': index, 'text': "", 'error': str(e), 'cached': False}
+        updates.put(result)
+
+    metrics.count('chunks', total, trace=trace)
+    emit(on_event, 'parse', 'started', chunks=total)
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, total or 1)))
+    try:
+        for i, chunk in enumerate(dom_chunks, start=1):
+            executor.submit(run, i, chunk)
+
+        waiting = {}
+        next_index = 1
+        completed = 0
+        failed = 0
+        while completed < total:
+            item = updates.get()
+            if 'delta' in item:
+                emit(on_event, 'parse', 'chunk_delta', index=item['index'], text=item['delta'])
+                yield item
+                continue
+            if 'retry' in item:
+                print(f"Retrying batch {item['index']} in {item['delay']:.1f}s (attempt {item['retry']}): "
+                      f"{item['error']}")
+                emit(on_event, 'parse', 'retry', index=item['index'], attempt=item['retry'],
+                     delay=item['delay'], error=item['error'])
+                continue
+
+            completed += 1
+            if item['error']:
+                failed += 1
+                print(f"Error parsing batch {item['index']}: {item['error']}")
+            elif item['cached']:
+                print(f"Parsed batch {item['index']} of {total} (cached)")
+            else:
+                print(f"Parsed batch {item['index']} of {total}")
+            emit(on_event, 'parse', 'chunk_done', index=item['index'], completed=completed,
+                 total=total, cached=item['cached'], error=item['error'])
+
+            if not ordered:
+                yield item
+                continue
+            waiting[item['index']] = item
+            while next_index in waiting:
+                yield waiting.pop(next_index)
+                next_index += 1
+
+        emit(on_event, 'parse', 'finished', chunks=total, failed=failed)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def parse_chunks(dom_chunks, parse_description, max_workers=GEMINI_MAX_WORKERS,
+                 requests_per_minute=None, schema=None, on_result=None, on_event=None):
+    """
+    Parse chunks concurrently with a bounded worker pool.
+
+    Returns one result dict per chunk, in chunk order:
+    {'index': 1-based chunk number, 'text': extracted text, 'error': None or message,
+    'cached': True when the answer came from the result cache}, plus
+    'rows' (the chunk's validated JSON rows) when a `schema` is given.
+    `on_result(result, completed, total)` is called on the calling thread as
+    each chunk finishes, and parse progress events go to `on_event`. Pass
+    `requests_per_minute` to use a dedicated scheduler instead of the shared
+    one (0 for no request limit); the daily token budget is always shared.
+    """
+    total = len(dom_chunks)
+    results = [None] * total
+    completed = 0
+
+    for result in iter_parse_chunks(dom_chunks, parse_description, max_workers=max_workers,
+                                    requests_per_minute=requests_per_minute, schema=schema,
+                                    on_event=on_event):
+        results[result['index'] - 1] = result
+        completed += 1
+        if on_result:
+            on_result(result, completed, total)
+
+    return results
+
+
+def parse_with_gemini(dom_chunks, parse_description, max_workers=GEMINI_MAX_WORKERS,
+                      requests_per_minute=None):
+    results = parse_chunks(
+        dom_chunks,
+        parse_description,
+        max_workers=max_workers,
+        requests_per_minute=requests_per_minute
+    )
+    return "\n".join(result['text'] for result in results)
@@ -0,0 +1,106 @@
+import re
+from collections import Counter
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Instruction words that say how to extract, not what to look for
+STOP_WORDS = frozenset("""
+a an and are as at be by for from get give in into is it list me of on or show the their them
+these this to with all any each every extract find return output provide format formatted
+table view structured data info information details separated like such please want need
+""".split())
+
+# Content that the model recognises without the word itself appearing in the page
+_FEATURES = {
+    'price': re.compile(r"[$£€¥₹]\s?\d|\d\s?(?:usd|eur|gbp)\b", re.IGNORECASE),
+    'email': re.compile(r"[^@\s]+@[^@\s]+\.[a-z]{2,}", re.IGNORECASE),
+    'phone': re.compile(r"\+?\d[\d\s().-]{7,}\d"),
+    'link': re.compile(r"https?://|www\.", re.IGNORECASE),
+}
+_FEATURE_ALIASES = {
+    'price': 'price', 'cost': 'price', 'amount': 'price',
+    'email': 'email', 'mail': 'email', 'contact': 'email',
+    'phone': 'phone', 'telephone': 'phone', 'mobile': 'phone', 'number': 'phone',
+    'link': 'link', 'url': 'link', 'website': 'link',
+}
+
+
+def _stem(token):
+    """Light plural folding so "prices" matches "price"."""
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [_stem(token) for token in TOKEN_PATTERN.findall(text.lower())]
+
+
+def query_terms(description):
+    terms = {token for token in tokenize(description) if token not in STOP_WORDS}
+    terms |= {'__' + _FEATURE_ALIASES[term] for term in terms if term in _FEATURE_ALIASES}
+    return sorted(terms)
+
+
+class RelevanceIndex:
+    """
+    BM25 index over the chunks of one page, built once at fetch time.
+
+    Scoring a description is a vectorized pass over the chunks for the
+    handful of query terms, so it is cheap enough to run on every parse.
+    """
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.counts = []
+        for chunk in chunks:
+            counts = Counter(tokenize(chunk))
+            for feature, pattern in _FEATURES.items():
+                hits = len(pattern.findall(chunk))
+                if hits:
+                    counts['__' + feature] = hits
+            self.counts.append(counts)
+
+        self.lengths = np.array([sum(counts.values()) for counts in self.counts], dtype=np.float64)
+        self.average_length = float(self.lengths.mean()) if len(self.lengths) else 0.0
+        self.document_frequency = Counter()
+        for counts in self.counts:
+            self.document_frequency.update(counts.keys())
+
+    def __len__(self):
+        return len(self.counts)
+
+    def scores(self, description):
+        """BM25 score of every chunk for `description`."""
+        terms = query_terms(description)
+        if not terms or not len(self):
+            return np.zeros(len(self))
+
+        n = len(self)
+        tf = np.array([[counts.get(term, 0) for term in terms] for counts in self.counts], dtype=np.float64)
+        df = np.array([self.document_frequency.get(term, 0) for term in terms], dtype=np.float64)
+        idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5))
+        norm = self.k1 * (1.0 - self.b + self.b * self.lengths / max(self.average_length, 1.0))
+        return (tf * (self.k1 + 1.0) / (tf + norm[:, None])) @ idf
+
+    def select(self, description, min_ratio=0.15, top_k=None):
+        """
+        Indices (in page order) of the chunks worth sending for `description`.
+
+        A chunk is kept when it scores at least `min_ratio` of the best chunk.
+        When no query term occurs anywhere, relevance can't be judged and
+        every chunk is kept.
+        """
+        scores = self.scores(description)
+        if not len(scores) or scores.max() <= 0:
+            return list(range(len(self)))
+
+        keep = np.flatnonzero(scores >= scores.max() * min_ratio)
+        if top_k and len(keep) > top_k:
+            keep = keep[np.argsort(-scores[keep], kind='stable')[:top_k]]
+        return sorted(int(i) for i in keep)
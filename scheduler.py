@@ -0,0 +1,247 @@
+import datetime
+import os
+import random
+import re
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from cache import CACHE_DIR, SQLiteCache
+import metrics
+
+load_dotenv()
+
+# Gemini free tier: 15 requests per minute, 1 million tokens per day (0 disables a limit)
+GEMINI_RPM = int(os.getenv('GEMINI_RPM', '15'))
+GEMINI_RPM_BURST = int(os.getenv('GEMINI_RPM_BURST', '1'))
+GEMINI_TPM = int(os.getenv('GEMINI_TPM', '1000000'))
+GEMINI_DAILY_TOKENS = int(os.getenv('GEMINI_DAILY_TOKENS', '1000000'))
+
+# Retries of rate-limited (429) and server (5xx) errors
+GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', '5'))
+GEMINI_RETRY_BASE = float(os.getenv('GEMINI_RETRY_BASE', '2.0'))
+GEMINI_RETRY_MAX = float(os.getenv('GEMINI_RETRY_MAX', '60'))
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+_RETRY_AFTER_PATTERNS = (
+    re.compile(r'retry_delay\s*\{\s*seconds:\s*(\d+)'),
+    re.compile(r'retry (?:in|after) ([\d.]+)\s*s', re.IGNORECASE),
+)
+
+
+class QuotaExceeded(Exception):
+    """The daily token budget is spent; retrying today will not help."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket holding at most `capacity` tokens and refilled
+    at `rate` tokens per second. Reservations may overdraw it, so callers
+    queue up in arrival order instead of racing for the refill.
+    """
+
+    def __init__(self, capacity, rate):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount):
+        """Take `amount` tokens and return the seconds to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= amount
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self, amount):
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+    def available(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, self._tokens)
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait before retrying, if it said."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('retry-after') or headers.get('Retry-After')
+    if value is None:
+        value = getattr(error, 'retry_after', None)
+    if value is not None:
+        try:
+            return max(0.0, float(value))
+        except (TypeError, ValueError):
+            pass
+    message = str(error)
+    for pattern in _RETRY_AFTER_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def is_retryable(error):
+    """Rate limits (429) and transient server errors (5xx)."""
+    if isinstance(error, QuotaExceeded):
+        return False
+    code = getattr(error, 'code', None)
+    if isinstance(code, int) and code in RETRYABLE_STATUS:
+        return True
+    message = str(error)
+    return '429' in message or 'Resource has been exhausted' in message
+
+
+def _today():
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d')
+
+
+class Scheduler:
+    """
+    Gate in front of every model call: a requests-per-minute bucket, a
+    tokens-per-minute bucket and a daily token budget, plus retries of
+    429/5xx errors with jittered exponential backoff. A limit of 0 or None
+    is unlimited. Daily usage is kept in `store` so it survives restarts and
+    is shared by every process using the same cache directory.
+    """
+
+    def __init__(self, requests_per_minute=GEMINI_RPM, tokens_per_minute=GEMINI_TPM,
+                 daily_tokens=GEMINI_DAILY_TOKENS, burst=GEMINI_RPM_BURST, max_retries=GEMINI_MAX_RETRIES,
+                 base_delay=GEMINI_RETRY_BASE, max_delay=GEMINI_RETRY_MAX, store=None):
+        self.requests = TokenBucket(max(1, burst), requests_per_minute / 60.0) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0) if tokens_per_minute else None
+        self.daily_tokens = daily_tokens or None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.store = store
+        self._used = {}
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _daily_used(self, day):
+        if self.store is not None:
+            value = self.store.get(f"tokens:{day}")
+            return int(value) if value is not None else 0
+        return self._used.get(day, 0)
+
+    def _add_daily(self, tokens, check=False):
+        day = _today()
+        with self._lock:
+            used = self._daily_used(day)
+            if check and self.daily_tokens and used + tokens > self.daily_tokens:
+                raise QuotaExceeded(
+                    f"Daily Gemini token budget spent ({used:,} of {self.daily_tokens:,} tokens used, "
+                    f"this call needs ~{tokens:,}); it resets at midnight UTC"
+                )
+            used = max(0, used + tokens)
+            if self.store is not None:
+                # Kept two days so a run that spans midnight still finds yesterday's entry
+                self.store.set(f"tokens:{day}", str(used).encode('utf-8'), ttl=2 * 24 * 3600)
+            else:
+                self._used = {day: used}
+        return used
+
+    def acquire(self, estimated_tokens=0):
+        """
+        Wait until a call of `estimated_tokens` fits every limit and reserve it.
+        Raises QuotaExceeded when the daily budget cannot cover it.
+        """
+        self._add_daily(estimated_tokens, check=True)
+
+        delay = max(self._paused_until - time.monotonic(), 0.0)
+        if self.requests:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens and estimated_tokens:
+            delay = max(delay, self.tokens.reserve(min(estimated_tokens, self.tokens.capacity)))
+        if delay > 0:
+            time.sleep(delay)
+        self.publish()
+
+    def record(self, actual_tokens, estimated_tokens):
+        """Replace a call's estimate with the tokens it really used (None keeps the estimate)."""
+        if actual_tokens is None or actual_tokens == estimated_tokens:
+            return
+        if self.tokens and actual_tokens < estimated_tokens:
+            self.tokens.refund(estimated_tokens - actual_tokens)
+        elif self.tokens:
+            self.tokens.reserve(actual_tokens - estimated_tokens)
+        self._add_daily(actual_tokens - estimated_tokens)
+        self.publish()
+
+    def backoff(self, attempt, error):
+        """Seconds to wait before retry number `attempt` (1-based)."""
+        # Full jitter keeps workers that failed together from retrying together
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        asked = retry_after(error)
+        if asked is not None:
+            delay = max(delay, asked + random.uniform(0, self.base_delay))
+        return min(delay, max(self.max_delay, asked or 0.0))
+
+    def call(self, fn, estimated_tokens=0, retry_if=None, on_retry=None):
+        """
+        Run `fn()` once the limits allow it, retrying 429/5xx failures.
+
+        `fn` returns `(value, tokens_used)`, with tokens_used None when the
+        response carries no usage. `retry_if(error)` can veto a retry and
+        `on_retry(attempt, delay, error)` is told about each one. Returns value.
+        """
+        attempt = 0
+        while True:
+            self.acquire(estimated_tokens)
+            try:
+                value, used = fn()
+            except Exception as e:
+                # Rejected calls don't consume tokens
+                self.record(0, estimated_tokens)
+                attempt += 1
+                if attempt > self.max_retries or not is_retryable(e) or (retry_if and not retry_if(e)):
+                    raise
+                delay = self.backoff(attempt, e)
+                if getattr(e, 'code', None) == 429 or '429' in str(e):
+                    # The key is over its limit for everyone, hold back the other workers too
+                    with self._lock:
+                        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                metrics.count('retries')
+                if on_retry:
+                    on_retry(attempt, delay, e)
+                time.sleep(delay)
+                continue
+            self.record(used, estimated_tokens)
+            return value
+
+    def remaining(self):
+        """Quota left right now: requests and tokens in this minute, tokens today."""
+        with self._lock:
+            used = self._daily_used(_today())
+        return {
+            'requests_available': None if self.requests is None else int(self.requests.available()),
+            'minute_tokens_available': None if self.tokens is None else int(self.tokens.available()),
+            'daily_tokens_used': used,
+            'daily_tokens_remaining': None if self.daily_tokens is None else max(0, self.daily_tokens - used),
+            'daily_tokens_limit': self.daily_tokens,
+        }
+
+    def publish(self):
+        """Export remaining quota as gauges on the metrics endpoint."""
+        for name, value in self.remaining().items():
+            if value is not None and name in ('requests_available', 'minute_tokens_available',
+                                              'daily_tokens_remaining'):
+                metrics.gauge(f"quota_{name}", value)
+
+
+# Daily usage is per API key, so every scheduler in this cache directory shares it
+usage_store = SQLiteCache(os.path.join(CACHE_DIR, 'quota.sqlite3'))
+
+# Shared by every caller in the process, since the per-minute quota is per API key
+scheduler = Scheduler(store=usage_store)
@@ -0,0 +1,171 @@
+import json
+import re
+
+# JSON types a column may declare, and the Python value each is coerced to
+COLUMN_TYPES = ('string', 'number', 'integer', 'boolean')
+
+_SPLIT_PATTERN = re.compile(r",|;|\band\b|\bwith\b|\bplus\b|&|/", re.IGNORECASE)
+_LEADING_WORDS = frozenset("""
+a an all any each every the their its of from on in this these page website site
+extract get find list show give return output collect scrape pull me please i want need
+""".split())
+_TRAILING_WORDS = frozenset("from on in of the this page website site".split())
+# How the answer should look, not what it holds: "in table format", "as
+# structured data", "organized in table view", "for easy viewing", "format"
+_FORMAT_PHRASES = re.compile(
+    r"\b(?:in|as|into|using)\s+(?:an?\s+|the\s+)?(?:table|tabular|structured|json|csv|list|plain|text)?\s*"
+    r"(?:data|format|view|form|layout|structure)\b"
+    r"|\borgani[sz]ed\s+(?:in|into|as|by)\s+(?:an?\s+|the\s+)?\w+(?:\s+(?:view|format|form|layout))?"
+    r"|\bfor\s+easy\s+\w+"
+    r"|\b(?:format|formatted|structure)\b",
+    re.IGNORECASE
+)
+# "Title | Company | Salary" (or "Name - Email - Phone" after a colon) lists the columns outright
+_EXPLICIT_SEPARATORS = re.compile(r"\s*\|\s*")
+_DASH_SEPARATORS = re.compile(r"\s+-\s+")
+_NUMBER_PATTERN = re.compile(r"-?\d[\d,]*(?:\.\d+)?|-?\.\d+")
+_CODE_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+
+
+def _singular(word):
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def normalize_schema(columns):
+    """
+    Schema as an ordered {column: type} dict from a list of names, a
+    {name: type} dict or a comma-separated string; unknown types become string.
+    """
+    if isinstance(columns, str):
+        columns = [name for name in (part.strip() for part in columns.split(',')) if name]
+    if not isinstance(columns, dict):
+        columns = {name: 'string' for name in columns}
+    return {
+        str(name).strip(): (kind if kind in COLUMN_TYPES else 'string')
+        for name, kind in columns.items() if str(name).strip()
+    }
+
+
+def _column_name(phrase, singular=True):
+    words = re.findall(r"[A-Za-z][A-Za-z'-]*", phrase)
+    while words and words[0].lower() in _LEADING_WORDS:
+        words.pop(0)
+    while words and words[-1].lower() in _TRAILING_WORDS:
+        words.pop()
+    if not words:
+        return None
+    if singular:
+        words[-1] = _singular(words[-1])
+    return " ".join(word.capitalize() if word.islower() else word for word in words)
+
+
+def _explicit_columns(description):
+    """Columns listed as "A | B | C" (or "...: A - B - C"), in order, or None."""
+    listed = description.rsplit(':', 1)[-1]
+    if '|' in listed:
+        parts = _EXPLICIT_SEPARATORS.split(listed)
+    elif ':' in description and _DASH_SEPARATORS.search(listed):
+        parts = _DASH_SEPARATORS.split(listed)
+    else:
+        return None
+    names = [_column_name(part, singular=False) for part in parts]
+    names = [name for name in names if name]
+    return names if len(names) >= 2 else None
+
+
+def infer_schema(description):
+    """
+    Guess columns from a description such as "product names and prices"
+    -> {'Product Name': 'string', 'Price': 'string'}, ignoring how the
+    answer should be laid out ("in table format"). A list like
+    "Title | Company | Salary" is taken as the columns as written. Every
+    column is a string; pass a schema explicitly to get typed columns.
+    """
+    description = _FORMAT_PHRASES.sub(" ", description)
+    names = _explicit_columns(description)
+    if names is None:
+        names = []
+        for phrase in _SPLIT_PATTERN.split(description):
+            name = _column_name(phrase)
+            if name and name not in names:
+                names.append(name)
+    return normalize_schema(names or ['Value'])
+
+
+def response_schema(schema):
+    """Gemini response schema: an array of objects with one nullable property per column."""
+    return {
+        'type': 'array',
+        'items': {
+            'type': 'object',
+            'properties': {name: {'type': kind, 'nullable': True} for name, kind in schema.items()},
+        },
+    }
+
+
+def coerce_value(value, kind):
+    """Convert one field to its column type; values that don't fit become None."""
+    if value is None or value == "":
+        return None
+    if kind == 'string':
+        return value if isinstance(value, str) else json.dumps(value) if isinstance(value, (list, dict)) else str(value)
+    if kind == 'boolean':
+        if isinstance(value, bool):
+            return value
+        lowered = str(value).strip().lower()
+        return True if lowered in ('true', 'yes', '1') else False if lowered in ('false', 'no', '0') else None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        number = value
+    else:
+        # "$1,299.00" and "4.5 stars" are numbers the model left as text
+        match = _NUMBER_PATTERN.search(str(value))
+        if not match:
+            return None
+        number = float(match.group().replace(',', ''))
+    return int(number) if kind == 'integer' else float(number)
+
+
+def parse_records(text, schema):
+    """
+    Validate one chunk's JSON answer against `schema`.
+
+    Accepts an array of objects (or one object, or {"rows": [...]}), matches
+    keys to columns case-insensitively, coerces values and returns a list of
+    row dicts with exactly the schema's columns. Raises ValueError when the
+    answer is not JSON or has no objects in it.
+    """
+    text = _CODE_FENCE.sub("", text or "").strip()
+    if not text or text in ("''", '""'):
+        return []
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise ValueError(f"Model did not return valid JSON: {str(e)}")
+
+    if isinstance(data, dict):
+        nested = [value for value in data.values() if isinstance(value, list)]
+        data = nested[0] if len(nested) == 1 else [data]
+    if not isinstance(data, list):
+        raise ValueError("Model returned JSON that is not a list of rows")
+
+    lookup = {name.lower(): name for name in schema}
+    rows = []
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        row = dict.fromkeys(schema)
+        for key, value in item.items():
+            name = lookup.get(str(key).strip().lower())
+            if name:
+                row[name] = coerce_value(value, schema[name])
+        if any(value is not None for value in row.values()):
+            rows.append(row)
+    if data and not rows and not all(isinstance(item, dict) for item in data):
+        raise ValueError("Model returned JSON without any rows")
+    return rows
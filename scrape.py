@@ -1,9 +1,23 @@
 import time
+import atexit
 import os
+import re
+import threading
+import zlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from selenium.common.exceptions import JavascriptException
 from selenium.webdriver import Remote, ChromeOptions
 from selenium.webdriver.chromium.remote_connection import ChromiumRemoteConnection
-from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
 from dotenv import load_dotenv
+from cache import CACHE_DIR, SQLiteCache
+from chunker import chunk_text
+import metrics
+from driver_pool import DriverPool
+from events import emit
+from fetcher import FETCH_HTTP_ENABLED, fetch_http
+from host_profiles import CAPTCHA_DETECT_TIMEOUT_MS, host_of, host_profiles
+from singleflight import Group
 
 # Load environment variables
 load_dotenv()
@@ -13,43 +27,439 @@ BRIGHTDATA_USERNAME = os.getenv('BRIGHTDATA_USERNAME', 'brd-customer-hl_815e11a3
 BRIGHTDATA_PASSWORD = os.getenv('BRIGHTDATA_PASSWORD', 't2v1xurwlh62')
 BRIGHTDATA_ENDPOINT = os.getenv('BRIGHTDATA_ENDPOINT', 'brd.superproxy.io:9515')
 
-SBR_WEBDRIVER = f'https://{BRIGHTDATA_USERNAME}:{BRIGHTDATA_PASSWORD}@{BRIGHTDATA_ENDPOINT}'
+SBR_WEBDRIVER = os.getenv(
+    'SCRAPE_WEBDRIVER_URL',
+    f'https://{BRIGHTDATA_USERNAME}:{BRIGHTDATA_PASSWORD}@{BRIGHTDATA_ENDPOINT}'
+)
 
+# Browser session pool settings
+SCRAPE_POOL_SIZE = int(os.getenv('SCRAPE_POOL_SIZE', '2'))
+SCRAPE_MAX_PAGES_PER_SESSION = int(os.getenv('SCRAPE_MAX_PAGES_PER_SESSION', '25'))
+SCRAPE_SESSION_IDLE_TIMEOUT = int(os.getenv('SCRAPE_SESSION_IDLE_TIMEOUT', '300'))
 
-def scrape_website(website):
+# When a browser page counts as loaded: load, domcontentloaded, networkidle,
+# selector:<css selector> or wait:<seconds>; never later than SCRAPE_READY_TIMEOUT
+SCRAPE_READY = os.getenv('SCRAPE_READY', 'load')
+SCRAPE_READY_TIMEOUT = float(os.getenv('SCRAPE_READY_TIMEOUT', '30'))
+# Quiet time (no new requests) that counts as network idle
+SCRAPE_NETWORK_IDLE_MS = int(os.getenv('SCRAPE_NETWORK_IDLE_MS', '500'))
+
+# Downloads the browser skips, since only the page text is kept
+SCRAPE_BLOCK_RESOURCES = [
+    kind.strip().lower() for kind in os.getenv('SCRAPE_BLOCK_RESOURCES', 'image,font,media').split(',')
+    if kind.strip()
+]
+SCRAPE_BLOCK_URLS = [
+    pattern.strip() for pattern in os.getenv(
+        'SCRAPE_BLOCK_URLS',
+        '*google-analytics.com*,*googletagmanager.com*,*doubleclick.net*,*connect.facebook.net*,'
+        '*hotjar.com*,*segment.io*,*scorecardresearch.com*'
+    ).split(',') if pattern.strip()
+]
+
+# Network.setBlockedURLs matches URLs, so resource types are blocked by file extension
+_RESOURCE_EXTENSIONS = {
+    'image': ('png', 'jpg', 'jpeg', 'gif', 'webp', 'avif', 'svg', 'ico', 'bmp'),
+    'font': ('woff', 'woff2', 'ttf', 'otf', 'eot'),
+    'media': ('mp4', 'webm', 'ogg', 'ogv', 'mp3', 'wav', 'm4a', 'm3u8', 'mpd'),
+    'stylesheet': ('css',),
+}
+_READY_POLL_SECONDS = 0.1
+# How endpoints without the Captcha CDP domain reject Captcha.waitForSolve
+_UNKNOWN_COMMAND = re.compile(r"unknown (?:command|method)|wasn't found|-32601", re.IGNORECASE)
+# Set on the old document before navigating; the new document's window doesn't have it
+_NAVIGATION_MARKER = '__datahawkPreviousPage'
+
+# Page cache settings
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE', '1') != '0'
+PAGE_CACHE_TTL = int(os.getenv('PAGE_CACHE_TTL', '3600'))
+PAGE_CACHE_MAX_MB = int(os.getenv('PAGE_CACHE_MAX_MB', '512'))
+# Seconds an expired page may still be served while it is refetched in the background
+PAGE_CACHE_STALE_SECONDS = int(os.getenv('PAGE_CACHE_STALE_SECONDS', '0'))
+
+page_cache = SQLiteCache(
+    os.path.join(CACHE_DIR, 'pages.sqlite3'),
+    default_ttl=PAGE_CACHE_TTL,
+    max_bytes=PAGE_CACHE_MAX_MB * 1024 * 1024,
+    stale_grace=PAGE_CACHE_STALE_SECONDS
+) if PAGE_CACHE_ENABLED else None
+
+
+def create_remote_driver():
     """
-    Scrape website content using BrightData proxy service.
+    Open a new remote Chrome session (BrightData unless SCRAPE_WEBDRIVER_URL is set).
+
+    `get` returns as soon as navigation starts; navigate and wait_until_ready
+    decide when the new page is loaded, so each fetch can use its own condition.
+    """
+    print("Launching browser... Please wait.")
+    sbr_connection = ChromiumRemoteConnection(SBR_WEBDRIVER, 'goog', 'chrome')
+    options = ChromeOptions()
+    options.page_load_strategy = 'none'
+    return Remote(sbr_connection, options=options)
+
+
+driver_pool = DriverPool(
+    create_remote_driver,
+    size=SCRAPE_POOL_SIZE,
+    max_pages_per_session=SCRAPE_MAX_PAGES_PER_SESSION,
+    idle_timeout=SCRAPE_SESSION_IDLE_TIMEOUT
+)
+atexit.register(driver_pool.close)
+
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+# Concurrent fetches of the same page share one browser session
+page_flight = Group('page')
+
+
+def normalize_url(url):
+    """
+    Canonical form of a URL for cache keys: lowercase scheme and host, no
+    default port, no fragment and sorted query parameters.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and (scheme, parts.port) not in (('http', 80), ('https', 443)):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or '/', query, ''))
+
+
+def _store_page(key, html, ttl=None):
+    if page_cache and not html.startswith("Error"):
+        page_cache.set(key, zlib.compress(html.encode('utf-8')), ttl=ttl)
+
+
+def _fetch_page(website, key, ttl=None, store=True, ready=None, on_event=None):
+    """
+    Fetch `website` (over HTTP, or with the browser when it needs one), or
+    wait for the fetch of the same page that is already in flight with the
+    same options (readiness condition, storing, ttl) and share its HTML.
+    """
+    def fetch():
+        html = fetch_tiered(website, ready=ready, on_event=on_event)
+        if store:
+            _store_page(key, html, ttl)
+        return html
+
+    html, shared = page_flight.do((key, ready or SCRAPE_READY, store, ttl), fetch)
+    if shared:
+        print("Shared an in-flight fetch of the same page")
+        emit(on_event, 'fetch', 'coalesced', url=website, bytes=len(html))
+    return html
+
+
+def _revalidate_page(website, key, ttl, ready=None):
+    try:
+        _fetch_page(website, key, ttl, ready=ready)
+    finally:
+        with _revalidating_lock:
+            _revalidating.discard(key)
+
+
+def scrape_website(website, use_cache=True, refresh=False, ttl=None, ready=None, on_event=None):
+    """
+    Scrape website content, serving it from the page cache when possible.
+
+    `use_cache=False` bypasses the cache entirely, `refresh=True` always
+    refetches and stores the new copy, and `ttl` overrides the lifetime of
+    the stored entry in seconds. `ready` overrides SCRAPE_READY for pages
+    loaded in the browser. Progress is reported to `on_event`.
     """
     if not website:
         return "Error: No website URL provided."
     
     if not website.startswith(('http://', 'https://')):
         website = 'https://' + website
-    
-    try:
-        print("Launching browser... Please wait.")
-
-        sbr_connection = ChromiumRemoteConnection(SBR_WEBDRIVER, 'goog', 'chrome')
-        with Remote(sbr_connection, options=ChromeOptions()) as driver:
-            driver.get(website)
-            
-            # CAPTCHA handling: If you're expecting a CAPTCHA on the target page
-            print('Waiting for CAPTCHA to solve...')
-            solve_res = driver.execute('executeCdpCommand', {
-                'cmd': 'Captcha.waitForSolve',
-                'params': {'detectTimeout': 10000},
-            })
-            print('CAPTCHA solve status:', solve_res['value']['status'])
-            print('Navigated! Scraping page content...')
-            
-            html = driver.page_source
+
+    emit(on_event, 'fetch', 'started', url=website)
+    key = normalize_url(website)
+    if not (use_cache and page_cache):
+        return _fetch_page(website, key, store=False, ready=ready, on_event=on_event)
+
+    if not refresh:
+        cached, stale = page_cache.lookup(key)
+        if cached is not None:
+            if stale:
+                # Serve the stale copy now and refetch it in the background
+                with _revalidating_lock:
+                    start = key not in _revalidating
+                    _revalidating.add(key)
+                if start:
+                    threading.Thread(
+                        target=_revalidate_page, args=(website, key, ttl, ready), daemon=True
+                    ).start()
+            print("Serving page from cache" + (" (stale)" if stale else ""))
+            metrics.count('cache_hits', cache='page')
+            html = zlib.decompress(cached).decode('utf-8')
+            emit(on_event, 'fetch', 'cache_hit', url=website, stale=stale, bytes=len(html))
             return html
-            
+
+    metrics.count('cache_misses', cache='page')
+    return _fetch_page(website, key, ttl, ready=ready, on_event=on_event)
+
+
+def fetch_tiered(website, use_http=FETCH_HTTP_ENABLED, ready=None, on_event=None):
+    """
+    Fetch `website` with a plain HTTP request when its server-rendered HTML
+    is enough, and escalate to the browser (proxy, JavaScript, CAPTCHA
+    solving) only when the response looks blocked, empty or client-rendered.
+    The host's profile skips the HTTP attempt on hosts where it keeps
+    failing and sets how long the browser waits for a CAPTCHA.
+    """
+    host = host_of(website)
+    captcha_timeout = CAPTCHA_DETECT_TIMEOUT_MS
+    if host_profiles:
+        try_http, captcha_timeout = host_profiles.plan(host)
+        if use_http and not try_http:
+            use_http = False
+            print("Host is known to need the browser, skipping plain HTTP")
+            metrics.count('profile_skips', step='http')
+            emit(on_event, 'fetch', 'escalated', url=website, reason='known_host')
+
+    if use_http:
+        html, reason = fetch_http(website, on_event=on_event)
+        if host_profiles:
+            host_profiles.record_http(host, html is not None, reason)
+        if html is not None:
+            return html
+        print(f"Plain HTTP fetch not usable ({reason}), loading page in browser")
+        metrics.count('escalations', reason=reason)
+        emit(on_event, 'fetch', 'escalated', url=website, reason=reason)
+    return fetch_with_browser(website, captcha_timeout=captcha_timeout, ready=ready, on_event=on_event)
+
+
+def block_patterns(resource_types=None, urls=None):
+    """
+    URL patterns for Network.setBlockedURLs: every extension of the blocked
+    resource types (with or without a query string) plus the URL patterns.
+    """
+    resource_types = SCRAPE_BLOCK_RESOURCES if resource_types is None else resource_types
+    urls = SCRAPE_BLOCK_URLS if urls is None else urls
+    patterns = []
+    for kind in resource_types:
+        if kind not in _RESOURCE_EXTENSIONS:
+            print(f"Unknown resource type to block: {kind}")
+            continue
+        for extension in _RESOURCE_EXTENSIONS[kind]:
+            patterns += [f"*.{extension}", f"*.{extension}?*"]
+    return tuple(patterns + list(urls))
+
+
+def block_resources(driver, patterns):
+    """
+    Make the session skip requests matching `patterns`. Sessions remember
+    what they block, so the CDP calls only go out when the list changes.
+    """
+    if getattr(driver, '_datahawk_blocked', None) == patterns:
+        return
+    try:
+        driver.execute('executeCdpCommand', {'cmd': 'Network.enable', 'params': {}})
+        driver.execute('executeCdpCommand', {'cmd': 'Network.setBlockedURLs', 'params': {'urls': list(patterns)}})
     except Exception as e:
-        error_msg = f"Error scraping website: {str(e)}"
-        print(error_msg)
-        return error_msg
+        print(f"Resource blocking unavailable: {str(e)}")
+    driver._datahawk_blocked = patterns
+
+
+def navigate(driver, url):
+    """
+    Start loading `url`, first marking the current document so that
+    wait_until_ready doesn't mistake it (about:blank, or the previous page
+    of a pooled session) for the new one while `get` hasn't committed yet.
+    """
+    driver.execute_script(f"window.{_NAVIGATION_MARKER} = true")
+    driver.get(url)
+
+
+def _navigated(driver):
+    try:
+        return driver.execute_script(f"return window.{_NAVIGATION_MARKER} !== true")
+    except JavascriptException:
+        # The old document is unloading
+        return False
+
+
+def wait_until_ready(driver, ready=None, timeout=SCRAPE_READY_TIMEOUT):
+    """
+    Wait until the document started by navigate() has replaced the old
+    one and meets the `ready` condition (SCRAPE_READY by default): load,
+    domcontentloaded, networkidle, selector:<css> or wait:<seconds>. After
+    `timeout` seconds loading is stopped and the page is read as it is.
+    Returns whether the condition was met in time.
+    """
+    kind, _, argument = (ready or SCRAPE_READY).partition(':')
+    kind = kind.strip().lower()
+    argument = argument.strip()
+    scripts = {
+        'load': "return document.readyState === 'complete'",
+        'domcontentloaded': "return document.readyState !== 'loading'",
+        'selector': "return document.querySelector(arguments[0]) !== null",
+        'networkidle': "return [document.readyState, performance.getEntriesByType('resource').length]",
+    }
+    if kind != 'wait' and (kind not in scripts or (kind == 'selector' and not argument)):
+        raise ValueError(f"Unknown readiness condition: {ready or SCRAPE_READY}")
+
+    started = time.monotonic()
+    deadline = started + timeout
+    while not _navigated(driver):
+        if time.monotonic() >= deadline:
+            print(f"Page did not start loading after {timeout:g}s, reading it as it is")
+            driver.execute_script("window.stop()")
+            return False
+        time.sleep(_READY_POLL_SECONDS)
+    if kind == 'wait':
+        time.sleep(max(0.0, min(float(argument or 0), deadline - time.monotonic())))
+        return True
+
+    requests_seen, quiet_since = -1, time.monotonic()
+    while True:
+        if kind == 'selector':
+            met = driver.execute_script(scripts[kind], argument)
+        elif kind == 'networkidle':
+            state, requests_made = driver.execute_script(scripts[kind])
+            now = time.monotonic()
+            if requests_made != requests_seen:
+                requests_seen, quiet_since = requests_made, now
+            met = state == 'complete' and now - quiet_since >= SCRAPE_NETWORK_IDLE_MS / 1000
+        else:
+            met = driver.execute_script(scripts[kind])
+        if met:
+            return True
+        if time.monotonic() >= deadline:
+            print(f"Page not ready ({kind}) after {timeout:g}s, reading it as it is")
+            driver.execute_script("window.stop()")
+            return False
+        time.sleep(_READY_POLL_SECONDS)
+
+
+def fetch_with_browser(website, pool=None, captcha_timeout=CAPTCHA_DETECT_TIMEOUT_MS, ready=None,
+                       block=None, on_event=None):
+    """
+    Scrape website content using BrightData proxy service.
+
+    Borrows a session from `pool` (the shared `driver_pool` by default); a
+    session that raised is discarded rather than returned to the pool.
+    `captcha_timeout` is how long (ms) to wait for a CAPTCHA to show up;
+    0 skips the check. The outcome is recorded in the host's profile.
+    `ready` is the readiness condition (see wait_until_ready) and `block`
+    the URL patterns the browser skips (block_patterns() by default).
+    """
+    pool = pool or driver_pool
+    started = time.monotonic()
+    status = None
+    with metrics.span('fetch', url=website) as fetch_span:
+        try:
+            with pool.borrow() as driver:
+                block_resources(driver, block_patterns() if block is None else tuple(block))
+                emit(on_event, 'fetch', 'navigating', url=website)
+                navigate(driver, website)
+                with metrics.span('ready', url=website, condition=ready or SCRAPE_READY) as ready_span:
+                    ready_span.attrs['met'] = wait_until_ready(driver, ready)
+                emit(on_event, 'fetch', 'ready', url=website, met=ready_span.attrs['met'])
+                
+                # CAPTCHA handling, unless this host has never shown one
+                if captcha_timeout:
+                    print('Waiting for CAPTCHA to solve...')
+                    emit(on_event, 'captcha', 'started', url=website, timeout_ms=captcha_timeout)
+                    with metrics.span('captcha', url=website, timeout_ms=captcha_timeout) as captcha_span:
+                        try:
+                            solve_res = driver.execute('executeCdpCommand', {
+                                'cmd': 'Captcha.waitForSolve',
+                                'params': {'detectTimeout': captcha_timeout},
+                            })
+                            status = solve_res['value']['status']
+                            print('CAPTCHA solve status:', status)
+                        except Exception as e:
+                            if _UNKNOWN_COMMAND.search(str(e)):
+                                # Plain WebDriver endpoints have no CAPTCHA solver
+                                status = 'unavailable'
+                                print(f'CAPTCHA solver unavailable: {str(e)}')
+                            else:
+                                # A timeout or dropped call says nothing about the solver
+                                status = 'error'
+                                print(f'CAPTCHA check failed: {str(e)}')
+                        captcha_span.attrs['status'] = status
+                    emit(on_event, 'captcha', 'finished', url=website, status=status)
+                    if status == 'solve_finished':
+                        # Solving submits a form, so the real page loads now
+                        wait_until_ready(driver, ready)
+                else:
+                    print('Skipping CAPTCHA check, this host has not shown one')
+                    metrics.count('profile_skips', step='captcha')
+                    emit(on_event, 'captcha', 'skipped', url=website)
+                print('Navigated! Scraping page content...')
+                
+                html = driver.page_source
+                fetch_span.attrs['bytes'] = len(html)
+                metrics.count('pages_fetched', tier='browser')
+                metrics.count('bytes_fetched', len(html))
+                elapsed = time.monotonic() - started
+                if host_profiles:
+                    host_profiles.record_browser(host_of(website), True, status)
+                emit(on_event, 'fetch', 'finished', url=website, bytes=len(html), tier='browser',
+                     elapsed=elapsed)
+                return html
+                
+        except Exception as e:
+            error_msg = f"Error scraping website: {str(e)}"
+            print(error_msg)
+            metrics.fail(fetch_span, error_msg)
+            if host_profiles:
+                host_profiles.record_browser(host_of(website), False, status)
+            emit(on_event, 'fetch', 'failed', url=website, error=error_msg)
+            return error_msg
     
+# Parse once with libxml2, dropping comments and processing instructions up front
+_HTML_PARSER = lxml_html.HTMLParser(encoding='utf-8', remove_comments=True, remove_pis=True)
+
+# Nodes whose text is never shown on screen (aria-hidden text often is, so it stays)
+_NON_CONTENT_XPATH = etree.XPath(
+    ".//*[self::script or self::style or self::noscript or self::svg or self::template"
+    " or @hidden"
+    " or contains(translate(@style, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ ', 'abcdefghijklmnopqrstuvwxyz'), 'display:none')"
+    " or contains(translate(@style, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ ', 'abcdefghijklmnopqrstuvwxyz'), 'visibility:hidden')]"
+)
+
+
+def _find_body(html):
+    if not html.strip():
+        return None
+    return lxml_html.document_fromstring(html.encode('utf-8'), parser=_HTML_PARSER).find('body')
+
+
+def _visible_text(root):
+    for element in _NON_CONTENT_XPATH(root):
+        element.drop_tree()
+
+    return "\n".join(
+        line.strip()
+        for text in root.itertext()
+        for line in text.splitlines()
+        if line.strip()
+    )
+
+
+def html_to_text(html):
+    """
+    Turn a full page into cleaned body text in a single parse.
+
+    Same output as clean_body_content(extract_body_content(html)).
+    """
+    if not html or html.startswith("Error:"):
+        return html
+
+    try:
+        body = _find_body(html)
+        if body is None:
+            return "No body content found."
+        return _visible_text(body)
+    except Exception as e:
+        return f"Error cleaning content: {str(e)}"
+
+
 def extract_body_content(html):
     """
     Extract body content from HTML.
@@ -58,10 +468,9 @@ def extract_body_content(html):
         return html
         
     try:
-        soup = BeautifulSoup(html, 'html.parser')
-        body_content = soup.find('body')
-        if body_content:
-            return str(body_content)
+        body_content = _find_body(html)
+        if body_content is not None:
+            return etree.tostring(body_content, encoding='unicode', method='html', with_tail=False)
         else:
             return "No body content found."
     except Exception as e:
@@ -69,37 +478,26 @@ def extract_body_content(html):
     
 def clean_body_content(body_content):
     """
-    Clean HTML body content by removing scripts, styles and formatting text.
+    Clean HTML body content by removing scripts, styles, hidden nodes and formatting text.
     """
     if not body_content or body_content.startswith("Error:") or body_content == "No body content found.":
         return body_content
         
     try:
-        soup = BeautifulSoup(body_content, 'html.parser')
-        
-        # Remove script and style elements
-        for script_or_style in soup(['script', 'style']):
-            script_or_style.extract()  
-            
-        # Get text content with line separators
-        cleaned_content = soup.get_text(separator="\n")
-        
-        # Clean up whitespace and empty lines
-        cleaned_content = "\n".join(
-            line.strip() for line in cleaned_content.splitlines() if line.strip()
-        )
-        return cleaned_content
+        body = _find_body(body_content)
+        return _visible_text(body) if body is not None else ""
         
     except Exception as e:
         return f"Error cleaning content: {str(e)}"
 
-def split_dom_content(dom_content, max_length=6000):
+def split_dom_content(dom_content, max_length=6000, overlap=0):
     """
     Split DOM content into chunks for AI processing.
+
+    Whole lines are packed up to `max_length` characters, optionally
+    repeating up to `overlap` characters of the previous chunk.
     """
     if not dom_content or dom_content.startswith("Error:"):
         return [dom_content]
         
-    return [
-        dom_content[i:i + max_length] for i in range(0, len(dom_content), max_length)
-    ]
\ No newline at end of file
+    return chunk_text(dom_content, max_length, overlap_tokens=overlap, count=len)
@@ -25,8 +25,12 @@ def install_requirements():
         "streamlit",
         "google-generativeai", 
         "selenium",
+        "requests",
         "beautifulsoup4",
         "lxml",
+        "cssselect",
+        "numpy",
+        "pandas",
         "html5lib",
         "python-dotenv"
     ]